@@ -5,10 +5,14 @@ from typing import Any, Final
 from collections.abc import Iterable
 from typing_extensions import TypedDict, NotRequired
 
+from src.damage_curves import DamageCurve, damage_curves, level_axis
 from src.tem_stat import Stat
+from src.tem_tem_type import TemTemType
 from src.team import PlaythroughTeam
+from src.threats import ReverseQuery, SpeciesFilter, find_kos, find_threats
 from src.tem import Tem, TemBattleConfig, TemSpeciesConfig
 from src.tempedia import Tempedia
+from src.traits import damage_bounds
 import src.tem_tem_constants as TemTemConstants
 
 MIN_AI_SVS: Final[int] = TemTemConstants.MIN_SV  # + 24
@@ -21,6 +25,7 @@ class ConfigTem(TypedDict):
     svs: NotRequired[list[int]]
     tvs: NotRequired[list[int]]
     nickname: NotRequired[str]
+    trait: NotRequired[str] # if unknown, the damage ranges cover every trait of the species
 
 
 def get_json(path: str) -> Any:
@@ -54,7 +59,8 @@ my_team = PlaythroughTeam(
                         for _ in range(len(Stat))
                     ]
                 ),
-                tvs=d.get("tvs", [0] * len(Stat))
+                tvs=d.get("tvs", [0] * len(Stat)),
+                trait=d.get("trait")
             ),
             nickname=d.get("nickname", "")
         )
@@ -62,6 +68,26 @@ my_team = PlaythroughTeam(
     ]
 )
 
+def ko_levels_text(dmg_curve: DamageCurve) -> str:
+    """
+    Describes the levels at which a damage dmg_curve reaches a 2HKO/OHKO, for the
+    worst (guaranteed) and best (possible) cases.
+    """
+    def lvl(hits: int, guaranteed: bool) -> str:
+        level = dmg_curve.ko_level(hits, guaranteed)
+        return "-" if level is None else f"lv. {level}"
+
+    return (
+        f"[{dmg_curve.technique}] "
+        + f"{dmg_curve.min_percent[0] * 100:.1f} % - {dmg_curve.max_percent[0] * 100:.1f} % "
+        + f"@ lv. {dmg_curve.levels[0]} -> "
+        + f"{dmg_curve.min_percent[-1] * 100:.1f} % - {dmg_curve.max_percent[-1] * 100:.1f} % "
+        + f"@ lv. {dmg_curve.levels[-1]} | "
+        + f"2HKO: {lvl(2, True)} (possible {lvl(2, False)}) "
+        + f"OHKO: {lvl(1, True)} (possible {lvl(1, False)})"
+    )
+
+
 # TODO migrate to arguably
 if __name__ == "__main__":
     from icecream import ic
@@ -122,11 +148,82 @@ if __name__ == "__main__":
         help="The name of the dojo leader, followed by the desired tems, if any.",
     )
 
+    parser.add_argument(
+        "--level_range",
+        required=False,
+        type=int,
+        nargs=2,
+        metavar=("MIN_LEVEL", "MAX_LEVEL"),
+        help="Instead of using the configured levels, calculate damage curves with both " + \
+            "sides at every level in the range, and the levels at which each matchup " + \
+            "becomes a 2HKO/OHKO.",
+    )
+
+    parser.add_argument(
+        "--reverse_query",
+        required=False,
+        type=int,
+        metavar="LEVEL",
+        help="Instead of the opponent tems, query every species at LEVEL: the ones " + \
+            "my tems KO and the ones that KO my tems, in --hits hits.",
+    )
+    parser.add_argument(
+        "--hits",
+        required=False,
+        type=int,
+        default=1,
+        help="The number of hits to KO, for --reverse_query (1 for OHKO, 2 for 2HKO...).",
+    )
+    parser.add_argument(
+        "--species_types",
+        required=False,
+        choices=[t.name.lower() for t in TemTemType if t != TemTemType.NO_TYPE],
+        type=str.lower,
+        default=[],
+        nargs="+",
+        help="Only query species having any of these types, for --reverse_query.",
+    )
+    parser.add_argument(
+        "--species_traits",
+        required=False,
+        type=str.lower,
+        default=[],
+        nargs="+",
+        help="Only query species that can have any of these traits, for --reverse_query.",
+    )
+
     args = parser.parse_args()
 
     # filter my tems
     my_iterable_tems = [my_team(name) for name in args.my_tems]
 
+    if args.reverse_query is not None:
+        query = ReverseQuery(
+            level=args.reverse_query,
+            hits=args.hits,
+            species_filter=SpeciesFilter(
+                types=frozenset(TemTemType.from_string(t) for t in args.species_types),
+                traits=frozenset(args.species_traits),
+            ),
+            min_sv=MIN_AI_SVS
+        )
+
+        for my_tem in my_iterable_tems:
+            print(my_tem)
+
+            for technique in my_tem.battle_techniques:
+                print(f"\t-> [{technique}] KOs in {args.hits} hit(s):")
+                for threat in find_kos(my_tem, technique, query):
+                    print(f"\t\t{threat}")
+
+            print(f"\t<- KO'd in {args.hits} hit(s) by:")
+            for threat in find_threats(my_tem, query):
+                print(f"\t\t{threat}")
+
+            print("\n\n")
+
+        parser.exit()
+
     # properly set opponent's tems
     max_sv_tems = []
     min_sv_tems = []
@@ -146,7 +243,8 @@ if __name__ == "__main__":
                 battle_config=TemBattleConfig.from_data(
                     level=d["level"],
                     svs=[TemTemConstants.MAX_SV] * len(Stat),
-                    battle_techniques=d["techniques"]
+                    battle_techniques=d["techniques"],
+                    trait=d.get("trait")
                 )
             )
         )
@@ -157,7 +255,8 @@ if __name__ == "__main__":
                 battle_config=TemBattleConfig.from_data(
                     level=d["level"],
                     svs=[MIN_AI_SVS] * len(Stat),
-                    battle_techniques=d["techniques"]
+                    battle_techniques=d["techniques"],
+                    trait=d.get("trait")
                 )
             )
         )
@@ -170,6 +269,33 @@ if __name__ == "__main__":
     max_sv_opponents = opponent_teams["max_svs"]
     min_sv_opponents = opponent_teams["min_svs"]
 
+    if args.level_range is not None:
+        levels = level_axis(*args.level_range)
+
+        for my_tem in my_iterable_tems:
+            print(my_tem)
+
+            for opponent_max_sv in max_sv_opponents:
+                opponent_min_sv = min_sv_opponents(opponent_max_sv.species_name)
+
+                print(f"\t-> {opponent_max_sv.species_name}")
+                for curve in damage_curves(
+                    (my_tem, opponent_max_sv), (my_tem, opponent_min_sv), levels
+                ):
+                    print(f"\t\t{ko_levels_text(curve)}")
+
+                print(f"\t<- {opponent_max_sv.species_name}")
+                for curve in damage_curves(
+                    (opponent_min_sv, my_tem), (opponent_max_sv, my_tem), levels
+                ):
+                    print(f"\t\t{ko_levels_text(curve)}")
+
+                print("\n")
+
+            print("\n\n")
+
+        parser.exit()
+
     for my_tem in my_iterable_tems:
         print(my_tem)
 
@@ -186,15 +312,20 @@ if __name__ == "__main__":
             for technique in my_tem.battle_techniques:
                 # calculate attacks
                 min_dmg_percent = (
-                    my_tem.calculate_atacking_damage(technique, opponent_max_sv)
+                    my_tem.calculate_atacking_damage(
+                        technique,
+                        opponent_max_sv,
+                        damage_bounds(my_tem, technique, opponent_max_sv)[0]
+                    )
                     / opponent_max_sv.stats[Stat.HP]
-                )  # min damage is done to max_svs oponent
+                )  # min damage is done to max_svs oponent, with the least favourable traits
 
                 # calculate the range by using the min stats opponent
                 max_dmg_percent = (
                     my_tem.calculate_atacking_damage(
                         technique,
                         opponent_min_sv,
+                        damage_bounds(my_tem, technique, opponent_min_sv)[1]
                     )
                     / opponent_min_sv.stats[Stat.HP]
                 )
@@ -222,8 +353,10 @@ if __name__ == "__main__":
             for technique in opponent_max_sv.battle_techniques:
                 # calculate defenses
                 dmg = my_tem.calculate_defensive_damage(
-                    technique, opponent_max_sv
-                )  # max damage is done by max_svs oponent
+                    technique,
+                    opponent_max_sv,
+                    damage_bounds(opponent_max_sv, technique, my_tem)[1]
+                )  # max damage is done by max_svs oponent, with the most favourable traits
                 defends_text = f"\t\t[{technique}] <= {dmg}"
 
                 print(defends_text)
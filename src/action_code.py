@@ -0,0 +1,75 @@
+from __future__ import annotations
+from typing import Final
+
+from src.battle_team import TeamBattlePosition
+from src.targets import ActionTarget
+from src.technique import TechniquePriority
+import src.tem_tem_constants as TemTemConstants
+
+
+class ActionCode:
+    """
+    The layout of the integer codes of the actions a single position can take.
+    A code only makes sense with the team and position it was encoded for: techniques are
+    encoded by their slot in the tem's battle techniques and switches by the slot of the
+    incoming tem in the team.
+    """
+    NO_ACTION: Final[int] = 0 # the position has nothing to do (eg: it's empty)
+    REST: Final[int] = 1
+    RUN: Final[int] = 2
+    SWITCH: Final[int] = 3 # + team slot
+    # + technique slot * number of targets + target
+    TECHNIQUE: Final[int] = SWITCH + TemTemConstants.COMPETITIVE_TEAM_SIZE
+    SIZE: Final[int] = TECHNIQUE + TemTemConstants.NUMBER_OF_BATTLE_TECHNIQUES * len(ActionTarget)
+
+    @staticmethod
+    def switch(team_slot: int) -> int:
+        return ActionCode.SWITCH + team_slot
+
+    @staticmethod
+    def technique(technique_slot: int, target: ActionTarget) -> int:
+        return ActionCode.TECHNIQUE + technique_slot * len(ActionTarget) + target.value - 1
+
+    @staticmethod
+    def technique_target(code: int) -> tuple[int, ActionTarget]:
+        """
+        Returns the technique slot and the target of a technique code.
+        """
+        technique_slot, target = divmod(code - ActionCode.TECHNIQUE, len(ActionTarget))
+        return technique_slot, list(ActionTarget)[target]
+
+# turn order, highest first. Switching goes before everything but ultra priority techniques
+PRIORITY_RANK: Final[dict[TechniquePriority, int]] = {
+    TechniquePriority.VERYLOW: 0,
+    TechniquePriority.LOW: 1,
+    TechniquePriority.NORMAL: 2,
+    TechniquePriority.HIGH: 3,
+    TechniquePriority.VERYHIGH: 4,
+    TechniquePriority.ULTRA: 6,
+}
+SWITCH_RANK: Final[int] = 5
+REST_RANK: Final[int] = PRIORITY_RANK[TechniquePriority.NORMAL]
+RUN_RANK: Final[int] = 7
+# the bounds of the fields packed into `RunnableAction.sort_key`
+SORT_KEY_SPEEDS: Final[int] = 1 << 16
+SORT_KEY_SLOTS: Final[int] = 4 # (team, position) pairs
+
+def target_slots(target: ActionTarget, position: int) -> tuple[tuple[int, int], ...]:
+    """
+    The (team, position) indexes hit by a target, with team 0 being the user's team
+    and 1 the opponents.
+    """
+    mate = 1 - position
+    left, right = TeamBattlePosition.LEFT.value - 1, TeamBattlePosition.RIGHT.value - 1
+    own = ((0, position), (0, mate))
+    opponents = ((1, right), (1, left))
+    return {
+        ActionTarget.SELF: ((0, position),),
+        ActionTarget.TEAM_MATE: ((0, mate),),
+        ActionTarget.OWN_TEAM: own,
+        ActionTarget.OPPONENT_TEAM: opponents,
+        ActionTarget.OPPONENT_LEFT: ((1, left),),
+        ActionTarget.OPPONENT_RIGHT: ((1, right),),
+        ActionTarget.ALL: own + opponents,
+        ActionTarget.OTHERS: ((0, mate),) + opponents,
+    }.get(target, ())
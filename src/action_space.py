@@ -0,0 +1,244 @@
+from __future__ import annotations
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import accumulate
+import math
+from typing import Hashable, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+from src.action_code import ActionCode
+from src.battle_state import (
+    Action, ActionCollection, BattleState, RestAction, RunAction, SwitchTemAction, TeamAction,
+    TurnAction, UseTechniqueAction
+)
+from src.battle_team import TeamBattlePosition, Teams
+from src.rng import GLOBAL_RNG, Rng
+from src.targets import ActionTarget
+
+
+class TeamActionSpace():
+    """
+    The legal team actions of a team, built from the actions available to each position.
+    It is never materialised: its size is known in closed form and the k-th team action
+    can be built directly, so it can be sampled without listing every team action.
+
+    Team actions are ordered as nested loops over the positions' actions
+    (in `TeamBattlePosition` order), skipping incompatible pairs.
+    """
+    def __init__(self, position_actions: dict[TeamBattlePosition, Sequence[Action]]) -> None:
+        self.__positions: list[TeamBattlePosition] = [
+            position for position in TeamBattlePosition if any(position_actions.get(position, []))
+        ]
+        assert len(self.__positions) <= 2, "Team actions are only defined for up to 2 positions"
+        self.__actions: list[Sequence[Action]] = [
+            position_actions[position] for position in self.__positions
+        ]
+
+        if len(self.__positions) < 2:
+            self.__size = math.prod(len(actions) for actions in self.__actions)
+            return
+
+        first, second = self.__actions
+        # indexes of the second position's actions, by conflict key
+        self.__conflicts: dict[Hashable, list[int]] = defaultdict(list)
+        for i, action in enumerate(second):
+            if action.conflict_key is not None:
+                self.__conflicts[action.conflict_key].append(i)
+
+        # how many second position actions each first position action can be paired with
+        self.__first_offsets: list[int] = [0] + list(accumulate(
+            len(second) - len(self.__get_conflicts(action)) for action in first
+        ))
+        self.__size = self.__first_offsets[-1]
+
+    def __get_conflicts(self, action: Action) -> list[int]:
+        if action.conflict_key is None:
+            return []
+        return self.__conflicts.get(action.conflict_key, [])
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __getitem__(self, index: int) -> TeamAction:
+        """
+        Builds the index-th legal team action, without building the others.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f"Team action index out of range: {index=} {len(self)=}")
+
+        if len(self.__positions) < 2:
+            return TeamAction({
+                position: actions[index] for position, actions in zip(
+                    self.__positions, self.__actions
+                )
+            })
+
+        first, second = self.__actions
+        i = bisect_right(self.__first_offsets, index) - 1
+        j = index - self.__first_offsets[i]
+
+        # skip the conflicting actions that come before the j-th compatible one
+        for conflict in self.__get_conflicts(first[i]):
+            if conflict <= j:
+                j += 1
+
+        return TeamAction({self.__positions[0]: first[i], self.__positions[1]: second[j]})
+
+    def __iter__(self) -> Iterator[TeamAction]:
+        if len(self.__positions) < 2:
+            for index in range(len(self)):
+                yield self[index]
+            return
+
+        first, second = self.__actions
+        for action in first:
+            conflicts = set(self.__get_conflicts(action))
+            for j, other in enumerate(second):
+                if j not in conflicts:
+                    yield TeamAction({self.__positions[0]: action, self.__positions[1]: other})
+
+    def sample(self, rng: Optional[Rng] = None) -> TeamAction:
+        """
+        Returns a legal team action, uniformly at random.
+        """
+        return self[(GLOBAL_RNG if rng is None else rng).randrange(len(self))]
+
+class TurnActionCollection():
+    def __init__(self, actions: ActionCollection) -> None:
+        self.__actions: ActionCollection = actions
+        self.__team_spaces: dict[Teams, TeamActionSpace] = {
+            team: TeamActionSpace({
+                position: list(actions.get_actions(team, position))
+                    for position in TeamBattlePosition
+            }) for team in Teams
+        }
+
+    def team_has_actions(self, team: Teams) -> bool:
+        return self.__actions.has_actions(team=team)
+
+    def __len__(self) -> int:
+        return math.prod(len(space) for space in self.__team_spaces.values())
+
+    def __getitem__(self, index: int) -> TurnAction:
+        """
+        Builds the index-th turn action, using the team action spaces as mixed radix digits.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f"Turn action index out of range: {index=} {len(self)=}")
+
+        turn_action_dict: dict[Teams, TeamAction] = {}
+        for team in reversed(Teams):
+            space = self.__team_spaces[team]
+            index, team_index = divmod(index, len(space))
+            turn_action_dict[team] = space[team_index]
+
+        return TurnAction(turn_action_dict)
+
+    def __iter__(self) -> Iterator[TurnAction]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def sample(self, rng: Optional[Rng] = None) -> TurnAction:
+        """
+        Returns a turn action, uniformly at random.
+        """
+        return self[(GLOBAL_RNG if rng is None else rng).randrange(len(self))]
+
+    def for_team(self, team: Teams) -> TeamActionSpace:
+        return self.__team_spaces[team]
+
+class EncodedActionSpace():
+    """
+    The legal actions of a team, as `ActionCode`s and boolean legality masks.
+    Action objects are only built when a code is decoded.
+
+    A team action code is `ActionCode`s of both positions, in `TeamBattlePosition` order,
+    as the digits of a base `ActionCode.SIZE` number.
+    """
+    def __init__(
+            self,
+            state: BattleState,
+            team: Teams,
+            allowed_actions: Iterable[type[Action]]
+    ) -> None:
+        self.__state = state
+        self.__team = team
+        self.__position_mask: NDArray[np.bool_] = np.zeros(
+            (len(TeamBattlePosition), ActionCode.SIZE), dtype=np.bool_
+        )
+
+        for action_type in allowed_actions:
+            for position in state.get_acting_positions(team):
+                codes = list(action_type.get_possible_codes(team, position, state))
+                self.__position_mask[position.value - 1, codes] = True
+
+        for row in self.__position_mask:
+            if not row.any():
+                row[ActionCode.NO_ACTION] = True
+
+        self.__team_mask: NDArray[np.bool_] = np.logical_and.outer(*self.__position_mask)
+        # the same tem can't be switched in by both positions
+        switches = np.arange(ActionCode.SWITCH, ActionCode.TECHNIQUE)
+        self.__team_mask[switches, switches] = False
+
+    @property
+    def position_mask(self) -> NDArray[np.bool_]:
+        """
+        Which `ActionCode`s each position can use, with shape (position, code).
+        """
+        return self.__position_mask
+
+    @property
+    def team_mask(self) -> NDArray[np.bool_]:
+        """
+        Which pairs of `ActionCode`s the team can use, with shape (code, code).
+        """
+        return self.__team_mask
+
+    @property
+    def legal_codes(self) -> NDArray[np.int_]:
+        """
+        The legal team action codes.
+        """
+        return np.flatnonzero(self.__team_mask)
+
+    def sample(self, rng: Optional[Rng] = None) -> int:
+        """
+        Returns a legal team action code, uniformly at random.
+        """
+        legal_codes = self.legal_codes
+        return int(legal_codes[(GLOBAL_RNG if rng is None else rng).randrange(len(legal_codes))])
+
+    def encode(self, team_action: TeamAction) -> int:
+        codes = [ActionCode.NO_ACTION] * len(TeamBattlePosition)
+        for position, action in team_action:
+            codes[position.value - 1] = action.encode(self.__team, position, self.__state)
+        return int(np.ravel_multi_index(codes, self.__team_mask.shape))
+
+    def decode(self, team_action_code: int) -> TeamAction:
+        assert self.__team_mask.flat[team_action_code], \
+            f"Team action code is not legal: {team_action_code=}"
+        codes = np.unravel_index(team_action_code, self.__team_mask.shape)
+        position_action: dict[TeamBattlePosition, Action] = {}
+
+        for position, code in zip(TeamBattlePosition, codes):
+            if code != ActionCode.NO_ACTION:
+                position_action[position] = self.__decode_action(position, int(code))
+
+        return TeamAction(position_action)
+
+    def __decode_action(self, position: TeamBattlePosition, code: int) -> Action:
+        if code == ActionCode.REST:
+            return RestAction(ActionTarget.SELF)
+
+        if code == ActionCode.RUN:
+            return RunAction()
+
+        if code < ActionCode.TECHNIQUE:
+            return SwitchTemAction(self.__state.get_team(self.__team)[code - ActionCode.SWITCH])
+
+        technique_slot, target = ActionCode.technique_target(code)
+        techniques = list(self.__state.get_techniques(self.__team, position))
+        return UseTechniqueAction(target, techniques[technique_slot])
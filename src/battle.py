@@ -1,23 +1,82 @@
-from copy import deepcopy
+from typing import Optional
 
 from src.battle_team import Teams
-from src.battle_handler import BattleAgent, BattleHandler
-from src.battle_state import BattlePhase, BattleResult, BattleState
+from src.battle_handler import BattleAgent, BattleContext, BattleHandler
+from src.battle_state import BattlePhase, BattleResult, BattleSnapshot, BattleState
+from src.replay import BattleRecorder, BattleReplay
 
 class Battle():
-    def __init__(self, state: BattleState, handler: BattleHandler):
-        self.__state: BattleState = deepcopy(state)
+    def __init__(
+            self,
+            state: BattleState,
+            handler: BattleHandler,
+            recorder: Optional[BattleRecorder] = None
+    ):
+        """
+        The battle runs on the given state: it isn't copied, so the caller's state (and
+        its teams and tems) change as the battle goes. Use `reset` to bring it back to
+        how it was, or give the battle a state of its own to keep the caller's intact.
+        The handler may be shared with other battles: what it needs to know about this
+        one lives in the battle's `context`. Battles with a recorder can be replayed
+        once they're over.
+        """
+        self.__context: BattleContext = BattleContext(state, recorder)
+        self.__initial_state: BattleSnapshot = state.snapshot()
         self.__handler: BattleHandler = handler
 
     @property
     def state(self) -> BattleState:
-        return self.__state
+        return self.__context.state
 
-    def run(self, players: dict[Teams, BattleAgent]) -> BattleResult:
+    @property
+    def context(self) -> BattleContext:
+        return self.__context
+
+    @property
+    def handler(self) -> BattleHandler:
+        return self.__handler
+
+    def replay(self) -> BattleReplay:
+        recorder = self.__context.recorder
+        assert recorder is not None, "Only battles with a recorder can be replayed"
+        return recorder.replay(self.state)
+
+    def reset(self):
+        self.state.restore(self.__initial_state)
+        self.__context.reset()
+
+    def step(self, players: dict[Teams, BattleAgent]) -> bool:
+        """
+        Plays one turn, starting the battle if needed. Returns whether the battle is over.
+        """
+        if self.state.phase[0] == BattlePhase.NOT_STARTED:
+            self.state.next_phase()
+
+        if not self.state.is_over:
+            self.__handler.next(self.__context, players)
+
+        return self.state.is_over
+
+    async def astep(self, players: dict[Teams, BattleAgent]) -> bool:
+        """
+        Like `step`, awaiting the players on the running event loop.
+        """
         if self.state.phase[0] == BattlePhase.NOT_STARTED:
             self.state.next_phase()
 
-        while not self.state.is_over:
-            self.__handler.next(self.state, players)
+        if not self.state.is_over:
+            await self.__handler.anext(self.__context, players)
+
+        return self.state.is_over
+
+    def run(self, players: dict[Teams, BattleAgent]) -> BattleResult:
+        while not self.step(players):
+            pass
+
+        return self.state.result
+
+    async def arun(self, players: dict[Teams, BattleAgent]) -> BattleResult:
+        while not await self.astep(players):
+            pass
 
         return self.state.result
@@ -1,19 +1,215 @@
 
 from abc import ABC, abstractmethod
-import random
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import replace
+from functools import cache
+import time
+from typing import Optional
+from weakref import WeakKeyDictionary
 
-from src.battle_state import SidedBattleState, TeamAction
+import numpy as np
+
+from src.action_code import ActionCode
+from src.battle_core import BattleCore, CoreTables
+from src.battle_state import BattleState, SidedBattleState, TeamAction
+from src.decision_budget import DecisionBudget
+from src.greedy import DamageTable, score_actions
+from src.mcts import JointAction, SearchConfig, SearchStats, search
+from src.minimax import MinimaxConfig, MinimaxSearch, MinimaxStats
+from src.rng import GLOBAL_RNG, Rng
 
 class BattleAgent(ABC):
+    decision_budget: Optional[DecisionBudget] = None # no time limit
+
+    def __init__(self, rng: Optional[Rng] = None) -> None:
+        self.__rng = rng
+
+    @property
+    def rng(self) -> Rng:
+        """
+        What the agent draws its random decisions from. GLOBAL_RNG if it wasn't given one.
+        """
+        return GLOBAL_RNG if self.__rng is None else self.__rng
+
     @abstractmethod
     def choose_action(self, state: SidedBattleState) -> TeamAction:
         pass
 
+    async def achoose_action(self, state: SidedBattleState) -> TeamAction:
+        """
+        Used by async battles. Agents that wait on I/O (like remote players) should
+        override it to await instead of blocking the event loop.
+        """
+        return self.choose_action(state)
+
+    @property
+    def is_async(self) -> bool:
+        """
+        Whether the agent awaits its decisions, instead of blocking on them.
+        """
+        return type(self).achoose_action is not BattleAgent.achoose_action
+
 
 class FirstActionAvailableBattleAgent(BattleAgent):
     def choose_action(self, state: SidedBattleState) -> TeamAction:
-        return next(state.possible_actions) # type: ignore
+        return state.possible_actions[0]
 
 class RandomBattleAgent(BattleAgent):
     def choose_action(self, state: SidedBattleState) -> TeamAction:
-        return random.choice(list(state.possible_actions))
+        return state.possible_actions.sample(self.rng)
+
+class GreedyBattleAgent(BattleAgent):
+    """
+    Chooses the action that deals the most immediate damage for the least taken (see
+    `score_actions`), with ties broken at random. Each battle it plays gets a
+    `DamageTable`, kept until the battle's state is garbage collected, so decisions only
+    cost a pass over the legal actions. Like `CoreTables`, it ignores traits.
+    """
+    def __init__(self, rng: Optional[Rng] = None) -> None:
+        super().__init__(rng)
+        self.__tables: WeakKeyDictionary[BattleState, DamageTable] = WeakKeyDictionary()
+
+    def damage_table(self, battle_state: BattleState) -> DamageTable:
+        table = self.__tables.get(battle_state)
+        if table is None:
+            table = self.__tables[battle_state] = DamageTable(CoreTables.from_state(battle_state))
+        return table
+
+    def choose_action(self, state: SidedBattleState) -> TeamAction:
+        encoded, battle_state = state.encoded_actions, state.battle_state
+        if encoded is None or battle_state is None:
+            return state.possible_actions[0]
+
+        legal_codes = encoded.legal_codes
+        if len(legal_codes) == 1:
+            return encoded.decode(int(legal_codes[0]))
+
+        table = self.damage_table(battle_state)
+        scores = score_actions(
+            BattleCore.from_state(battle_state, table.tables, state.snapshot),
+            state.side.value - 1, _joint_actions(legal_codes), table
+        )
+        best = max(scores)
+        return encoded.decode(int(self.rng.choice([
+            code for code, score in zip(legal_codes, scores) if score == best
+        ])))
+
+
+def _search_seconds(seconds: Optional[float], state: SidedBattleState) -> Optional[float]:
+    """
+    How long a search can run: its own time limit, cut short by the team's deadline.
+    """
+    left = state.seconds_left()
+    if left is None or seconds is None:
+        return seconds if left is None else left
+    return min(seconds, left)
+
+def _joint_actions(team_codes: np.ndarray) -> list[JointAction]:
+    return [
+        tuple(int(code) for code in divmod(int(team_code), ActionCode.SIZE))
+            for team_code in team_codes
+    ]
+
+@cache
+def _search_executor(workers: int) -> Executor:
+    return ProcessPoolExecutor(max_workers=workers)
+
+class MCTSBattleAgent(BattleAgent):
+    """
+    Chooses the action visited the most by a Monte Carlo Tree Search that treats both
+    teams' choices as simultaneous (decoupled UCT, see `search`), run on a `BattleCore`
+    copy of the battle, so it ignores traits (see `BattleCore`).
+
+    With more than one worker, each worker of a process pool runs its own search with the
+    whole budget and their root visits are added up. `stats` adds up the iterations and
+    time of every search, so it measures how fast the engine plays.
+    """
+    def __init__(
+            self,
+            rng: Optional[Rng] = None,
+            config: SearchConfig = SearchConfig(),
+            workers: int = 1
+    ) -> None:
+        """
+        Args:
+        - rng (Optional[Rng]): Draws the searches' random choices.
+        - config (SearchConfig): The budget and parameters of each search.
+        - workers (int): How many processes run searches.
+        """
+        super().__init__(rng)
+        self.__config = config
+        self.__workers = workers
+        self.__stats = SearchStats()
+
+    @property
+    def stats(self) -> SearchStats:
+        return self.__stats
+
+    def choose_action(self, state: SidedBattleState) -> TeamAction:
+        encoded, battle_state = state.encoded_actions, state.battle_state
+        if encoded is None or battle_state is None:
+            return state.possible_actions[0]
+
+        legal_codes = encoded.legal_codes
+        if len(legal_codes) == 1:
+            return encoded.decode(int(legal_codes[0]))
+
+        core = BattleCore.from_state(battle_state, snapshot=state.snapshot)
+        team_index = state.side.value - 1
+        root_actions = _joint_actions(legal_codes)
+        config = replace(self.__config, seconds=_search_seconds(self.__config.seconds, state))
+        start = time.perf_counter()
+
+        if self.__workers <= 1:
+            visits, stats = search(core, team_index, root_actions, self.rng, config)
+        else:
+            futures = [
+                _search_executor(self.__workers).submit(
+                    search, core, team_index, root_actions, rng, config
+                ) for rng in self.rng.split(self.__workers)
+            ]
+            results = [future.result() for future in futures]
+            visits = list(np.sum([result[0] for result in results], axis=0))
+            stats = SearchStats(
+                sum(result[1].iterations for result in results), time.perf_counter() - start
+            )
+
+        self.__stats = self.__stats + stats
+        return encoded.decode(int(legal_codes[int(np.argmax(visits))]))
+
+
+class MinimaxBattleAgent(BattleAgent):
+    """
+    Chooses actions with an iteratively deepened `MinimaxSearch` on a `BattleCore` copy of
+    the battle, whose leaves are valued by the damage based `heuristic`. The search's
+    transposition table is kept between turns. Like `BattleCore`, it ignores traits.
+    """
+    def __init__(self, rng: Optional[Rng] = None, config: MinimaxConfig = MinimaxConfig()):
+        super().__init__(rng)
+        self.__config = config
+        self.__search = MinimaxSearch(config)
+        self.__stats = MinimaxStats()
+
+    @property
+    def stats(self) -> MinimaxStats:
+        """
+        Of the last search.
+        """
+        return self.__stats
+
+    def choose_action(self, state: SidedBattleState) -> TeamAction:
+        encoded, battle_state = state.encoded_actions, state.battle_state
+        if encoded is None or battle_state is None:
+            return state.possible_actions[0]
+
+        legal_codes = encoded.legal_codes
+        if len(legal_codes) == 1:
+            return encoded.decode(int(legal_codes[0]))
+
+        best, self.__stats = self.__search.search(
+            BattleCore.from_state(battle_state, snapshot=state.snapshot),
+            state.side.value - 1,
+            _joint_actions(legal_codes),
+            _search_seconds(self.__config.seconds, state)
+        )
+        return encoded.decode(best[0] * ActionCode.SIZE + best[1])
@@ -0,0 +1,441 @@
+from __future__ import annotations
+from array import array
+from dataclasses import dataclass
+import math
+from typing import Final, Optional, Sequence
+
+from src.action_code import PRIORITY_RANK, REST_RANK, SWITCH_RANK, ActionCode, target_slots
+from src.battle_field import BattleField
+from src.battle_state import BattlePhase, BattleSnapshot, BattleState
+from src.battle_team import TeamBattlePosition, Teams
+from src.rng import Rng
+from src.targets import ActionTarget
+from src.tem_stat import Stat
+import src.tem_tem_constants as TemTemConstants
+from src.tem_tem_constants import REST_STAMINA_RECOVERY
+from src.zobrist import Feature, zobrist_key
+
+TEAMS: Final[int] = len(Teams)
+TEAM_SIZE: Final[int] = TemTemConstants.COMPETITIVE_TEAM_SIZE
+TECHNIQUES: Final[int] = TemTemConstants.NUMBER_OF_BATTLE_TECHNIQUES
+POSITIONS: Final[int] = len(TeamBattlePosition)
+TARGETS: Final[int] = len(ActionTarget)
+TEMS: Final[int] = TEAMS * TEAM_SIZE
+EMPTY: Final[int] = BattleField.EMPTY_POSITION
+DRAW: Final[int] = -1
+
+# by target index and position index
+TARGET_SLOTS: Final[tuple[tuple[tuple[tuple[int, int], ...], ...], ...]] = tuple(
+    tuple(target_slots(target, position) for position in range(POSITIONS))
+        for target in ActionTarget
+)
+
+
+@dataclass(frozen=True)
+class CoreTables: #pylint: disable=too-many-instance-attributes
+    """
+    Everything about the tems that doesn't change during a battle, flattened into arrays.
+    Tems are indexed by `team index * TEAM_SIZE + team slot`, techniques by
+    `tem * TECHNIQUES + technique slot`. Copies of a core share their tables.
+
+    The damage is worked out without traits: with tems that have one, it isn't the damage
+    the battle would deal.
+    """
+    team_sizes: tuple[int, ...]
+    max_hp: array
+    max_stamina: array
+    speed: array
+    hold: array # by technique
+    stamina_cost: array # by technique
+    rank: array # by technique
+    # the technique `ActionCode`s of each tem, with the technique they use
+    technique_codes: tuple[tuple[tuple[int, int], ...], ...]
+    damage: array # by (technique, defending tem)
+
+    @staticmethod
+    def from_state(state: BattleState) -> CoreTables:
+        tems = [
+            list(state.get_team(team)) + [None] * (TEAM_SIZE - len(state.get_team(team)))
+                for team in Teams
+        ]
+        flat = [tem for team in tems for tem in team]
+        techniques = [
+            list(tem.battle_techniques) if tem is not None else [] for tem in flat
+        ]
+        techniques = [tech + [None] * (TECHNIQUES - len(tech)) for tech in techniques]
+
+        def by_tem(stat: Stat) -> array:
+            return array('i', (0 if tem is None else tem.stats[stat] for tem in flat))
+
+        def by_technique(value) -> array:
+            return array('i', (
+                0 if tech is None else value(tech) for tem in techniques for tech in tem
+            ))
+
+        return CoreTables(
+            team_sizes=tuple(len(state.get_team(team)) for team in Teams),
+            max_hp=by_tem(Stat.HP),
+            max_stamina=by_tem(Stat.STA),
+            speed=by_tem(Stat.SPD),
+            hold=by_technique(lambda tech: tech.hold),
+            stamina_cost=by_technique(lambda tech: tech.stamina_cost),
+            rank=by_technique(lambda tech: PRIORITY_RANK[tech.priority]),
+            technique_codes=tuple(
+                tuple(
+                    (ActionCode.technique(slot, target), index * TECHNIQUES + slot)
+                        for slot, tech in enumerate(tem) if tech is not None
+                            for target in tech.targets.to_action_target()
+                ) for index, tem in enumerate(techniques)
+            ),
+            damage=array('i', (
+                0 if tech is None or def_tem is None
+                    else atk_tem.calculate_atacking_damage(tech, def_tem)
+                        for atk_tem, tem_techniques in zip(flat, techniques)
+                            for tech in tem_techniques
+                                for def_tem in flat
+            )),
+        )
+
+
+class BattleCore: #pylint: disable=too-many-instance-attributes
+    """
+    A battle that keeps the mutable data of every tem of both teams in fixed-size typed
+    arrays and runs whole turns on indexes, for simulations that need lots of turns.
+    Actions are the `ActionCode`s of each position.
+
+    Its rules are `BattleHandler`'s: techniques deal the damage
+    `Tem.calculate_atacking_damage` returns, cost stamina (hurting the user when it
+    doesn't have enough) and must be held again after being used; resting recovers stamina;
+    fainted tems are replaced by the first tem that can be switched in; actions run in
+    `ActionScheduler`'s order. Traits aren't: a core plays the battle as if no tem had one,
+    and `to_state` leaves the state's `TraitEngine` as it was. So searches and simulations
+    on cores are wrong about battles where tems have traits.
+
+    Its Zobrist `hash` is updated with every change, for transposition tables. Code that
+    writes to the arrays directly must `rehash` it.
+    """
+    def __init__(
+            self,
+            tables: CoreTables,
+            speed_arrow: Teams = Teams.BLUE,
+            turn: int = 1,
+            hash_key: Optional[int] = None
+    ):
+        """
+        hash_key is the hash of the position, if it is already known.
+        """
+        self.__tables = tables
+        self.hp: array = array('i', tables.max_hp)
+        self.stamina: array = array('i', tables.max_stamina)
+        self.held: array = array('i', [0] * (TEMS * TECHNIQUES))
+        # the tem on each (team, position)
+        self.positions: array = array('i', [EMPTY] * (TEAMS * POSITIONS))
+        self.speed_arrow: int = speed_arrow.value - 1
+        self.turn: int = turn
+        self.winner: Optional[int] = None # a team index or DRAW, once the battle is over
+        self.hash: int = self.compute_hash() if hash_key is None else hash_key
+
+    @staticmethod
+    def from_state(
+            state: BattleState,
+            tables: Optional[CoreTables] = None,
+            snapshot: Optional[BattleSnapshot] = None
+    ) -> BattleCore:
+        """
+        tables are the state's `CoreTables`, if they were already built for its battle.
+        snapshot is the state to build the core from, if not the state as it is now.
+        """
+        if snapshot is None:
+            snapshot = state.snapshot()
+        core = BattleCore(
+            CoreTables.from_state(state) if tables is None else tables,
+            snapshot.speed_arrow, snapshot.phase_turn
+        )
+
+        for team_index, (hps, staminas, held, (positions, _)) in enumerate(
+            zip(snapshot.hps, snapshot.staminas, snapshot.held, snapshot.field_key) # type: ignore
+        ):
+            first = team_index * TEAM_SIZE
+            for slot, hp in enumerate(hps):
+                core.hp[first + slot] = hp
+                core.stamina[first + slot] = staminas[slot]
+                for tech_slot, tech_held in enumerate(held[slot]):
+                    core.held[(first + slot) * TECHNIQUES + tech_slot] = tech_held
+            for position, slot in enumerate(positions):
+                core.positions[team_index * POSITIONS + position] = \
+                    EMPTY if slot == EMPTY else first + slot
+
+        core.rehash()
+        return core
+
+    def to_state(self, state: BattleState):
+        """
+        Writes the core back into the state it was built from.
+        """
+        snapshot = state.snapshot()
+        tables = self.__tables
+        state.restore(BattleSnapshot(
+            field_key=tuple(
+                (
+                    tuple(
+                        tem if tem == EMPTY else tem - team_index * TEAM_SIZE
+                            for tem in self.positions[
+                                team_index * POSITIONS:(team_index + 1) * POSITIONS
+                            ]
+                    ),
+                    BattleField.to_mask(
+                        slot for slot in range(tables.team_sizes[team_index])
+                            if self.hp[team_index * TEAM_SIZE + slot] <= 0
+                    )
+                ) for team_index in range(TEAMS)
+            ),
+            hps=tuple(
+                tuple(self.hp[team_index * TEAM_SIZE:team_index * TEAM_SIZE + len(hps)])
+                    for team_index, hps in enumerate(snapshot.hps)
+            ),
+            staminas=tuple(
+                tuple(self.stamina[team_index * TEAM_SIZE:team_index * TEAM_SIZE + len(hps)])
+                    for team_index, hps in enumerate(snapshot.hps)
+            ),
+            held=tuple(
+                tuple(
+                    tuple(self.held[
+                        (team_index * TEAM_SIZE + slot) * TECHNIQUES:
+                        (team_index * TEAM_SIZE + slot) * TECHNIQUES + len(tem_held)
+                    ]) for slot, tem_held in enumerate(held)
+                ) for team_index, held in enumerate(snapshot.held)
+            ),
+            speed_arrow=list(Teams)[self.speed_arrow],
+            phase=BattlePhase.FINISHED if self.is_over else snapshot.phase,
+            phase_turn=self.turn,
+            selected_actions=(),
+            traits=snapshot.traits,
+        ))
+
+    @property
+    def tables(self) -> CoreTables:
+        return self.__tables
+
+    @property
+    def is_over(self) -> bool:
+        return self.winner is not None
+
+    def compute_hash(self) -> int:
+        """
+        The Zobrist hash of the position, computed from scratch. See `hash_snapshot`.
+        """
+        key = zobrist_key(Feature.SPEED_ARROW, 0, self.speed_arrow) ^ \
+            zobrist_key(Feature.TURN, 0, self.turn)
+        for index, tem in enumerate(self.positions):
+            key ^= zobrist_key(Feature.POSITION, index, tem)
+        for tem in range(TEMS):
+            key ^= zobrist_key(Feature.HP, tem, self.hp[tem]) ^ \
+                zobrist_key(Feature.STAMINA, tem, self.stamina[tem])
+        for technique, held in enumerate(self.held):
+            key ^= zobrist_key(Feature.HELD, technique, held)
+        return key
+
+    def rehash(self):
+        self.hash = self.compute_hash()
+
+    def __set(self, feature: Feature, values: array, index: int, value: int):
+        """
+        Changes a value of one of the arrays, updating the hash.
+        """
+        self.hash ^= zobrist_key(feature, index, values[index]) ^ zobrist_key(feature, index, value)
+        values[index] = value
+
+    def copy(self) -> BattleCore:
+        """
+        Copies the mutable arrays, sharing the tables.
+        """
+        core = BattleCore(self.__tables, list(Teams)[self.speed_arrow], self.turn, self.hash)
+        core.hp = array('i', self.hp)
+        core.stamina = array('i', self.stamina)
+        core.held = array('i', self.held)
+        core.positions = array('i', self.positions)
+        core.winner = self.winner
+        return core
+
+    def switch_candidates(self, team_index: int) -> list[int]:
+        """
+        The team slots of the alive tems on the bench.
+        """
+        first = team_index * TEAM_SIZE
+        active = self.positions[team_index * POSITIONS:(team_index + 1) * POSITIONS]
+        return [
+            slot for slot in range(self.__tables.team_sizes[team_index])
+                if self.hp[first + slot] > 0 and first + slot not in active
+        ]
+
+    def legal_codes(self, team_index: int, position: int) -> list[int]:
+        tem = self.positions[team_index * POSITIONS + position]
+
+        if tem == EMPTY or self.hp[tem] <= 0:
+            return [ActionCode.NO_ACTION]
+
+        tables = self.__tables
+        codes = [ActionCode.REST, ActionCode.RUN] + [
+            ActionCode.switch(slot) for slot in self.switch_candidates(team_index)
+        ]
+
+        held, hold = self.held, tables.hold
+        codes += [
+            code for code, technique in tables.technique_codes[tem]
+                if held[technique] >= hold[technique]
+        ]
+        return codes
+
+    def random_codes(self, rng: Rng, allow_run: bool = False) -> list[int]:
+        """
+        Returns legal codes for every (team, position), chosen at random.
+        """
+        codes: list[int] = []
+
+        for team_index in range(TEAMS):
+            for position in range(POSITIONS):
+                legal = self.legal_codes(team_index, position)
+                if not allow_run and len(legal) > 1:
+                    legal.remove(ActionCode.RUN)
+                if position > 0 and ActionCode.SWITCH <= codes[-1] < ActionCode.TECHNIQUE \
+                        and codes[-1] in legal and len(legal) > 1:
+                    # both positions can't switch in the same tem
+                    legal.remove(codes[-1])
+                codes.append(rng.choice(legal))
+
+        return codes
+
+    def play(self, rng: Rng) -> int:
+        """
+        Plays random turns until the battle is over, returning the winner.
+        """
+        while not self.is_over:
+            self.run_turn(self.random_codes(rng))
+        return self.winner # type: ignore
+
+    def run_turn(self, codes: Sequence[int]):
+        """
+        Runs a turn with the `ActionCode` of every (team, position), by team and position index.
+        """
+        assert not self.is_over, "The battle is already over"
+        tables = self.__tables
+        hp = self.hp
+        order: list[tuple[int, int, int, int, int, int]] = []
+
+        for index, code in enumerate(codes):
+            tem = self.positions[index]
+            if code == ActionCode.NO_ACTION or tem == EMPTY or hp[tem] <= 0:
+                continue
+            team_index = index // POSITIONS
+            if code == ActionCode.RUN:
+                self.winner = 1 - team_index
+                return
+            if code == ActionCode.REST:
+                rank = REST_RANK
+            elif code < ActionCode.TECHNIQUE:
+                rank = SWITCH_RANK
+            else:
+                rank = tables.rank[
+                    tem * TECHNIQUES + (code - ActionCode.TECHNIQUE) // TARGETS
+                ]
+            order.append((rank, tables.speed[tem], team_index, index % POSITIONS, tem, code))
+
+        # a speed tie between teams is resolved by the speed arrow, which then changes sides
+        favoured = self.speed_arrow
+        if {a[:2] for a in order if a[2] == 0} & {a[:2] for a in order if a[2] == 1}:
+            favoured = 1 - self.speed_arrow
+            self.hash ^= zobrist_key(Feature.SPEED_ARROW, 0, self.speed_arrow) ^ \
+                zobrist_key(Feature.SPEED_ARROW, 0, favoured)
+            self.speed_arrow = favoured
+        order.sort(key=lambda a: (-a[0], -a[1], a[2] != favoured))
+
+        for _, _, team_index, position, tem, code in order:
+            if self.positions[team_index * POSITIONS + position] == tem and hp[tem] > 0:
+                self.__run_action(team_index, position, tem, code)
+                if code >= ActionCode.TECHNIQUE and not all(self.__alive()):
+                    break # the battle ends as soon as a team has no tems left
+
+        self.__end_turn()
+
+    def __run_action(self, team_index: int, position: int, tem: int, code: int):
+        tables = self.__tables
+        hp = self.hp
+
+        if code == ActionCode.REST:
+            self.__set(Feature.STAMINA, self.stamina, tem, min(
+                tables.max_stamina[tem],
+                self.stamina[tem] + math.ceil(tables.max_stamina[tem] * REST_STAMINA_RECOVERY)
+            ))
+            return
+
+        if code < ActionCode.TECHNIQUE:
+            incoming = team_index * TEAM_SIZE + code - ActionCode.SWITCH
+            if hp[incoming] > 0 and incoming not in self.positions:
+                self.__set(
+                    Feature.POSITION, self.positions, team_index * POSITIONS + position, incoming
+                )
+            return
+
+        tech_slot, target = divmod(code - ActionCode.TECHNIQUE, TARGETS)
+        technique = tem * TECHNIQUES + tech_slot
+        if self.held[technique] < tables.hold[technique]:
+            return
+
+        self.__set(Feature.HELD, self.held, technique, 0)
+        stamina = self.stamina[tem] - tables.stamina_cost[technique]
+        self.__set(Feature.STAMINA, self.stamina, tem, max(0, stamina))
+        if stamina < 0:
+            # overexertion: the missing stamina is taken from the user's HP
+            self.__set(Feature.HP, hp, tem, max(0, hp[tem] + stamina))
+
+        self.__hit_targets(team_index, position, technique, target)
+
+    def __hit_targets(self, team_index: int, position: int, technique: int, target: int):
+        hp = self.hp
+        damage = self.__tables.damage
+        for side, target_position in TARGET_SLOTS[target][position]:
+            defender = self.positions[(team_index ^ side) * POSITIONS + target_position]
+            if defender != EMPTY and hp[defender] > 0:
+                self.__set(
+                    Feature.HP, hp, defender,
+                    max(0, hp[defender] - damage[technique * TEMS + defender])
+                )
+
+    def __alive(self) -> list[bool]:
+        """
+        Whether each team has tems that haven't fainted.
+        """
+        hp = self.hp
+        return [
+            any(hp[team_index * TEAM_SIZE + slot] > 0 for slot in range(size))
+                for team_index, size in enumerate(self.__tables.team_sizes)
+        ]
+
+    def __end_turn(self):
+        tables = self.__tables
+        hp = self.hp
+
+        for index, tem in enumerate(self.positions):
+            if tem == EMPTY:
+                continue
+            if hp[tem] > 0:
+                for technique in range(tem * TECHNIQUES, (tem + 1) * TECHNIQUES):
+                    if self.held[technique] < tables.hold[technique]:
+                        self.__set(Feature.HELD, self.held, technique, self.held[technique] + 1)
+            else:
+                candidates = self.switch_candidates(index // POSITIONS)
+                if len(candidates) > 0:
+                    self.__set(
+                        Feature.POSITION, self.positions, index,
+                        (index // POSITIONS) * TEAM_SIZE + candidates[0]
+                    )
+
+        self.hash ^= zobrist_key(Feature.TURN, 0, self.turn) ^ \
+            zobrist_key(Feature.TURN, 0, self.turn + 1)
+        self.turn += 1
+        alive = self.__alive()
+
+        if not all(alive):
+            self.winner = alive.index(True) if any(alive) else DRAW
+        elif self.turn > TemTemConstants.BATTLE_MAX_TURNS:
+            self.winner = DRAW
@@ -0,0 +1,139 @@
+from __future__ import annotations
+from typing import Final, Hashable, Iterable, Iterator, Optional, Tuple
+
+from src.battle_team import TeamBattlePosition, Teams
+from src.team import Team
+from src.tem import Tem
+
+
+class BattleField():
+    """
+    Where the tems of each team are. Tems are tracked by their index in the team,
+    as bitmasks where bit `i` is the i-th tem of the team, so bench, alive and active
+    queries are bit operations and the field is cheap to hash and copy.
+    """
+    EMPTY_POSITION: Final[int] = -1
+
+    def __init__(self, teams: dict[Teams, Team]) -> None:
+        self.__teams = teams
+        # initialize battle field as empty
+        # battle_handler must set the tems into the battle field
+        self.__positions: dict[Teams, list[int]] = {
+            team_color: [BattleField.EMPTY_POSITION] * len(TeamBattlePosition)
+                for team_color in Teams
+        }
+        self.__active: dict[Teams, int] = {team_color: 0 for team_color in Teams}
+        self.__roster: dict[Teams, int] = {
+            team_color: (1 << len(team)) - 1 for team_color, team in teams.items()
+        }
+        self.__fainted: dict[Teams, int] = {
+            team_color: BattleField.to_mask(
+                index for index, tem in enumerate(team) if not tem.is_alive
+            ) for team_color, team in teams.items()
+        }
+
+    @staticmethod
+    def to_mask(indexes: Iterable[int]) -> int:
+        mask = 0
+        for index in indexes:
+            mask |= 1 << index
+        return mask
+
+    @staticmethod
+    def to_indexes(mask: int) -> Iterator[int]:
+        while mask:
+            lowest = mask & -mask
+            yield lowest.bit_length() - 1
+            mask ^= lowest
+
+    @property
+    def teams(self) -> dict[Teams, Team]:
+        return self.__teams
+
+    @property
+    def key(self) -> Hashable:
+        """
+        Everything that describes the field, apart from the teams themselves.
+        """
+        return tuple(
+            (tuple(self.__positions[team_color]), self.__fainted[team_color])
+                for team_color in Teams
+        )
+
+    def active_mask(self, team: Teams) -> int:
+        return self.__active[team]
+
+    def bench_mask(self, team: Teams) -> int:
+        return self.__roster[team] & ~self.__active[team]
+
+    def alive_mask(self, team: Teams) -> int:
+        return self.__roster[team] & ~self.__fainted[team]
+
+    def fainted_mask(self, team: Teams) -> int:
+        return self.__fainted[team]
+
+    def switch_mask(self, team: Teams) -> int:
+        """
+        The benched tems that can be switched in.
+        """
+        return self.bench_mask(team) & ~self.__fainted[team]
+
+    def get_tem(self, team: Teams, position: TeamBattlePosition) -> Optional[Tem]:
+        index = self.__positions[team][position.value - 1]
+        return None if index == BattleField.EMPTY_POSITION else self.__teams[team][index]
+
+    def get_bench(self, team: Teams) -> Iterable[Tem]:
+        for index in BattleField.to_indexes(self.bench_mask(team)):
+            yield self.__teams[team][index]
+
+    def get_active(self, team: Teams) -> Iterable[Tuple[TeamBattlePosition,Tem]]:
+        for position in TeamBattlePosition:
+            tem = self.get_tem(team, position)
+            if not tem is None:
+                yield (position, tem)
+
+    def set_position(self, team: Teams, position: TeamBattlePosition, index: int):
+        assert 0 <= index < len(self.__teams[team])
+        previous = self.__positions[team][position.value - 1]
+        assert previous == index or not self.__active[team] >> index & 1, \
+            f"Tem is already on another position: {team=} {index=}"
+
+        if previous != BattleField.EMPTY_POSITION:
+            self.__active[team] &= ~(1 << previous)
+
+        self.__positions[team][position.value - 1] = index
+        self.__active[team] |= 1 << index
+
+    def set_fainted(self, team: Teams, index: int):
+        """
+        Marks the index-th tem of the team as fainted. It stays on its position, if it has one.
+        """
+        assert 0 <= index < len(self.__teams[team])
+        self.__fainted[team] |= 1 << index
+
+    def restore(self, key: Hashable):
+        """
+        Restores the layout of a previous `key` of this field.
+        """
+        for team_color, (positions, fainted) in zip(Teams, key): # type: ignore
+            self.__positions[team_color] = list(positions)
+            self.__active[team_color] = BattleField.to_mask(
+                index for index in positions if index != BattleField.EMPTY_POSITION
+            )
+            self.__fainted[team_color] = fainted
+
+    def copy(self) -> BattleField:
+        """
+        Returns a field with the same layout, sharing the teams.
+        """
+        field = BattleField(self.__teams)
+        field.restore(self.key)
+        return field
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, BattleField) and self.key == other.key and all(
+            self.__teams[team] is other.teams[team] for team in Teams
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.key)
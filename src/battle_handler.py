@@ -1,62 +1,184 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 import asyncio
-from queue import PriorityQueue
-from typing import Iterable, Optional, Type
-from asyncio import Task, TaskGroup
+import heapq
+from dataclasses import dataclass
+import time
+from typing import Awaitable, Hashable, Iterable, Iterator, Optional, Type
 
 from src.battle_agent import BattleAgent
+from src.action_space import EncodedActionSpace, TurnActionCollection
 from src.battle_state import (
     BattlePhase, BattleState, Action, ActionCollection, RunAction,
-    SidedBattleState, UseItemAction, TeamAction,
-    TurnActionCollection, RunnableAction
+    SidedBattleState, UseItemAction, TeamAction, RunnableAction
 )
 from src.battle_team import TeamBattlePosition, Teams
+from src.decision_budget import DecisionBudget, DecisionLatencies, FallbackPolicy
+from src.replay import BattleRecorder
 from src.team import CompetitiveTeam, PlaythroughTeam, Team
-from src.patterns.singleton import singleton
 from src.tem_tem_constants import BATTLE_MAX_TURNS
 
-class BattleActionQueue(PriorityQueue[RunnableAction]):
+class ActionScheduler:
+    """
+    Orders a turn's actions. Every action gets an integer sort key (see
+    `RunnableAction.sort_key`) and they are popped off a heap, so the order is decided
+    once, when the actions are scheduled, with no ties left to resolve.
+    """
+    def __init__(self) -> None:
+        self.__heap: list[tuple[int, RunnableAction]] = []
 
-    def get(self, state: BattleState) -> RunnableAction:
+    def schedule(self, actions: Iterable[RunnableAction], state: BattleState):
         """
-        Returns the next action, using the current state's speed arrow to resolve ties
+        Adds the turn's actions. If tems of both teams tie on rank and speed, the speed
+        arrow changes sides (once per turn) and the team it then points to goes first.
         """
-        candidate_action = super().get()
-        result: RunnableAction = candidate_action
+        actions = list(actions)
+        priorities: dict[Teams, set[tuple[int, int]]] = {team: set() for team in Teams}
+        for action in actions:
+            priorities[action.team].add(action.priority)
 
-        if self.queue[0].priority == candidate_action.priority:
-            # grab them all
-            keep = []
+        favoured = state.speed_tie() if set.intersection(*priorities.values()) \
+            else state.speed_arrow
+        self.__heap = [(action.sort_key(favoured), action) for action in actions]
+        heapq.heapify(self.__heap)
 
-            # Iterate through the queue and collect items with the minimum priority
-            while self.qsize() > 0 and self.queue[0].priority == candidate_action.priority:
-                item = super().get()
-                # if different teams, resolve the tie using state's speed_arrow
-                # we need to check that teams are different because otherwise we
-                # don't switch the arrow
-                same_team: bool = item.team == candidate_action.team
-                if same_team:
-                    keep_a = item
-                else:
-                    priority_team = state.speed_tie()
-                    if priority_team == item.team:
-                        keep_a, result = (candidate_action, item)
-                    else:
-                        keep_a, result = (item, candidate_action)
+    def pop(self) -> RunnableAction:
+        return heapq.heappop(self.__heap)[1]
 
-                keep.append(keep_a)
+    def __len__(self) -> int:
+        return len(self.__heap)
 
-                if not same_team:
-                    # this means a speed tie has been resolved, so we stop looping
-                    # TODO need to check how to resolve speed ties for members of the same team
-                    break
+@dataclass(frozen=True)
+class ActionGenerationStats:
+    reused: int = 0
+    generated: int = 0
 
-            # put the others back in the queue
-            for a in keep:
-                self.put(a)
+    @property
+    def reuse_rate(self) -> float:
+        """
+        The fraction of the per position action sets that were reused from previous turns.
+        """
+        total = self.reused + self.generated
+        return self.reused / total if total > 0 else 0
+
+class ActionGenerationCache:
+    """
+    Keeps the actions generated for each (action type, team, position) of a battle, and
+    only generates them again when their `Action.get_generation_key` changes.
+    """
+    def __init__(self) -> None:
+        self.__entries: dict[
+            tuple[type[Action], Teams, TeamBattlePosition],
+            tuple[Hashable, ActionCollection]
+        ] = {}
+        self.__stats = ActionGenerationStats()
+
+    @property
+    def stats(self) -> ActionGenerationStats:
+        return self.__stats
+
+    def get_possible_actions(
+            self,
+            action_type: type[Action],
+            team: Teams,
+            position: TeamBattlePosition,
+            state: BattleState
+    ) -> ActionCollection:
+        key = action_type.get_generation_key(team, position, state)
+        entry = self.__entries.get((action_type, team, position))
+
+        if entry is not None and entry[0] == key:
+            self.__stats = ActionGenerationStats(self.__stats.reused + 1, self.__stats.generated)
+            return entry[1]
+
+        actions = action_type.get_possible_actions(team, position, state)
+        self.__entries[(action_type, team, position)] = (key, actions)
+        self.__stats = ActionGenerationStats(self.__stats.reused, self.__stats.generated + 1)
+        return actions
+
+class BattleContext:
+    """
+    Everything that changes while a `BattleHandler` drives one battle. Handlers only hold
+    the rules, so a single handler can drive any number of interleaved battles, each
+    with its own context.
+    """
+    def __init__(self, state: BattleState, recorder: Optional[BattleRecorder] = None) -> None:
+        self.__state: BattleState = state
+        self.__recorder: Optional[BattleRecorder] = recorder
+        self.__generation_cache: ActionGenerationCache = ActionGenerationCache()
+        self.__latencies: dict[Teams, DecisionLatencies] = {
+            team: DecisionLatencies() for team in Teams
+        }
+        self.reset()
+
+    @property
+    def state(self) -> BattleState:
+        return self.__state
+
+    @property
+    def recorder(self) -> Optional[BattleRecorder]:
+        """
+        Records the battle's turns, if it has one.
+        """
+        return self.__recorder
+
+    @property
+    def action_scheduler(self) -> ActionScheduler:
+        return self.__action_scheduler
+
+    @property
+    def generation_cache(self) -> ActionGenerationCache:
+        """
+        Kept across `reset`s: the cached actions are only reused while their generation
+        keys match the state.
+        """
+        return self.__generation_cache
+
+    @property
+    def latencies(self) -> dict[Teams, DecisionLatencies]:
+        """
+        How long each team's agent took to decide, kept across `reset`s.
+        """
+        return self.__latencies
+
+    @property
+    def last_action_codes(self) -> dict[Teams, int]:
+        """
+        The previous action of each team, as an `EncodedActionSpace` code.
+        """
+        return self.__last_action_codes
+
+    @property
+    def possible_actions(self) -> Optional[TurnActionCollection]:
+        return self.__possible_actions
+
+    @possible_actions.setter
+    def possible_actions(self, possible_actions: Optional[TurnActionCollection]):
+        self.__possible_actions = possible_actions
+
+    def reset(self):
+        """
+        Forgets the turn in progress, for when the state is restored.
+        """
+        self.__action_scheduler: ActionScheduler = ActionScheduler()
+        self.__possible_actions: Optional[TurnActionCollection] = None
+        self.__last_action_codes: dict[Teams, int] = {}
+        if self.__recorder is not None:
+            self.__recorder.reset()
 
-        return result
+    def record_decision(
+            self,
+            state: SidedBattleState,
+            action: TeamAction,
+            seconds: float,
+            budget: Optional[DecisionBudget] = None,
+            timed_out: bool = False
+    ):
+        self.__latencies[state.side].record(seconds, timed_out)
+        # only the LAST_ACTION fallback needs the previous action, so skip encoding otherwise
+        if budget is not None and budget.fallback == FallbackPolicy.LAST_ACTION \
+                and state.encoded_actions is not None:
+            self.__last_action_codes[state.side] = state.encoded_actions.encode(action)
 
 class BattleHandler(ABC):
     def __init__(
@@ -71,119 +193,222 @@ class BattleHandler(ABC):
             action_type for action_type in Action.__subclasses__()
                 if action_type not in disallowed_actions
         ]
-        self.__clear_action_queue()
-        self._possible_actions: Optional[TurnActionCollection] = None
 
     @property
     def _allowed_actions(self) -> list[type[Action]]:
         return self.__allowed_actions
 
-    async def __ask_player_for_action(
+    def __sided_states(
             self,
-            player: BattleAgent,
-            state: SidedBattleState,
-            team: Teams
-    ) -> tuple[TeamAction, Teams]:
-        return (player.choose_action(state), team)
-
-    async def __ask_for_actions(
-            self,
-            state: BattleState,
+            context: BattleContext,
             players: dict[Teams, BattleAgent]
-    ) -> list[tuple[TeamAction, Teams]]:
-        self.__generate_possible_actions(state)
-        tasks: list[Task[tuple[TeamAction, Teams]]] = []
-
-        async with TaskGroup() as tg:
-            for team in Teams:
-                if not self._possible_actions is None and self.team_has_actions(team) \
-                        and (not state.is_team_action_selected(team)):
-                    sided = SidedBattleState(team, self._possible_actions.for_team(team))
-                    tasks.append(
-                        tg.create_task(
-                            self.__ask_player_for_action(players[team], sided, team)
-                        )
-                    )
-
-        return [t.result() for t in tasks]
-
-    def __clear_action_queue(self):
-        self.__action_queue: BattleActionQueue = BattleActionQueue()
+    ) -> Iterator[SidedBattleState]:
+        """
+        Generates the turn's actions and yields what each team that still has to choose
+        gets to see, when it's its turn to choose: its time limit starts then.
+        """
+        state = context.state
+        self.__generate_possible_actions(context)
+        if context.possible_actions is None:
+            return
 
-    def __process_actions(self, state: BattleState):
-        # add selected actions to the queue
-        for action in state.selected_actions.actions:
-            self.__action_queue.put(action)
+        for team in Teams:
+            if not self.team_has_actions(context, team) or state.is_team_action_selected(team):
+                continue
+            budget = players[team].decision_budget
+            yield SidedBattleState(
+                team,
+                context.possible_actions.for_team(team),
+                EncodedActionSpace(state, team, self._allowed_actions),
+                state,
+                None if budget is None else time.perf_counter() + budget.seconds
+            )
+
+    def __select_actions(self, state: BattleState, actions: Iterable[tuple[TeamAction, Teams]]):
+        for team_action, team in actions:
+            state.select_action(team_action, team)
+
+    def __process_actions(self, context: BattleContext):
+        state = context.state
+        scheduler = context.action_scheduler
+        if context.recorder is not None:
+            context.recorder.record_turn(state)
+        state.traits.start_turn()
+        scheduler.schedule(state.selected_actions.get_runnable_actions(state), state)
 
         # process the actions
-        while self.__action_queue.qsize() > 0 and state.phase[0].value < BattlePhase.FINISHED.value:
-            action = self.__action_queue.get(state)
-            self.__execute_action(action)
+        while len(scheduler) > 0 and state.phase[0].value < BattlePhase.FINISHED.value:
+            action = scheduler.pop()
+            self.__execute_action(action, state)
+            self.__end_battle_if_over(state)
 
-            if self._should_end_battle(state):
-                while state.phase[0].value < BattlePhase.FINISHED.value:
-                    state.next_phase()
+        self.__end_turn(context)
 
-        self.__end_turn(state)
+    def __end_battle_if_over(self, state: BattleState):
+        if state.phase[0].value < BattlePhase.FINISHED.value and self._should_end_battle(state):
+            while state.phase[0].value < BattlePhase.FINISHED.value:
+                state.next_phase()
 
     def _should_end_battle(self, state: BattleState) -> bool:
-        if state.phase[1] > BATTLE_MAX_TURNS:
+        if state.phase[1] > BATTLE_MAX_TURNS or state.forfeited is not None:
             return True
 
         for team in Teams:
-            if not any(state.get_alive_temtems(team)):
+            if not state.has_alive_temtems(team):
                 return True
 
 
         # TODO check max turns a battle can have. end it if we have more than that
         return False
 
-    def __execute_action(self, action: RunnableAction):
-        raise NotImplementedError
+    def __execute_action(self, action: RunnableAction, state: BattleState):
+        action.run(state)
 
     def is_valid_starting_team(self, team: Team) -> bool:
         return isinstance(team, self.__team_class)
 
-    def team_has_actions(self, team: Teams) -> bool:
-        return (not self._possible_actions is None) and \
-            self._possible_actions.team_has_actions(team)
+    def team_has_actions(self, context: BattleContext, team: Teams) -> bool:
+        return (context.possible_actions is not None) and \
+            context.possible_actions.team_has_actions(team)
 
-    def next(self, state: BattleState, players: dict[Teams, BattleAgent]):
+    def __decide(
+            self,
+            context: BattleContext,
+            player: BattleAgent,
+            state: SidedBattleState
+    ) -> tuple[TeamAction, Teams]:
+        budget = player.decision_budget
+        start = time.perf_counter()
+        timed_out = False
+
+        if budget is None:
+            action = player.choose_action(state)
+        else:
+            future = budget.get_executor().submit(player.choose_action, state)
+            try:
+                action = future.result(timeout=budget.seconds)
+            except TimeoutError:
+                # only stops agents that haven't started: the others keep running on the
+                # executor until they return. They read the battle from their state's
+                # snapshot, and the searching ones stop at its deadline
+                future.cancel()
+                timed_out = True
+                action = budget.fallback_action(
+                    state, context.last_action_codes.get(state.side)
+                )
+
+        context.record_decision(state, action, time.perf_counter() - start, budget, timed_out)
+        return (action, state.side)
+
+    async def __adecide(
+            self,
+            context: BattleContext,
+            player: BattleAgent,
+            state: SidedBattleState
+    ) -> tuple[TeamAction, Teams]:
+        budget = player.decision_budget
+        start = time.perf_counter()
+        timed_out = False
+
+        if budget is None:
+            action = await player.achoose_action(state)
+        else:
+            decision: Awaitable[TeamAction] = player.achoose_action(state) \
+                if player.is_async else asyncio.get_running_loop().run_in_executor(
+                    budget.get_executor(), player.choose_action, state
+                )
+            try:
+                action = await asyncio.wait_for(decision, budget.seconds)
+            except TimeoutError:
+                timed_out = True
+                action = budget.fallback_action(
+                    state, context.last_action_codes.get(state.side)
+                )
+
+        context.record_decision(state, action, time.perf_counter() - start, budget, timed_out)
+        return (action, state.side)
+
+    def next(self, context: BattleContext, players: dict[Teams, BattleAgent]):
+        """
+        Plays a turn, asking the players for their actions one after the other.
+        Players with a `decision_budget` play its fallback when they run out of time.
+        """
+        assert len(players) == len(Teams), \
+            f"teams and players must be the same size: {len(players)} players, {len(Teams)} teams"
+
+        if not context.state.is_actions_selected:
+            self.__select_actions(context.state, [
+                self.__decide(context, players[sided.side], sided)
+                    for sided in self.__sided_states(context, players)
+            ])
+        self.__process_actions(context)
+
+    async def anext(self, context: BattleContext, players: dict[Teams, BattleAgent]):
+        """
+        Plays a turn on the running event loop, awaiting the players' actions concurrently.
+        Players with a `decision_budget` play its fallback when they run out of time.
+        """
         assert len(players) == len(Teams), \
             f"teams and players must be the same size: {len(players)} players, {len(Teams)} teams"
 
-        if not state.is_actions_selected:
-            actions = asyncio.run(self.__ask_for_actions(state, players))
-            for team_action, team in actions:
-                state.select_action(team_action, team)
-        self.__process_actions(state)
+        if not context.state.is_actions_selected:
+            self.__select_actions(context.state, await asyncio.gather(*(
+                self.__adecide(context, players[sided.side], sided)
+                    for sided in self.__sided_states(context, players)
+            )))
+        self.__process_actions(context)
 
-    def __end_turn(self, state: BattleState):
+    def __end_turn(self, context: BattleContext):
+        state = context.state
         # clear selected actions from state
         state.clear_action_selection()
-        self._clear_generated_actions()
+        context.possible_actions = None
+        self.__upkeep(state)
 
         # call end turn on child class for specific stuff
         self._end_turn(state)
 
         state.next_turn()
+        # the battle ends on the last turn, without asking for the next one's actions
+        self.__end_battle_if_over(state)
 
-    def _clear_generated_actions(self):
-        self._possible_actions = None
+    def __upkeep(self, state: BattleState):
+        """
+        The techniques of the tems on the field get held for another turn and fainted tems
+        are replaced by the first tem that can be switched in.
+        """
+        for team in Teams:
+            for position in TeamBattlePosition:
+                tem = state.get_tem(team, position)
+                if tem is None:
+                    continue
+                if tem.is_alive:
+                    for technique in tem.battle_techniques:
+                        if not technique.is_ready:
+                            technique.increment_held()
+                    continue
+                replacement = next(iter(state.get_switch_candidates(team)), None)
+                if replacement is not None:
+                    state.set_battlefield_position(
+                        team, position, state.get_team_index(team, replacement)
+                    )
 
-    def __generate_possible_actions(self, state: BattleState):
-        assert not state.is_actions_selected, \
+    def __generate_possible_actions(self, context: BattleContext):
+        assert not context.state.is_actions_selected, \
             "Can't generate actions when actions are already selected."
 
-        self._generate_possible_actions(state)
+        self._generate_possible_actions(context)
 
-    def _generate_possible_actions(self, state: BattleState):
+    def _generate_possible_actions(self, context: BattleContext):
+        state = context.state
         actions: ActionCollection = ActionCollection()
         alllowed = self._allowed_actions
+        cache = context.generation_cache
         for action_type in alllowed:
             for team, position in state.positions:
                 actions_for_type: ActionCollection = \
-                    action_type.get_possible_actions(
+                    cache.get_possible_actions(
+                        action_type,
                         team,
                         position,
                         state
@@ -191,14 +416,13 @@ class BattleHandler(ABC):
                 for team_, position_, action in actions_for_type:
                     actions.add(action, team_, position_)
 
-        self._possible_actions = TurnActionCollection(actions)
+        context.possible_actions = TurnActionCollection(actions)
 
     @abstractmethod
     def _end_turn(self, state: BattleState):
         pass
 
 
-@singleton
 class CompetitiveBattleHandler(BattleHandler):
     def __init__(self):
         super().__init__(CompetitiveTeam, [UseItemAction, RunAction])
@@ -206,25 +430,24 @@ class CompetitiveBattleHandler(BattleHandler):
     def _end_turn(self, state: BattleState):
         raise NotImplementedError
 
-@singleton
 class EnvironmentBattleHandler(BattleHandler, ABC):
     def __init__(self, disallowed_actions: Optional[Iterable[type[Action]]] = None):
         super().__init__(PlaythroughTeam, disallowed_actions)
 
-    def _generate_possible_actions(self, state: BattleState):
+    def _generate_possible_actions(self, context: BattleContext):
+        state = context.state
         if state.phase[0] == BattlePhase.BEFORE_COMBAT:
             # setup the battlefield with the first 2 tems of each team
             for team_color in Teams:
                 for position in TeamBattlePosition:
                     if any(state.get_bench(team_color)):
-                        state.set_battlefield_position(team_color, position, position.value)
+                        state.set_battlefield_position(team_color, position, position.value - 1)
 
             # and advance the phase (to battle)
             state.next_phase()
 
-        super()._generate_possible_actions(state)
+        super()._generate_possible_actions(context)
 
-@singleton
 class TamerBattleHandler(EnvironmentBattleHandler):
     def __init__(self):
         super().__init__(disallowed_actions=[RunAction])
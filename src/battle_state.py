@@ -1,14 +1,30 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
 from enum import auto
-from itertools import product
-from typing import Generator, Iterable, Iterator, Optional, Self, Tuple
+import math
+import time
+from typing import TYPE_CHECKING, Hashable, Iterable, Iterator, NoReturn, Optional, Self, Tuple
+
+from src.action_code import (
+    PRIORITY_RANK, REST_RANK, RUN_RANK, SORT_KEY_SLOTS, SORT_KEY_SPEEDS, SWITCH_RANK, ActionCode,
+    target_slots
+)
+from src.battle_field import BattleField
 from src.battle_team import TeamBattlePosition, Teams
 from src.team import Team
 from src.patterns.sequential_enum import SequentialEnum
 from src.technique import Technique
 from src.targets import ActionTarget
 from src.tem import Tem
+from src.tem_stat import Stat
+import src.tem_tem_constants as TemTemConstants
+from src.traits import TraitEngine, TraitEvent
+from src.zobrist import hash_snapshot
+
+if TYPE_CHECKING:
+    from src.action_space import EncodedActionSpace, TeamActionSpace
 
 
 class BattlePhase(SequentialEnum):
@@ -24,62 +40,92 @@ class BattlePhase(SequentialEnum):
     def prev(self, loop: bool = False) -> Self:
         return super().prev(loop)
 
-# TODO
-class BattleResult():
-    def __init__(self):
-        raise NotImplementedError
+@dataclass(frozen=True)
+class BattleResult:
+    winner: Optional[Teams] # None for a draw
+    turns: int
 
 # TODO
 class SidedBattleState():
-    def __init__(self, side: Teams, possible_actions: Iterable[TeamAction]):
+    def __init__(
+            self,
+            side: Teams,
+            possible_actions: TeamActionSpace,
+            encoded_actions: Optional[EncodedActionSpace] = None,
+            battle_state: Optional[BattleState] = None,
+            deadline: Optional[float] = None
+    ):
+        """
+        deadline is when the team runs out of time to choose, as a `time.perf_counter`
+        value. None if it has no time limit.
+        """
         self.__side = side
         self.__possible_actions = possible_actions
+        self.__encoded_actions = encoded_actions
+        self.__battle_state = battle_state
+        self.__snapshot = None if battle_state is None else battle_state.snapshot()
+        self.__deadline = deadline
 
     @property
     def side(self) -> Teams:
         return self.__side
 
     @property
-    def possible_actions(self) -> Iterable[TeamAction]:
+    def possible_actions(self) -> TeamActionSpace:
         return self.__possible_actions
 
-class BattleField():
-    def __init__(self, teams: dict[Teams, Team]) -> None:
-        self.__teams = teams
-        self.__battle_field: dict[Teams, dict[TeamBattlePosition, Optional[Tem]]] = {}
-
-        # initialize battle field as empty
-        # battle_handler must set the tems into the battle field
-        for team_color in Teams:
-            self.__battle_field[team_color] = {}
-            for position in TeamBattlePosition:
-                self.__battle_field[team_color][position] = None
-
     @property
-    def teams(self) -> dict[Teams, Team]:
-        return self.__teams
-
-    def get_tem(self, team: Teams, position: TeamBattlePosition) -> Optional[Tem]:
-        return self.__battle_field[team][position]
-
-    def get_bench(self, team: Teams) -> Iterable[Tem]:
-        active: list[Tem] = [tem for _, tem in self.get_active(team)]
-
-        for tem in self.__teams[team]:
-            if not tem in active:
-                yield tem
+    def encoded_actions(self) -> Optional[EncodedActionSpace]:
+        """
+        The same actions as `possible_actions`, as integer codes and legality masks.
+        """
+        return self.__encoded_actions
 
-    def get_active(self, team: Teams) -> Iterable[Tuple[TeamBattlePosition,Tem]]:
-        for position, tem in self.__battle_field[team].items():
-            if not tem is None:
-                yield (position, tem)
+    @property
+    def battle_state(self) -> Optional[BattleState]:
+        # for agents that search ahead, which must do so on a copy (like a `BattleCore`)
+        return self.__battle_state
 
-    def set_position(self, team: Teams, position: TeamBattlePosition, index: int):
-        assert 0 < index < len(self.__teams[team])
-        self.__battle_field[team][position] = self.__teams[team][index]
+    @property
+    def snapshot(self) -> Optional[BattleSnapshot]:
+        """
+        The battle state as it was when the team was asked to choose. Agents must read the
+        battle from it rather than from `battle_state`'s tems: an agent that timed out
+        keeps running while the battle goes on.
+        """
+        return self.__snapshot
 
+    @property
+    def deadline(self) -> Optional[float]:
+        return self.__deadline
 
-class BattleState():
+    def seconds_left(self) -> Optional[float]:
+        """
+        How long the team has left to choose, if it has a time limit. Agents that search
+        should stop by then, since a timed out agent can't be interrupted.
+        """
+        return None if self.__deadline is None else max(0.0, self.__deadline - time.perf_counter())
+
+@dataclass(frozen=True)
+class BattleSnapshot: #pylint: disable=too-many-instance-attributes
+    """
+    The mutable part of a `BattleState`, as plain values: restoring it doesn't copy the
+    teams, the tems or their species and technique data, which the state keeps sharing.
+    """
+    field_key: Hashable
+    hps: tuple[tuple[int, ...], ...] # (team, tem)
+    staminas: tuple[tuple[int, ...], ...] # (team, tem)
+    held: tuple[tuple[tuple[int, ...], ...], ...] # (team, tem, technique)
+    speed_arrow: Teams
+    phase: BattlePhase
+    phase_turn: int
+    selected_actions: tuple[tuple[Teams, TeamBattlePosition, Action], ...]
+    battle_turns: int = 0
+    forfeited: Optional[Teams] = None
+    traits: Hashable = () # the `TraitEngine.key`, the start of the battle if empty
+
+
+class BattleState(): #pylint: disable=too-many-instance-attributes,too-many-public-methods
     def __init__(self, team_orange: Team, team_blue: Team):
         self.__battle_field: BattleField = BattleField({
             Teams.ORANGE: team_orange,
@@ -88,20 +134,30 @@ class BattleState():
         self.__speed_arrow: Teams = Teams.BLUE
         self.__phase: BattlePhase = BattlePhase.NOT_STARTED
         self.__reset_phase_turn()
-        self.__history: dict[BattlePhase, list[TurnAction]] = {} # proper class ?
         self.clear_action_selection()
         self.__turn_action: TurnAction = TurnAction()
+        self.__battle_turns: int = 0
+        self.__forfeited: Optional[Teams] = None
+        self.__traits: TraitEngine = TraitEngine(self, [*team_orange, *team_blue])
+
+    @property
+    def traits(self) -> TraitEngine:
+        return self.__traits
 
     @property
     def positions(self) -> Iterator[Tuple[Teams, TeamBattlePosition]]:
         """
-        Returns all the positions that can perform an action (#TODO)
+        Returns all the positions that can perform an action: the ones with an alive tem.
         """
         for team_color in self.__battle_field.teams:
-            # TODO actually check the positions available before yielding
-            for position in TeamBattlePosition:
+            for position in self.get_acting_positions(team_color):
                 yield (team_color, position)
 
+    def get_acting_positions(self, team: Teams) -> Iterator[TeamBattlePosition]:
+        for position, tem in self.__battle_field.get_active(team):
+            if tem.is_alive:
+                yield position
+
     @property
     def selected_actions(self) -> TurnAction:
         return self.__turn_action
@@ -125,10 +181,22 @@ class BattleState():
     def is_over(self) -> bool:
         return self.__phase == BattlePhase.FINISHED
 
+    @property
+    def forfeited(self) -> Optional[Teams]:
+        """
+        The team that ran away, if any.
+        """
+        return self.__forfeited
+
     @property
     def result(self) -> BattleResult:
         assert self.is_over, "Battle must be over to have a result"
-        raise NotImplementedError
+
+        if self.__forfeited is not None:
+            return BattleResult(self.__forfeited.next(), self.__battle_turns)
+
+        alive = [team for team in Teams if self.has_alive_temtems(team)]
+        return BattleResult(alive[0] if len(alive) == 1 else None, self.__battle_turns)
 
     def __reset_phase_turn(self):
         self.__phase_turn: int = 1
@@ -138,9 +206,11 @@ class BattleState():
         return self.phase
 
     def get_alive_temtems(self, team: Teams) -> Iterator[Tem]:
-        for tem in self.__battle_field.teams[team]:
-            if tem.is_alive:
-                yield tem
+        for index in BattleField.to_indexes(self.__battle_field.alive_mask(team)):
+            yield self.__battle_field.teams[team][index]
+
+    def has_alive_temtems(self, team: Teams) -> bool:
+        return self.__battle_field.alive_mask(team) != 0
 
     def select_action(self, action: TeamAction, team: Teams):
         self.__turn_action.add(team, action)
@@ -155,6 +225,25 @@ class BattleState():
     def get_bench(self, team: Teams) -> Iterable[Tem]:
         return self.__battle_field.get_bench(team)
 
+    def get_team(self, team: Teams) -> Team:
+        return self.__battle_field.teams[team]
+
+    def get_tem(self, team: Teams, position: TeamBattlePosition) -> Optional[Tem]:
+        return self.__battle_field.get_tem(team, position)
+
+    def get_switch_candidates(self, team: Teams) -> Iterable[Tem]:
+        """
+        The benched tems that can be switched in.
+        """
+        for index in BattleField.to_indexes(self.__battle_field.switch_mask(team)):
+            yield self.__battle_field.teams[team][index]
+
+    def switch_mask(self, team: Teams) -> int:
+        """
+        The team indexes of the tems that can be switched in, as a bitmask.
+        """
+        return self.__battle_field.switch_mask(team)
+
     def get_techniques(self, team: Teams, position: TeamBattlePosition) -> Iterable[Technique]:
         tem: Optional[Tem] = self.__battle_field.get_tem(team, position)
 
@@ -166,21 +255,113 @@ class BattleState():
     def clear_action_selection(self):
         self.__turn_action: TurnAction = TurnAction()
 
+    @property
+    def speed_arrow(self) -> Teams:
+        """
+        The team that wins the next speed tie.
+        """
+        return self.__speed_arrow
+
     def speed_tie(self) -> Teams:
         self.__speed_arrow = self.__speed_arrow.next()
         return self.__speed_arrow
 
     def next_phase(self) -> BattlePhase:
+        if self.__phase == BattlePhase.BATTLE:
+            self.__battle_turns = self.__phase_turn
         self.__phase = self.__phase.next()
         self.__reset_phase_turn()
         return self.phase[0]
 
     def set_battlefield_position(self, team: Teams, position: TeamBattlePosition, index: int):
         self.__battle_field.set_position(team, position, index)
+        self.__traits.emit(TraitEvent.BATTLEFIELD_ENTRY, team, self.get_team(team)[index])
 
-    def team_has_temtem_in_position(self, team: Teams, position: TeamBattlePosition):
-        # TODO implement a battlefield that takes care of the positions
-        raise NotImplementedError
+    def snapshot(self) -> BattleSnapshot:
+        """
+        Captures everything a battle changes, so that it can be restored later on.
+        """
+        teams = [self.__battle_field.teams[team_color] for team_color in Teams]
+        return BattleSnapshot(
+            field_key=self.__battle_field.key,
+            hps=tuple(tuple(tem.current_hp for tem in team) for team in teams),
+            held=tuple(
+                tuple(tuple(tech.held for tech in tem.battle_techniques) for tem in team)
+                    for team in teams
+            ),
+            speed_arrow=self.__speed_arrow,
+            phase=self.__phase,
+            phase_turn=self.__phase_turn,
+            selected_actions=tuple(self.__turn_action),
+            staminas=tuple(tuple(tem.current_stamina for tem in team) for team in teams),
+            battle_turns=self.__battle_turns,
+            forfeited=self.__forfeited,
+            traits=self.__traits.key,
+        )
+
+    @property
+    def zobrist_hash(self) -> int:
+        """
+        The hash of the state's snapshot, trait state included (see `hash_snapshot`).
+        Computed from scratch, unlike the hash of a `BattleCore` built from the state.
+        """
+        return hash_snapshot(self.snapshot())
+
+    def restore(self, snapshot: BattleSnapshot):
+        """
+        Brings the state back to a snapshot taken from it.
+        """
+        self.__battle_field.restore(snapshot.field_key)
+
+        for team_color, hps, staminas, held in zip(
+            Teams, snapshot.hps, snapshot.staminas, snapshot.held
+        ):
+            for tem, hp, stamina, tem_held in zip(
+                self.__battle_field.teams[team_color], hps, staminas, held
+            ):
+                self.__restore_tem(tem, hp, stamina, tem_held)
+
+        self.__speed_arrow = snapshot.speed_arrow
+        self.__phase = snapshot.phase
+        self.__phase_turn = snapshot.phase_turn
+        self.__battle_turns = snapshot.battle_turns
+        self.__forfeited = snapshot.forfeited
+        self.__traits.restore(snapshot.traits)
+        self.clear_action_selection()
+        team_actions: dict[Teams, dict[TeamBattlePosition, Action]] = defaultdict(dict)
+        for team_color, position, action in snapshot.selected_actions:
+            team_actions[team_color][position] = action
+        for team_color, position_action in team_actions.items():
+            self.select_action(TeamAction(position_action), team_color)
+
+    @staticmethod
+    def __restore_tem(tem: Tem, hp: int, stamina: int, held: tuple[int, ...]):
+        tem.set_hp(hp)
+        tem.set_stamina(stamina)
+        for tech, tech_held in zip(tem.battle_techniques, held):
+            tech.reset_held()
+            tech.increment_held(tech_held)
+
+    def get_team_index(self, team: Teams, tem: Tem) -> int:
+        return list(self.get_team(team)).index(tem)
+
+    def set_fainted(self, team: Teams, tem: Tem):
+        self.__battle_field.set_fainted(team, self.get_team_index(team, tem))
+
+    def damage(self, team: Teams, tem: Tem, amount: int):
+        """
+        Takes HP from one of the team's tems, marking it as fainted when it reaches 0.
+        """
+        tem.set_hp(max(0, tem.current_hp - amount))
+        if not tem.is_alive:
+            self.set_fainted(team, tem)
+            self.__traits.emit_team(TraitEvent.ALLY_KNOCKED_OUT, team, exclude=tem)
+
+    def forfeit(self, team: Teams):
+        self.__forfeited = team
+
+    def team_has_temtem_in_position(self, team: Teams, position: TeamBattlePosition) -> bool:
+        return self.__battle_field.get_tem(team, position) is not None
 
 
 
@@ -226,6 +407,72 @@ class Action(ABC):
         Checks if two actions are compatible for use in the same team.
         """
 
+    @property
+    @abstractmethod
+    def rank(self) -> int:
+        """
+        When the action goes in the turn: higher ranks go first.
+        """
+
+    @abstractmethod
+    def execute(self, team: Teams, position: TeamBattlePosition, state: BattleState):
+        """
+        Applies the action, used by the tem on the team's position, to the state.
+        """
+
+    @property
+    def conflict_key(self) -> Optional[Hashable]:
+        """
+        Actions of different positions of the same team are incompatible when they
+        share a conflict key (that is not None). Must agree with `is_compatible`.
+        """
+        return None
+
+    @classmethod
+    @abstractmethod
+    def get_generation_key(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Hashable:
+        """
+        Everything `get_possible_actions` depends on: while the key stays the same,
+        previously generated actions can be reused.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    @abstractmethod
+    def get_possible_codes(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Iterable[int]:
+        """
+        The `ActionCode`s of the actions `get_possible_actions` would return,
+        without building them.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def encode(self, team: Teams, position: TeamBattlePosition, state: BattleState) -> int:
+        """
+        Returns the `ActionCode` of this action.
+        """
+
+    @property
+    def _key(self) -> Hashable:
+        """
+        What makes two actions of the same type equal.
+        """
+        return self._target
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) is type(other) and self._key == other._key # type: ignore
+
+    def __hash__(self) -> int:
+        return hash((type(self), self._key))
+
 class UseTechniqueAction(Action):
     def __init__(self, selected_target: ActionTarget, technique: Technique):
         super().__init__(selected_target)
@@ -240,6 +487,8 @@ class UseTechniqueAction(Action):
         actions = ActionCollection()
 
         for tech in state.get_techniques(team, position):
+            if not tech.is_ready:
+                continue
             for target in tech.targets.to_action_target():
                 actions.add(
                     cls(selected_target=target, technique=tech),
@@ -249,6 +498,73 @@ class UseTechniqueAction(Action):
 
         return actions
 
+    @classmethod
+    def get_generation_key(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Hashable:
+        return (
+            state.get_tem(team, position),
+            tuple(tech.is_ready for tech in state.get_techniques(team, position))
+        )
+
+    @classmethod
+    def get_possible_codes(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Iterable[int]:
+        for slot, tech in enumerate(state.get_techniques(team, position)):
+            if not tech.is_ready:
+                continue
+            for target in tech.targets.to_action_target():
+                yield ActionCode.technique(slot, target)
+
+    def encode(self, team: Teams, position: TeamBattlePosition, state: BattleState) -> int:
+        slot = [t.name for t in state.get_techniques(team, position)].index(self._technique.name)
+        return ActionCode.technique(slot, self._target)
+
+    @property
+    def technique(self) -> Technique:
+        return self._technique
+
+    @property
+    def rank(self) -> int:
+        return PRIORITY_RANK[self._technique.priority]
+
+    def execute(self, team: Teams, position: TeamBattlePosition, state: BattleState):
+        user = state.get_tem(team, position)
+        assert user is not None, f"There's no tem to use the technique: {team=} {position=}"
+
+        if not self._technique.is_ready:
+            return
+
+        self._technique.reset_held()
+        stamina = user.current_stamina - self._technique.stamina_cost
+        # overexertion: the missing stamina is taken from the user's HP
+        user.set_stamina(max(0, stamina))
+        state.damage(team, user, max(0, -stamina))
+
+        traits = state.traits
+        dealt = traits.technique_used(team, user, self._technique)
+        for side, target_position in target_slots(self._target, position.value - 1):
+            target_team = team if side == 0 else team.next()
+            defender = state.get_tem(target_team, list(TeamBattlePosition)[target_position])
+            if defender is not None and defender.is_alive:
+                modifier = dealt * traits.technique_taken(
+                    team, user, target_team, defender, self._technique
+                )
+                state.damage(
+                    target_team, defender,
+                    user.calculate_atacking_damage(self._technique, defender, modifier)
+                )
+                traits.damage_taken(target_team, defender, self._technique)
+
+    @property
+    def _key(self) -> Hashable:
+        return (self._target, self._technique.name)
+
     def is_compatible(self,
         self_position: TeamBattlePosition,
         other: Action,
@@ -274,7 +590,7 @@ class SwitchTemAction(Action):
     ) -> ActionCollection:
         actions = ActionCollection()
 
-        for temtem in state.get_bench(team):
+        for temtem in state.get_switch_candidates(team):
             actions.add(
                 cls(tem_in=temtem),
                 team,
@@ -283,10 +599,52 @@ class SwitchTemAction(Action):
 
         return actions
 
+    @classmethod
+    def get_generation_key(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Hashable:
+        return state.switch_mask(team)
+
+    @classmethod
+    def get_possible_codes(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Iterable[int]:
+        for slot in BattleField.to_indexes(state.switch_mask(team)):
+            yield ActionCode.switch(slot)
+
+    def encode(self, team: Teams, position: TeamBattlePosition, state: BattleState) -> int:
+        return ActionCode.switch(list(state.get_team(team)).index(self.in_tem))
+
+    @property
+    def _key(self) -> Hashable:
+        return self.in_tem
+
     @property
     def in_tem(self) -> Tem:
         return self.__tem_in
 
+    @property
+    def rank(self) -> int:
+        return SWITCH_RANK
+
+    def execute(self, team: Teams, position: TeamBattlePosition, state: BattleState):
+        if self.in_tem in state.get_switch_candidates(team):
+            state.set_battlefield_position(
+                team, position, state.get_team_index(team, self.in_tem)
+            )
+            state.traits.emit_team(TraitEvent.RIVAL_SWITCHING_OUT, team.next())
+
+    @property
+    def conflict_key(self) -> Optional[Hashable]:
+        """
+        Two positions can't switch in the same tem
+        """
+        return self.in_tem
+
     def is_compatible(self,
         self_position: TeamBattlePosition,
         other: Action,
@@ -320,6 +678,39 @@ class RestAction(Action):
 
         return actions
 
+    @classmethod
+    def get_generation_key(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Hashable:
+        return None
+
+    @classmethod
+    def get_possible_codes(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Iterable[int]:
+        return [ActionCode.REST]
+
+    def encode(self, team: Teams, position: TeamBattlePosition, state: BattleState) -> int:
+        return ActionCode.REST
+
+    @property
+    def rank(self) -> int:
+        return REST_RANK
+
+    def execute(self, team: Teams, position: TeamBattlePosition, state: BattleState):
+        tem = state.get_tem(team, position)
+        assert tem is not None, f"There's no tem to rest: {team=} {position=}"
+        max_stamina = tem.stats[Stat.STA]
+        tem.set_stamina(min(
+            max_stamina,
+            tem.current_stamina + math.ceil(max_stamina * TemTemConstants.REST_STAMINA_RECOVERY)
+        ))
+        state.traits.emit(TraitEvent.RESTING, team, tem)
+
     def is_compatible(self,
         self_position: TeamBattlePosition,
         other: Action,
@@ -331,27 +722,59 @@ class RestAction(Action):
         return self_position != other_position
 
 class UseItemAction(Action):
+    """
+    Items aren't implemented: `BattleState.get_items` never has any, so no item action is
+    ever possible, and encoding or using one raises.
+    """
     def __init__(self, selected_target: ActionTarget, item: Item):
         super().__init__(selected_target)
         self.__item = item
 
+    @staticmethod
+    def __unsupported() -> NoReturn:
+        raise NotImplementedError("Items aren't implemented, so battles can't use them")
+
     @classmethod
     def get_possible_actions(cls,
         team: Teams,
         position: TeamBattlePosition,
         state: BattleState
     ) -> ActionCollection:
-        actions = ActionCollection()
+        if any(state.get_items(team)):
+            cls.__unsupported()
+        return ActionCollection()
 
-        for item in state.get_items(team):
-            for target in item.possible_targets:
-                actions.add(
-                    cls(selected_target=target, item=item),
-                    team,
-                    position
-                )
+    @classmethod
+    def get_generation_key(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Hashable:
+        return tuple(state.get_items(team))
 
-        return actions
+    @classmethod
+    def get_possible_codes(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Iterable[int]:
+        if any(state.get_items(team)):
+            cls.__unsupported()
+        return []
+
+    def encode(self, team: Teams, position: TeamBattlePosition, state: BattleState) -> int:
+        self.__unsupported()
+
+    @property
+    def rank(self) -> int:
+        return SWITCH_RANK
+
+    def execute(self, team: Teams, position: TeamBattlePosition, state: BattleState):
+        self.__unsupported()
+
+    @property
+    def _key(self) -> Hashable:
+        return (self._target, id(self.__item))
 
 class RunAction(Action):
     def __init__(self):
@@ -369,6 +792,32 @@ class RunAction(Action):
 
         return actions
 
+    @classmethod
+    def get_generation_key(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Hashable:
+        return None
+
+    @classmethod
+    def get_possible_codes(cls,
+        team: Teams,
+        position: TeamBattlePosition,
+        state: BattleState
+    ) -> Iterable[int]:
+        return [ActionCode.RUN]
+
+    def encode(self, team: Teams, position: TeamBattlePosition, state: BattleState) -> int:
+        return ActionCode.RUN
+
+    @property
+    def rank(self) -> int:
+        return RUN_RANK
+
+    def execute(self, team: Teams, position: TeamBattlePosition, state: BattleState):
+        state.forfeit(team)
+
     def is_compatible(self,
         self_position: TeamBattlePosition,
         other: Action,
@@ -410,10 +859,11 @@ class TurnAction:
     def to_team_action(self, team: Teams) -> TeamAction:
         return self.__team_actions[team]
 
-    @property
-    def actions(self) -> Iterator[RunnableAction]:
+    def get_runnable_actions(self, state: BattleState) -> Iterator[RunnableAction]:
         for team_color, position, action in self:
-            yield RunnableAction(action=action, team=team_color, position=position)
+            tem = state.get_tem(team_color, position)
+            assert tem is not None, f"There's no tem to act: {team_color=} {position=}"
+            yield RunnableAction(action=action, team=team_color, position=position, tem=tem)
 
     def has_team_action(self, team: Teams) -> bool:
         return team in self.__team_actions
@@ -431,14 +881,16 @@ class TurnAction:
 
 class ActionCollection():
     def __init__(self) -> None:
-        self.__actions: dict[Teams, dict[TeamBattlePosition, set[Action]]] = {
+        # dicts keep the insertion order (unlike sets of id-hashed actions), so that seeded
+        # battles are reproducible
+        self.__actions: dict[Teams, dict[TeamBattlePosition, dict[Action, None]]] = {
             Teams.BLUE: {
-                TeamBattlePosition.LEFT: set(),
-                TeamBattlePosition.RIGHT: set(),
+                TeamBattlePosition.LEFT: {},
+                TeamBattlePosition.RIGHT: {},
             },
             Teams.ORANGE: {
-                TeamBattlePosition.LEFT: set(),
-                TeamBattlePosition.RIGHT: set(),
+                TeamBattlePosition.LEFT: {},
+                TeamBattlePosition.RIGHT: {},
             }
         }
 
@@ -465,24 +917,22 @@ class ActionCollection():
         teams = [team] if team else list(Teams)
         positions = [position] if position else list(TeamBattlePosition)
 
-        res: set[Action] = set()
+        res: dict[Action, None] = {}
 
         for t in teams:
             for p  in positions:
-                actions = self.__actions[t][p]
-                if any(actions):
-                    res = res.union(actions)
+                res.update(self.__actions[t][p])
 
-        return res
+        return res.keys()
 
     def add(self, action: Action, team: Teams, position: TeamBattlePosition):
-        self.__actions[team][position].add(action)
+        self.__actions[team][position][action] = None
 
     def union(self, actions: Self) -> None:
         for t in Teams:
             for p in TeamBattlePosition:
                 if actions.has_actions(t, p):
-                    self.__actions[t][p].union(actions.get_actions(t, p))
+                    self.__actions[t][p].update(dict.fromkeys(actions.get_actions(t, p)))
 
     def __iter__(self) -> Iterator[Tuple[Teams, TeamBattlePosition, Action]]:
         for team in Teams:
@@ -491,62 +941,52 @@ class ActionCollection():
                     for action in self.get_actions(team, position):
                         yield (team, position, action)
 
-class TurnActionCollection():
-    def __init__(self, actions: ActionCollection) -> None:
-        self.__actions: ActionCollection = actions
-
-    def team_has_actions(self, team: Teams) -> bool:
-        return self.__actions.has_actions(team=team)
-
-    def __iter__(self) -> Iterator[TurnAction]:
-        turn_action_lists: Generator[Iterable[TeamAction], None, None] = (
-            self.for_team(team) for team in Teams
-        )
-
-        possibilities = product(*turn_action_lists)
-
-        for possibility in possibilities:
-            turn_action_dict: dict[Teams, TeamAction] = {}
-
-            for team in Teams:
-                turn_action_dict[team] = possibility[team.value - 1] # auto() starts on 1
-
-            yield TurnAction(turn_action_dict)
-
-    def for_team(self, team: Teams) -> Iterable[TeamAction]:
-        # TODO we need to be more efficient. this is very slow
-        # lets first generate team actions, and them combine them all later
-        action_lists: Generator[Iterable[Action], None, None] = (
-            self.__actions.get_actions(team, position)
-                for position in TeamBattlePosition
-                    if self.__actions.has_actions(team, position)
-        )
-
-        possibilities = product(*action_lists)
-
-        for possibility in possibilities:
-            i: int = 0
-
-            team_action_dict: dict[TeamBattlePosition,Action] = {}
-            for position in TeamBattlePosition:
-                if self.__actions.has_actions(team, position):
-                    team_action_dict[position] = possibility[i]
-                i += 1
-            team_action = TeamAction(team_action_dict)
-
-            if team_action.are_actions_compatible:
-                yield team_action
-            else:
-                break
-
 class RunnableAction():
-    def __init__(self, action: Action, team: Teams, position: TeamBattlePosition) -> None:
-        raise NotImplementedError
+    """
+    An action selected by a tem, ordered by its rank, then by the tem's speed and then by
+    the speed arrow.
+    """
+    def __init__(self, action: Action, team: Teams, position: TeamBattlePosition, tem: Tem):
+        self.__action = action
+        self.__team = team
+        self.__position = position
+        self.__tem = tem
+
+    @property
+    def action(self) -> Action:
+        return self.__action
 
     @property
     def team(self) -> Teams:
-        raise NotImplementedError
+        return self.__team
 
     @property
-    def priority(self) -> int:
-        raise NotImplementedError
+    def position(self) -> TeamBattlePosition:
+        return self.__position
+
+    @property
+    def priority(self) -> tuple[int, int]:
+        """
+        Lower priorities go first.
+        """
+        return (-self.__action.rank, -self.__tem.stats[Stat.SPD])
+
+    def sort_key(self, favoured: Teams) -> int:
+        """
+        The priority as a single integer, lower first: rank, then speed, then whether the
+        team loses speed ties, then team and position so that no two actions tie.
+        """
+        rank, speed = self.__action.rank, self.__tem.stats[Stat.SPD]
+        assert 0 <= rank <= RUN_RANK and 0 <= speed < SORT_KEY_SPEEDS, \
+            f"Can't build a sort key: {rank=} {speed=}"
+        key = (RUN_RANK - rank) * SORT_KEY_SPEEDS + SORT_KEY_SPEEDS - 1 - speed
+        key = key * 2 + (self.__team != favoured)
+        return key * SORT_KEY_SLOTS + \
+            (self.__team.value - 1) * len(TeamBattlePosition) + self.__position.value - 1
+
+    def run(self, state: BattleState):
+        """
+        Executes the action, unless its tem has been switched out or has fainted.
+        """
+        if state.get_tem(self.__team, self.__position) is self.__tem and self.__tem.is_alive:
+            self.__action.execute(self.__team, self.__position, state)
@@ -0,0 +1,221 @@
+from __future__ import annotations
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, replace
+from enum import Enum
+import math
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+
+from src.battle_team import Teams
+from src.replay import ReplayLog
+from src.rng import Rng
+from src.sequential import PSEUDO_SCORES, IntervalWidth
+from src.simulate import SimulationConfig, SimulationResults, agent_classes, run_battles
+
+
+class CampaignPolicy(Enum):
+    UNIFORM = "uniform" # every matchup gets the same number of battles
+    UNCERTAINTY = "uncertainty" # battles go to the matchup whose win rate is the least known
+
+
+@dataclass(frozen=True)
+class CampaignProgress:
+    budget: int
+    results: dict[str, SimulationResults] # by matchup
+    seconds: float
+
+    @property
+    def battles(self) -> int:
+        return sum(results.battles for results in self.results.values())
+
+    def __str__(self) -> str:
+        rows = [
+            f"{name}: {results.scores.mean:.3f} ± " +
+                f"{(results.scores + PSEUDO_SCORES).standard_error * 1.96:.3f} " +
+                f"({results.battles} battles)"
+            for name, results in self.results.items()
+        ]
+        return "\n".join(
+            [f"{self.battles}/{self.budget} battles | {self.battles / self.seconds:.1f} battles/s"]
+                + rows
+        )
+
+
+class Campaign:
+    """
+    Spreads a budget of battles over many matchups, a chunk at a time. With the
+    uncertainty policy, each chunk goes to the matchup with the widest confidence interval
+    of orange's score (counting the battles of the chunks it already has running), so
+    lopsided matchups stop getting battles early and close ones get the rest. Matchups
+    whose config has a stopping rule get no more battles once it's met.
+
+    Each chunk of a matchup is seeded by (seed, matchup, chunk), so a matchup's results
+    only depend on how many chunks it got.
+    """
+    def __init__(
+            self,
+            matchups: dict[str, SimulationConfig],
+            budget: int,
+            policy: CampaignPolicy = CampaignPolicy.UNCERTAINTY,
+            chunk_size: int = 10,
+            seed: int = 0
+    ) -> None:
+        self.__matchups = matchups
+        self.__budget = budget
+        self.__policy = policy
+        self.__chunk_size = chunk_size
+        self.__seed = seed
+
+    def priority(self, results: SimulationResults, pending: int) -> float:
+        """
+        How much the matchup needs its next chunk, with pending battles still running.
+        """
+        if self.__policy == CampaignPolicy.UNIFORM:
+            return -(results.battles + pending)
+        scores = results.scores + PSEUDO_SCORES
+        return math.sqrt(scores.variance / (scores.count + pending))
+
+    def __next_matchup(
+        self,
+        results: dict[str, SimulationResults],
+        pending: dict[str, int],
+        remaining: int
+    ) -> Optional[str]:
+        """
+        The matchup the next chunk goes to, if any.
+        """
+        candidates = [
+            name for name, config in self.__matchups.items()
+                if config.stopping is None or not config.stopping.should_stop(
+                    results[name].scores
+                )
+        ]
+        if remaining <= 0 or not candidates:
+            return None
+        return max(candidates, key=lambda name: self.priority(results[name], pending[name]))
+
+    def __chunk(self, name: str, chunks: dict[str, int], remaining: int) -> tuple[Rng, int]:
+        """
+        Takes the next chunk of the matchup: its stream and size.
+        """
+        matchup = list(self.__matchups).index(name)
+        rng = Rng(np.random.SeedSequence(self.__seed, spawn_key=(matchup, chunks[name])))
+        chunks[name] += 1
+        return rng, min(self.__chunk_size, remaining)
+
+    def __add(self, results: dict[str, SimulationResults], name: str, chunk: SimulationResults):
+        """
+        Adds a finished chunk to the matchup's results, moving its replays to the log.
+        """
+        log = self.__matchups[name].replay_log
+        if log is not None:
+            ReplayLog(log).append(*chunk.replays)
+        results[name] = results[name] + replace(chunk, replays=())
+
+    def run(self, workers: int = 1) -> Iterator[CampaignProgress]:
+        """
+        Runs chunks until the budget is spent (or every matchup met its stopping rule),
+        yielding the progress every time one finishes. Across a process pool, a chunk
+        is scheduled whenever a worker is free. Matchups with a replay log append the
+        replays of their chunks to it, as in `simulate`.
+        """
+        start = time.perf_counter()
+        results = {name: SimulationResults() for name in self.__matchups}
+        pending = {name: 0 for name in self.__matchups}
+        chunks = {name: 0 for name in self.__matchups}
+        remaining = self.__budget
+
+        def progress() -> CampaignProgress:
+            return CampaignProgress(self.__budget, dict(results), time.perf_counter() - start)
+
+        if workers <= 1:
+            while (name := self.__next_matchup(results, pending, remaining)) is not None:
+                rng, size = self.__chunk(name, chunks, remaining)
+                remaining -= size
+                self.__add(results, name, run_battles(self.__matchups[name], size, rng))
+                yield progress()
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            running: dict[Future, tuple[str, int]] = {}
+            while True:
+                while len(running) < workers and \
+                        (name := self.__next_matchup(results, pending, remaining)) is not None:
+                    rng, size = self.__chunk(name, chunks, remaining)
+                    remaining -= size
+                    pending[name] += size
+                    running[executor.submit(
+                        run_battles, self.__matchups[name], size, rng
+                    )] = (name, size)
+                if not running:
+                    return
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, size = running.pop(future)
+                    pending[name] -= size
+                    self.__add(results, name, future.result())
+                    yield progress()
+
+
+def main():
+    agents = list(agent_classes())
+    parser = argparse.ArgumentParser(
+        description="Spreads a budget of battles between a team and many opponents, " +
+            "focusing on the matchups whose outcome is the least certain."
+    )
+    parser.add_argument(
+        "--team", type=str, default=None, help="A json file with the team. Random if missing."
+    )
+    parser.add_argument(
+        "--opponents",
+        nargs="+",
+        required=True,
+        help="The json files of the opposing teams, one matchup each.",
+    )
+    parser.add_argument("--agent", choices=agents, default=agents[0], help="Plays the team.")
+    parser.add_argument(
+        "--opponent_agent", choices=agents, default=agents[0], help="Plays the opponents."
+    )
+    parser.add_argument("--budget", type=int, default=1000, help="How many battles to run.")
+    parser.add_argument(
+        "--policy",
+        choices=[policy.value for policy in CampaignPolicy],
+        default=CampaignPolicy.UNCERTAINTY.value,
+        help="How battles are spread over the matchups.",
+    )
+    parser.add_argument(
+        "--ci_width",
+        type=float,
+        default=None,
+        help="Matchups get no more battles once their 95%% confidence interval is this narrow.",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="How many processes to use.")
+    parser.add_argument("--seed", type=int, default=0, help="Seeds every battle.")
+    parser.add_argument(
+        "--chunk_size", type=int, default=10, help="How many battles each task runs."
+    )
+    args = parser.parse_args()
+
+    campaign = Campaign(
+        {
+            opponent: SimulationConfig(
+                teams={Teams.ORANGE: args.team, Teams.BLUE: opponent},
+                agents={Teams.ORANGE: args.agent, Teams.BLUE: args.opponent_agent},
+                stopping=None if args.ci_width is None else IntervalWidth(args.ci_width),
+            ) for opponent in args.opponents
+        },
+        args.budget,
+        CampaignPolicy(args.policy),
+        args.chunk_size,
+        args.seed,
+    )
+    for progress in campaign.run(args.workers):
+        print(progress, end="\n\n", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+import src.tem_tem_constants as TemTemConstants
+from src.technique import Technique
+from src.tem import Tem
+from src.tem_stat import Stat
+from src.traits import damage_bounds
+
+
+def level_axis(min_level: int, max_level: int) -> NDArray[np.int_]:
+    """
+    Returns the levels between min_level and max_level (both included).
+
+    Raises:
+    - AssertionError: If the range is empty or has levels that are not allowed.
+    """
+    assert (
+        TemTemConstants.TEM_MIN_LEVEL <= min_level <= max_level <= TemTemConstants.TEM_MAX_LEVEL
+    ), f"Level range not allowed: {min_level=} {max_level=}"
+    return np.arange(min_level, max_level + 1)
+
+
+@dataclass(frozen=True)
+class DamageCurve:
+    """
+    The damage a technique does across a level axis, as a fraction of the defender's HP.
+
+    `min_percent` is the damage done to the toughest version of the defender and
+    `max_percent` to the frailest one, with the least and most favourable traits (see
+    `damage_bounds`), so the real value lies between both.
+    """
+    technique: Technique
+    levels: NDArray[np.int_]
+    min_percent: NDArray[np.float64]
+    max_percent: NDArray[np.float64]
+
+    def ko_level(self, hits: int, guaranteed: bool = True) -> Optional[int]:
+        """
+        Returns the first level from which the technique KOs in `hits` hits, if any.
+
+        Args:
+        - hits (int): The number of hits (1 for OHKO, 2 for 2HKO...).
+        - guaranteed (bool): Whether to use the minimum damage (True) or the maximum damage.
+        """
+        assert hits > 0, f"Must KO in at least one hit: {hits=}"
+        percent = self.min_percent if guaranteed else self.max_percent
+        reached = np.flatnonzero(percent * hits >= 1)
+        return int(self.levels[reached[0]]) if len(reached) > 0 else None
+
+
+Matchup = tuple[Tem, Tem]
+"""An (attacker, defender) pair."""
+
+
+def damage_curve(
+    technique: Technique,
+    min_matchup: Matchup,
+    max_matchup: Matchup,
+    levels: NDArray[np.int_]
+) -> DamageCurve:
+    """
+    Calculates the damage curve of a technique, with both sides at each level.
+
+    Args:
+    - technique (Technique): The technique being used to attack.
+    - min_matchup (Matchup): The (attacker, defender) pair that yields the least damage.
+    - max_matchup (Matchup): The (attacker, defender) pair that yields the most damage.
+    - levels (NDArray[np.int_]): The level axis, shared by both sides.
+    """
+    def percent(matchup: Matchup, bound: int) -> NDArray[np.float64]:
+        attacker, defender = matchup
+        dmg = attacker.calculate_atacking_damage_curve(
+            technique, defender, levels, damage_bounds(attacker, technique, defender)[bound]
+        )
+        return dmg / defender.stats_curves(levels)[Stat.HP]
+
+    return DamageCurve(
+        technique=technique,
+        levels=levels,
+        min_percent=percent(min_matchup, 0),
+        max_percent=percent(max_matchup, 1),
+    )
+
+
+def damage_curves(
+    min_matchup: Matchup,
+    max_matchup: Matchup,
+    levels: NDArray[np.int_]
+) -> Iterator[DamageCurve]:
+    """
+    Calculates the damage curve of every battle technique of the attacker.
+    Both matchups must have attackers of the same species and techniques.
+    """
+    for technique in min_matchup[0].battle_techniques:
+        yield damage_curve(technique, min_matchup, max_matchup, levels)
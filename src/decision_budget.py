@@ -0,0 +1,99 @@
+from __future__ import annotations
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum, auto
+from functools import cache
+from typing import Optional
+
+import numpy as np
+
+from src.battle_state import SidedBattleState, TeamAction
+from src.rng import Rng
+
+
+class FallbackPolicy(Enum):
+    FIRST_LEGAL = auto()
+    RANDOM = auto()
+    LAST_ACTION = auto() # the team's previous action if it is still legal, else the first legal
+
+
+@cache
+def _default_executor() -> Executor:
+    return ThreadPoolExecutor(thread_name_prefix="battle-agent")
+
+
+@dataclass(frozen=True)
+class DecisionBudget:
+    """
+    How long an agent gets to choose its team action, and what is played instead when it
+    runs out of time.
+
+    Attributes:
+        seconds (float): The time limit of each decision.
+        fallback (FallbackPolicy): How to choose the action of an agent that timed out.
+        executor (Optional[Executor]): Runs the `choose_action` of agents that can't be
+            awaited. A shared thread pool if None. Process pools need the agent and its
+            `SidedBattleState` to be picklable. Agents that time out can't be stopped and
+            keep a worker until they return, so they should stop searching by their
+            state's `deadline`.
+        rng (Optional[Rng]): What the RANDOM fallback draws from. GLOBAL_RNG if None.
+    """
+    seconds: float
+    fallback: FallbackPolicy = FallbackPolicy.FIRST_LEGAL
+    executor: Optional[Executor] = None
+    rng: Optional[Rng] = None
+
+    def get_executor(self) -> Executor:
+        return _default_executor() if self.executor is None else self.executor
+
+    def fallback_action(self, state: SidedBattleState, last_code: Optional[int]) -> TeamAction:
+        """
+        The action played for an agent that timed out.
+        `last_code` is the team's previous action, as an `EncodedActionSpace` code.
+        """
+        if self.fallback == FallbackPolicy.RANDOM:
+            return state.possible_actions.sample(self.rng)
+
+        encoded = state.encoded_actions
+        if self.fallback == FallbackPolicy.LAST_ACTION and last_code is not None \
+                and encoded is not None and encoded.team_mask.flat[last_code]:
+            return encoded.decode(last_code)
+
+        return state.possible_actions[0]
+
+
+class DecisionLatencies:
+    """
+    How long an agent took to choose its actions, including the ones it timed out on.
+    """
+    def __init__(self) -> None:
+        self.__seconds: list[float] = []
+        self.__timeouts: int = 0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        self.__seconds.append(seconds)
+        self.__timeouts += timed_out
+
+    def merge(self, other: DecisionLatencies):
+        self.__seconds.extend(other.samples)
+        self.__timeouts += other.timeouts
+
+    @property
+    def samples(self) -> list[float]:
+        return self.__seconds
+
+    @property
+    def timeouts(self) -> int:
+        return self.__timeouts
+
+    def __len__(self) -> int:
+        return len(self.__seconds)
+
+    def percentiles(self, percents: tuple[float, ...] = (50, 90, 99)) -> dict[float, float]:
+        """
+        The latency percentiles, in seconds. Empty if there were no decisions.
+        """
+        if len(self) == 0:
+            return {}
+        values = np.percentile(self.__seconds, percents)
+        return dict(zip(percents, (float(value) for value in values)))
@@ -0,0 +1,142 @@
+from __future__ import annotations
+from typing import Sequence
+
+from src.action_code import ActionCode
+from src.battle_core import (
+    EMPTY, POSITIONS, TARGET_SLOTS, TARGETS, TEAM_SIZE, TEMS, BattleCore, CoreTables
+)
+from src.mcts import JointAction
+
+# by technique `ActionCode`: the technique it uses and the (defending tem, damage) it hits
+FieldHits = dict[int, tuple[int, tuple[tuple[int, int], ...]]]
+
+
+class DamageTable:
+    """
+    The damage every technique of the active tems deals to each tem it can target, by
+    field. A battle's tems don't change, so its `CoreTables` are built once, and the hits
+    of a field are only worked out the first time it's seen.
+    """
+    def __init__(self, tables: CoreTables) -> None:
+        self.__tables = tables
+        self.__fields: dict[tuple[int, ...], list[FieldHits]] = {}
+
+    @property
+    def tables(self) -> CoreTables:
+        return self.__tables
+
+    def __len__(self) -> int:
+        return len(self.__fields)
+
+    def hits(self, positions: Sequence[int]) -> list[FieldHits]:
+        """
+        The hits of the tem on each (team, position) of the field, by `BattleCore` index.
+        """
+        key = tuple(positions)
+        field = self.__fields.get(key)
+        if field is None:
+            field = self.__fields[key] = [
+                self.__position_hits(key, index) for index in range(len(key))
+            ]
+        return field
+
+    def __position_hits(self, positions: tuple[int, ...], index: int) -> FieldHits:
+        tem = positions[index]
+        if tem == EMPTY:
+            return {}
+
+        tables = self.__tables
+        team_index, position = divmod(index, POSITIONS)
+        hits: FieldHits = {}
+        for code, technique in tables.technique_codes[tem]:
+            target = (code - ActionCode.TECHNIQUE) % TARGETS
+            defenders = (
+                positions[(team_index ^ side) * POSITIONS + target_position]
+                    for side, target_position in TARGET_SLOTS[target][position]
+            )
+            hits[code] = (technique, tuple(
+                (defender, tables.damage[technique * TEMS + defender])
+                    for defender in defenders if defender != EMPTY
+            ))
+        return hits
+
+
+def foe_threat(
+    core: BattleCore,
+    team_index: int,
+    positions: tuple[int, ...],
+    table: DamageTable
+) -> int:
+    """
+    The damage the team takes on the field if every foe uses its best ready technique.
+    """
+    hp, held, hold = core.hp, core.held, table.tables.hold
+    return sum(
+        max((
+            sum(
+                min(hp[defender], damage) for defender, damage in defenders
+                    if defender // TEAM_SIZE == team_index
+            ) for technique, defenders in foe_hits.values()
+                if held[technique] >= hold[technique]
+        ), default=0)
+            for index, foe_hits in enumerate(table.hits(positions))
+                if index // POSITIONS != team_index and positions[index] != EMPTY
+                    and hp[positions[index]] > 0
+    )
+
+
+def score_actions(
+    core: BattleCore,
+    team_index: int,
+    actions: Sequence[JointAction],
+    table: DamageTable
+) -> list[float]:
+    """
+    The immediate damage each of the team's actions deals minus the damage the team takes
+    this turn: from its own techniques (allies hit and overexertion) and from the foes'
+    `foe_threat` once its switches are made. Running away scores -inf.
+    """
+    hits = table.hits(core.positions)
+    threats: dict[tuple[int, ...], int] = {}
+
+    scores: list[float] = []
+    for action in actions:
+        if ActionCode.RUN in action:
+            scores.append(-float("inf"))
+            continue
+
+        net, field = _own_damage(core, team_index, action, hits, table.tables)
+        if field not in threats:
+            threats[field] = foe_threat(core, team_index, field, table)
+        scores.append(net - threats[field])
+
+    return scores
+
+
+def _own_damage(
+    core: BattleCore,
+    team_index: int,
+    action: JointAction,
+    hits: list[FieldHits],
+    tables: CoreTables
+) -> tuple[int, tuple[int, ...]]:
+    """
+    The damage the action deals to foes minus the damage it does to the team, and the
+    field once its switches are made.
+    """
+    hp, stamina = core.hp, core.stamina
+    net = 0
+    positions = list(core.positions)
+    for index, code in enumerate(action, team_index * POSITIONS):
+        if ActionCode.SWITCH <= code < ActionCode.TECHNIQUE:
+            positions[index] = team_index * TEAM_SIZE + code - ActionCode.SWITCH
+        elif code >= ActionCode.TECHNIQUE:
+            technique, defenders = hits[index][code]
+            net += sum(
+                min(hp[defender], damage) * (-1 if defender // TEAM_SIZE == team_index else 1)
+                    for defender, damage in defenders
+            )
+            # overexertion: the missing stamina is taken from the user's HP
+            tem = positions[index]
+            net -= min(hp[tem], max(0, tables.stamina_cost[technique] - stamina[tem]))
+    return net, tuple(positions)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from itertools import product
+import math
+import time
+from typing import Final, Optional, Sequence
+
+from src.action_code import ActionCode
+from src.battle_core import DRAW, POSITIONS, TEAM_SIZE, TEAMS, BattleCore
+from src.rng import Rng
+
+# a team's action in a `BattleCore`: the `ActionCode` of each of its positions
+JointAction = tuple[int, ...]
+
+DEFAULT_ITERATIONS: Final[int] = 100
+
+
+@dataclass(frozen=True)
+class SearchConfig:
+    """
+    Attributes:
+        iterations (Optional[int]): How many playouts a search runs.
+        seconds (Optional[float]): How long a search runs for, whatever comes first.
+            `DEFAULT_ITERATIONS` playouts if neither is given.
+        exploration (float): The UCB1 exploration constant.
+        rollout_turns (int): How many random turns a playout plays before evaluating.
+    """
+    iterations: Optional[int] = None
+    seconds: Optional[float] = None
+    exploration: float = math.sqrt(2)
+    rollout_turns: int = 5
+
+
+@dataclass(frozen=True)
+class SearchStats:
+    iterations: int = 0
+    seconds: float = 0
+
+    @property
+    def iterations_per_second(self) -> float:
+        return self.iterations / self.seconds if self.seconds > 0 else 0
+
+    def __add__(self, other: SearchStats) -> SearchStats:
+        return SearchStats(self.iterations + other.iterations, self.seconds + other.seconds)
+
+
+def team_actions(core: BattleCore, team_index: int) -> list[JointAction]:
+    """
+    The actions the team can take in the core, without running away.
+    """
+    per_position: list[list[int]] = []
+    for position in range(POSITIONS):
+        legal = core.legal_codes(team_index, position)
+        if len(legal) > 1:
+            legal.remove(ActionCode.RUN)
+        per_position.append(legal)
+
+    return [
+        action for action in product(*per_position)
+            # both positions can't switch in the same tem
+            if not (action[0] == action[-1] and
+                ActionCode.SWITCH <= action[0] < ActionCode.TECHNIQUE)
+    ]
+
+
+def evaluate(core: BattleCore, team_index: int) -> float:
+    """
+    How well the battle goes for the team, between 0 (lost) and 1 (won): the result once
+    it's over, and the team's share of the HP left until then.
+    """
+    if core.winner is not None:
+        return 0.5 if core.winner == DRAW else float(core.winner == team_index)
+
+    hps = [
+        sum(core.hp[index * TEAM_SIZE:(index + 1) * TEAM_SIZE]) for index in range(TEAMS)
+    ]
+    return hps[team_index] / sum(hps) if sum(hps) > 0 else 0.5
+
+
+class MCTSNode:
+    """
+    Decoupled UCT statistics of a position: each team has its own visit counts and values
+    for its actions, and picks one independently of the other, as the game is played
+    with simultaneous moves.
+    """
+    __slots__ = ("actions", "visits", "values", "total")
+
+    def __init__(self, actions: Sequence[list[JointAction]]) -> None:
+        self.actions: Sequence[list[JointAction]] = actions # by team index
+        self.visits: list[list[int]] = [[0] * len(team) for team in actions]
+        self.values: list[list[float]] = [[0.0] * len(team) for team in actions]
+        self.total: int = 0
+
+    def select(self, team_index: int, exploration: float, rng: Rng) -> int:
+        """
+        The UCB1 choice of the team: an action it never tried, if any.
+        """
+        visits, values = self.visits[team_index], self.values[team_index]
+        untried = [index for index, count in enumerate(visits) if count == 0]
+        if untried:
+            return rng.choice(untried)
+
+        log_total = math.log(self.total)
+        return max(
+            range(len(visits)),
+            key=lambda index: values[index] / visits[index] +
+                exploration * math.sqrt(log_total / visits[index])
+        )
+
+    def update(self, choices: Sequence[int], values: Sequence[float]):
+        self.total += 1
+        for team_index, (choice, value) in enumerate(zip(choices, values)):
+            self.visits[team_index][choice] += 1
+            self.values[team_index][choice] += value
+
+
+def search( #pylint: disable=too-many-locals
+    core: BattleCore,
+    team_index: int,
+    root_actions: list[JointAction],
+    rng: Rng,
+    config: SearchConfig = SearchConfig()
+) -> tuple[list[int], SearchStats]:
+    """
+    Runs decoupled UCT from the core, which isn't changed, until the config's budget runs
+    out. Positions are stored by their Zobrist hash, so transpositions share their
+    statistics. Playouts run `rollout_turns` random turns and are then `evaluate`d.
+
+    Returns how many times each of the root actions of the team was visited.
+    """
+    iterations = DEFAULT_ITERATIONS if config.iterations is None and config.seconds is None \
+        else config.iterations
+    start = time.perf_counter()
+    deadline = math.inf if config.seconds is None else start + config.seconds
+
+    root_team_actions = [team_actions(core, index) for index in range(TEAMS)]
+    root_team_actions[team_index] = root_actions
+    tree: dict[int, MCTSNode] = {core.hash: MCTSNode(root_team_actions)}
+    done = 0
+
+    while (iterations is None or done < iterations) and time.perf_counter() < deadline:
+        playout = core.copy()
+        path: list[tuple[MCTSNode, list[int]]] = []
+        node: Optional[MCTSNode] = tree[core.hash]
+
+        # selection, until a position that isn't in the tree
+        while node is not None and not playout.is_over:
+            choices = [node.select(index, config.exploration, rng) for index in range(TEAMS)]
+            path.append((node, choices))
+            playout.run_turn([
+                code for index, choice in enumerate(choices)
+                    for code in node.actions[index][choice]
+            ])
+            node = tree.get(playout.hash)
+
+        # expansion and playout
+        if not playout.is_over:
+            tree[playout.hash] = MCTSNode([team_actions(playout, index) for index in range(TEAMS)])
+            for _ in range(config.rollout_turns):
+                if playout.is_over:
+                    break
+                playout.run_turn(playout.random_codes(rng))
+
+        values = [evaluate(playout, index) for index in range(TEAMS)]
+        for visited, choices in path:
+            visited.update(choices, values)
+        done += 1
+
+    return tree[core.hash].visits[team_index], SearchStats(done, time.perf_counter() - start)
@@ -0,0 +1,294 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from enum import Enum, auto
+from itertools import product
+import math
+import time
+from typing import Final, Optional
+
+from src.action_code import ActionCode
+from src.battle_core import (
+    DRAW, EMPTY, POSITIONS, TARGET_SLOTS, TARGETS, TEAM_SIZE, TECHNIQUES, TEMS, BattleCore
+)
+from src.mcts import JointAction
+from src.zobrist import TranspositionTable
+
+WIN: Final[float] = 1000.0 # beyond anything `heuristic` returns for an ongoing battle
+KO_THREAT: Final[float] = 0.25 # worth of an active tem that can knock out a foe this turn
+
+
+class OpponentModel(Enum):
+    WORST_CASE = auto() # minimax: the opponent answers every action with its best one
+    UNIFORM = auto() # expectimax: the opponent picks any of its actions at random
+
+
+@dataclass(frozen=True)
+class MinimaxConfig:
+    """
+    Attributes:
+        max_depth (int): How many turns the search looks ahead, at most.
+        seconds (Optional[float]): How long iterative deepening runs for. The deepest
+            finished search is used, and depth 1 always finishes.
+        breadth (Optional[int]): How many actions of each team are searched, by expected
+            damage. All of them if None.
+        opponent (OpponentModel): How the other team is expected to play.
+    """
+    max_depth: int = 2
+    seconds: Optional[float] = None
+    breadth: Optional[int] = 6
+    opponent: OpponentModel = OpponentModel.WORST_CASE
+
+
+@dataclass(frozen=True)
+class MinimaxStats:
+    nodes: int = 0
+    depth: int = 0 # of the deepest finished search
+    seconds: float = 0
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _Bound(Enum):
+    EXACT = auto()
+    LOWER = auto() # the value is at least the stored one
+    UPPER = auto() # the value is at most the stored one
+
+
+def heuristic(core: BattleCore, team_index: int) -> float:
+    """
+    How well the battle goes for the team, from its point of view: ±`WIN` once it's over,
+    otherwise the difference between the teams' average HP percent, plus `KO_THREAT` for
+    every foe an active tem can knock out with a ready technique (minus the foe's threats).
+    """
+    if core.winner is not None:
+        return 0.0 if core.winner == DRAW else (WIN if core.winner == team_index else -WIN)
+
+    tables = core.tables
+    hp, max_hp = core.hp, tables.max_hp
+    score = 0.0
+    for index, size in enumerate(tables.team_sizes):
+        sign = 1 if index == team_index else -1
+        first = index * TEAM_SIZE
+        score += sign * sum(hp[tem] / max_hp[tem] for tem in range(first, first + size)) / size
+        score += sign * KO_THREAT * _ko_threats(core, index)
+    return score
+
+
+def _ko_threats(core: BattleCore, team_index: int) -> int:
+    """
+    How many active foes an active tem of the team can knock out with a ready technique.
+    """
+    tables = core.tables
+    hp, held, hold, damage = core.hp, core.held, tables.hold, tables.damage
+    foes = [
+        tem for tem in core.positions[(1 - team_index) * POSITIONS:(2 - team_index) * POSITIONS]
+            if tem != EMPTY and hp[tem] > 0
+    ]
+    attackers = [
+        tem for tem in core.positions[team_index * POSITIONS:(team_index + 1) * POSITIONS]
+            if tem != EMPTY and hp[tem] > 0
+    ]
+    return sum(
+        any(
+            held[technique] >= hold[technique] and damage[technique * TEMS + foe] >= hp[foe]
+                for attacker in attackers
+                    for technique in range(attacker * TECHNIQUES, (attacker + 1) * TECHNIQUES)
+        ) for foe in foes
+    )
+
+
+def expected_damage(core: BattleCore, team_index: int, position: int, code: int) -> int:
+    """
+    The damage the code of the team's position deals to the other team if it's used now,
+    not counting overkill. Used to order actions.
+    """
+    tem = core.positions[team_index * POSITIONS + position]
+    if code < ActionCode.TECHNIQUE or tem == EMPTY:
+        return 0
+
+    tech_slot, target = divmod(code - ActionCode.TECHNIQUE, TARGETS)
+    technique = tem * TECHNIQUES + tech_slot
+    total = 0
+    for side, target_position in TARGET_SLOTS[target][position]:
+        defender = core.positions[(team_index ^ side) * POSITIONS + target_position]
+        if side and defender != EMPTY:
+            total += min(core.hp[defender], core.tables.damage[technique * TEMS + defender])
+    return total
+
+
+def ordered_actions(
+    core: BattleCore,
+    team_index: int,
+    breadth: Optional[int] = None
+) -> list[JointAction]:
+    """
+    The team's actions, without running away, by decreasing expected damage. Only the
+    first `breadth` are kept.
+    """
+    per_position: list[list[tuple[int, int]]] = []
+    for position in range(POSITIONS):
+        legal = core.legal_codes(team_index, position)
+        if len(legal) > 1:
+            legal.remove(ActionCode.RUN)
+        per_position.append([
+            (expected_damage(core, team_index, position, code), code) for code in legal
+        ])
+
+    scored = [
+        (sum(damage for damage, _ in action), tuple(code for _, code in action))
+            for action in product(*per_position)
+                # both positions can't switch in the same tem
+                if not (action[0][1] == action[-1][1] and
+                    ActionCode.SWITCH <= action[0][1] < ActionCode.TECHNIQUE)
+    ]
+    scored.sort(key=lambda scored_action: -scored_action[0])
+    return [action for _, action in scored[:breadth]]
+
+
+class MinimaxSearch:
+    """
+    Depth limited search over turns of a `BattleCore`, where both teams act at once.
+
+    Each turn is searched as if the team committed to its action first and the other team
+    answered it: with the worst case opponent, this is minimax, pruned with alpha-beta
+    between the team's actions and the answers to them (the answers to an action stop as
+    soon as it can't beat a better one). A uniform opponent is averaged over instead,
+    which can't be pruned. Actions are searched by expected damage, after the best action
+    of the previous iteration of the deepening, and positions are kept in a
+    `TranspositionTable` with the bound their value is.
+    """
+    def __init__(self, config: MinimaxConfig = MinimaxConfig(), table_size: int = 1 << 16):
+        self.__config = config
+        self.__table: TranspositionTable[tuple[float, _Bound, Optional[JointAction]]] = \
+            TranspositionTable(table_size)
+        self.__nodes = 0
+        self.__deadline = math.inf
+
+    @property
+    def table(self) -> TranspositionTable:
+        return self.__table
+
+    def search(
+        self,
+        core: BattleCore,
+        team_index: int,
+        root_actions: list[JointAction],
+        seconds: Optional[float] = None
+    ) -> tuple[JointAction, MinimaxStats]:
+        """
+        Deepens until the config's depth or time runs out, returning the best root action
+        of the team. The core isn't changed. seconds replaces the config's time limit.
+        """
+        config = self.__config
+        if seconds is None:
+            seconds = config.seconds
+        start = time.perf_counter()
+        self.__nodes = 0
+        self.__table.new_search()
+
+        # the first iteration always finishes
+        self.__deadline = math.inf
+        best, depth = self.__root(core, team_index, root_actions, 1, None), 1
+        self.__deadline = math.inf if seconds is None else start + seconds
+
+        for next_depth in range(2, config.max_depth + 1):
+            try:
+                best = self.__root(core, team_index, root_actions, next_depth, best)
+            except _Timeout:
+                break
+            depth = next_depth
+
+        return best, MinimaxStats(self.__nodes, depth, time.perf_counter() - start)
+
+    def __root(
+        self,
+        core: BattleCore,
+        team_index: int,
+        root_actions: list[JointAction],
+        depth: int,
+        previous: Optional[JointAction]
+    ) -> JointAction:
+        ordered = {action: index for index, action in enumerate(ordered_actions(core, team_index))}
+        actions = sorted(root_actions, key=lambda action: ordered.get(action, len(ordered)))
+        if previous is not None:
+            actions.remove(previous)
+            actions.insert(0, previous)
+        actions = actions[:self.__config.breadth]
+        best_value, best = -math.inf, actions[0]
+        for action in actions:
+            value = self.__answer(core, team_index, action, depth, best_value, math.inf)
+            if value > best_value:
+                best_value, best = value, action
+        return best
+
+    def __value(
+        self,
+        core: BattleCore,
+        team_index: int,
+        depth: int,
+        alpha: float,
+        beta: float
+    ) -> float:
+        if time.perf_counter() >= self.__deadline:
+            raise _Timeout
+        self.__nodes += 1
+        if core.is_over or depth == 0:
+            return heuristic(core, team_index)
+
+        stored = self.__table.get(core.hash, depth)
+        hint: Optional[JointAction] = None
+        if stored is not None:
+            value, bound, hint = stored
+            if bound == _Bound.EXACT or (bound == _Bound.LOWER and value >= beta) or \
+                    (bound == _Bound.UPPER and value <= alpha):
+                return value
+
+        actions = ordered_actions(core, team_index, self.__config.breadth)
+        if hint in actions:
+            actions.remove(hint) # type: ignore
+            actions.insert(0, hint) # type: ignore
+
+        best_value, best, window_alpha = -math.inf, None, alpha
+        for action in actions:
+            value = self.__answer(core, team_index, action, depth, window_alpha, beta)
+            if value > best_value:
+                best_value, best = value, action
+                window_alpha = max(window_alpha, value)
+            if best_value >= beta:
+                break
+
+        bound = _Bound.LOWER if best_value >= beta else \
+            _Bound.UPPER if best_value <= alpha else _Bound.EXACT
+        self.__table.put(core.hash, (best_value, bound, best), depth)
+        return best_value
+
+    def __answer( #pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        core: BattleCore,
+        team_index: int,
+        action: JointAction,
+        depth: int,
+        alpha: float,
+        beta: float
+    ) -> float:
+        """
+        The value of the team's action after the other team's answers.
+        """
+        answers = ordered_actions(core, 1 - team_index, self.__config.breadth)
+        worst_case = self.__config.opponent == OpponentModel.WORST_CASE
+        total, value = 0.0, math.inf
+
+        for answer in answers:
+            child = core.copy()
+            child.run_turn(action + answer if team_index == 0 else answer + action)
+            if worst_case:
+                value = min(value, self.__value(child, team_index, depth - 1, alpha, beta))
+                beta = min(beta, value)
+                if value <= alpha:
+                    break # the team has a better action already
+            else:
+                total += self.__value(child, team_index, depth - 1, -math.inf, math.inf)
+
+        return value if worst_case else total / len(answers)
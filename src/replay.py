@@ -0,0 +1,483 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import mmap
+import os
+import struct
+from typing import BinaryIO, Final, Iterator, Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+from src.action_code import ActionCode
+from src.battle_core import DRAW, EMPTY, POSITIONS, TEAMS, TECHNIQUES, BattleCore
+from src.battle_state import BattleResult, BattleState
+from src.battle_team import TeamBattlePosition, Teams
+from src.rng import Rng
+from src.team import CompetitiveTeam, PlaythroughTeam, Team
+from src.technique import Technique
+from src.tem import SpeciesIdentifier, Tem, TemBattleConfig, TemSpeciesConfig
+from src.tem_stat import Stat
+from src.tem_tem_type import TemTemType
+from src.stats import Stats, SvsInitializer, TvsInitializer
+from src.tempedia import Tempedia
+from src.traits import TRAITS
+
+# the team classes a replay can rebuild, by their index in the log
+TEAM_CLASSES: Final[tuple[type[Team], ...]] = (PlaythroughTeam, CompetitiveTeam)
+NO_TECHNIQUE: Final[int] = 0xFFFF
+NO_SEED: Final[int] = -1
+NO_TRAIT: Final[int] = 0xFF
+CODES_PER_TURN: Final[int] = TEAMS * POSITIONS
+
+# all little-endian, so logs can be shared between machines
+# size of the whole record, seed, index on the stream, stream key length, winner,
+# battle turns, speed arrow, first turn, recorded turns. The stream key follows, as uint32s
+HEADER: Final[struct.Struct] = struct.Struct("<IqIBbHBHH")
+FIELD: Final[struct.Struct] = struct.Struct(f"<{CODES_PER_TURN}b") # team slot by (team, position)
+TEAM: Final[struct.Struct] = struct.Struct("<BB") # team class, tems
+# species, level, secondary type, SVs, TVs, techniques, technique ids, held, hp, stamina,
+# trait by its index in the species' traits
+TEM: Final[struct.Struct] = struct.Struct(
+    f"<HBB{len(Stat)}B{len(Stat)}HB{TECHNIQUES}H{TECHNIQUES}BHHB"
+)
+
+
+@dataclass(frozen=True)
+class TemRecord: #pylint: disable=too-many-instance-attributes
+    """
+    What is needed to build a tem again: its species, stats and techniques by id,
+    and how it was doing when the battle was recorded.
+    """
+    species_id: int
+    level: int
+    secondary_type: TemTemType
+    svs: tuple[int, ...] # by Stat
+    tvs: tuple[int, ...] # by Stat
+    techniques: tuple[int, ...] # technique ids
+    held: tuple[int, ...] # by technique
+    hp: int
+    stamina: int
+    trait: Optional[str] # as the Tempedia spells it, None if it wasn't known
+
+    @staticmethod
+    def from_tem(tem: Tem) -> TemRecord:
+        techniques = list(tem.battle_techniques)
+        return TemRecord(
+            species_id=tem.species_id,
+            level=tem.level,
+            # tems that drew their primary type as the secondary one have no secondary type,
+            # but rebuilding them with NO_TYPE would draw it again
+            secondary_type=tem.primary_type if tem.secondary_type == TemTemType.NO_TYPE
+                else tem.secondary_type,
+            svs=tuple(tem.svs[stat] for stat in Stat),
+            tvs=tuple(tem.tvs[stat] for stat in Stat),
+            techniques=tuple(technique.technique_id for technique in techniques),
+            held=tuple(technique.held for technique in techniques),
+            hp=tem.current_hp,
+            stamina=tem.current_stamina,
+            trait=tem.trait,
+        )
+
+    def to_tem(self) -> Tem:
+        # the secondary type is only used by species that can have more than one
+        tem = Tem(
+            TemSpeciesConfig(SpeciesIdentifier(self.species_id), self.secondary_type),
+            TemBattleConfig(
+                Stats,
+                battle_technique_names=[
+                    Technique.from_id(technique).name for technique in self.techniques
+                ],
+                tvs=TvsInitializer(Stat.initializer_dict_from_list(list(self.tvs))),
+                svs=SvsInitializer(Stat.initializer_dict_from_list(list(self.svs))),
+                level=self.level,
+                trait=self.trait,
+            ),
+        )
+        tem.set_hp(self.hp)
+        tem.set_stamina(self.stamina)
+        for technique, held in zip(tem.battle_techniques, self.held):
+            technique.reset_held()
+            technique.increment_held(held)
+        return tem
+
+    def pack(self) -> bytes:
+        padding = TECHNIQUES - len(self.techniques)
+        return TEM.pack(
+            self.species_id, self.level, self.secondary_type.value, *self.svs, *self.tvs,
+            len(self.techniques), *self.techniques, *([NO_TECHNIQUE] * padding),
+            *self.held, *([0] * padding), self.hp, self.stamina,
+            NO_TRAIT if self.trait is None
+                else Tempedia.get_traits(self.species_id).index(self.trait)
+        )
+
+    @staticmethod
+    def unpack(buffer: bytes, offset: int) -> TemRecord:
+        values = TEM.unpack_from(buffer, offset)
+        stats = len(Stat)
+        species_id, level, secondary_type = values[:3]
+        svs, tvs = values[3:3 + stats], values[3 + stats:3 + 2 * stats]
+        count = values[3 + 2 * stats]
+        techniques = values[4 + 2 * stats:4 + 2 * stats + TECHNIQUES]
+        held = values[4 + 2 * stats + TECHNIQUES:4 + 2 * stats + 2 * TECHNIQUES]
+        return TemRecord(
+            species_id=species_id,
+            level=level,
+            secondary_type=TemTemType(secondary_type),
+            svs=svs,
+            tvs=tvs,
+            techniques=techniques[:count],
+            held=held[:count],
+            hp=values[-3],
+            stamina=values[-2],
+            trait=None if values[-1] == NO_TRAIT
+                else Tempedia.get_traits(species_id)[values[-1]],
+        )
+
+
+def _unpack_teams(
+    buffer: bytes,
+    offset: int
+) -> tuple[tuple[int, ...], tuple[tuple[TemRecord, ...], ...], int]:
+    """
+    Reads the class and tems of each team, returning where they end.
+    """
+    team_classes: list[int] = []
+    tems: list[tuple[TemRecord, ...]] = []
+    for _ in Teams:
+        team_class, count = TEAM.unpack_from(buffer, offset)
+        offset += TEAM.size
+        team_classes.append(team_class)
+        tems.append(tuple(
+            TemRecord.unpack(buffer, offset + slot * TEM.size) for slot in range(count)
+        ))
+        offset += count * TEM.size
+    return tuple(team_classes), tuple(tems), offset
+
+
+@dataclass(frozen=True, eq=False)
+class BattleReplay: #pylint: disable=too-many-instance-attributes
+    """
+    A finished battle, as the teams it started with and the `ActionCode` every
+    (team, position) used on each turn. Replaying it runs a `BattleCore`, without agents.
+
+    Attributes:
+        seed (Optional[int]): What the battle's stream was seeded with, if anything.
+        winner (int): The team index of the winner, or `DRAW`.
+        turns (int): How many turns the battle lasted, as in `BattleResult`.
+        speed_arrow (Teams): The team that won the first speed tie.
+        first_turn (int): The turn the recording started on.
+        positions (tuple[int, ...]): The team slot on each (team, position), or `EMPTY`.
+        team_classes (tuple[int, ...]): The index in `TEAM_CLASSES` of each team's class.
+        tems (tuple[tuple[TemRecord, ...], ...]): The tems of each team.
+        codes (NDArray[np.uint8]): The codes of every turn, with shape
+            (turn, team * POSITIONS + position).
+        stream (tuple[int, ...]): The spawn key of the stream the battle drew from:
+            `Rng(np.random.SeedSequence(seed, spawn_key=stream))`, `Rng(seed)` if empty.
+        index (int): How many battles were played on the stream before this one.
+    """
+    seed: Optional[int]
+    winner: int
+    turns: int
+    speed_arrow: Teams
+    first_turn: int
+    positions: tuple[int, ...]
+    team_classes: tuple[int, ...]
+    tems: tuple[tuple[TemRecord, ...], ...]
+    codes: NDArray[np.uint8]
+    stream: tuple[int, ...] = ()
+    index: int = 0
+
+    @property
+    def result(self) -> BattleResult:
+        return BattleResult(None if self.winner == DRAW else list(Teams)[self.winner], self.turns)
+
+    @property
+    def has_traits(self) -> bool:
+        """
+        Whether a tem has a trait the battle ran, which `BattleCore` doesn't model.
+        """
+        return any(
+            tem.trait is not None and tem.trait in TRAITS and TRAITS[tem.trait].effects
+                for tems in self.tems for tem in tems
+        )
+
+    def new_state(self) -> BattleState:
+        """
+        Builds the battle as it was when the recording started.
+        """
+        teams = [
+            TEAM_CLASSES[team_class]([tem.to_tem() for tem in tems])
+                for team_class, tems in zip(self.team_classes, self.tems)
+        ]
+        state = BattleState(team_orange=teams[0], team_blue=teams[1])
+
+        for team_index, (team, team_tems) in enumerate(zip(Teams, teams)):
+            for position in TeamBattlePosition:
+                slot = self.positions[team_index * POSITIONS + position.value - 1]
+                if slot != EMPTY:
+                    state.set_battlefield_position(team, position, slot)
+            for tem in team_tems:
+                if not tem.is_alive:
+                    state.set_fainted(team, tem)
+
+        return state
+
+    def new_core(self) -> BattleCore:
+        """
+        Builds the battle as it was when the recording started, as a core.
+        """
+        core = BattleCore.from_state(self.new_state())
+        core.speed_arrow = self.speed_arrow.value - 1
+        core.turn = self.first_turn
+        core.rehash()
+        return core
+
+    def replay(self) -> BattleCore:
+        """
+        Runs the recorded turns. The returned core's winner is the recorded one
+        unless the rules changed since the battle was played. Battles with traits can't
+        be replayed, see `has_traits`.
+        """
+        assert not self.has_traits, "BattleCore doesn't run traits, so it can't replay this battle"
+        core = self.new_core()
+
+        for codes in self.codes.tolist():
+            if core.is_over:
+                break
+            core.run_turn(codes)
+
+        return core
+
+    def to_bytes(self) -> bytes:
+        body = b"".join([
+            struct.pack(f"<{len(self.stream)}I", *self.stream),
+            FIELD.pack(*self.positions),
+            *(
+                TEAM.pack(team_class, len(tems)) + b"".join(tem.pack() for tem in tems)
+                    for team_class, tems in zip(self.team_classes, self.tems)
+            ),
+            self.codes.astype(np.uint8).tobytes(),
+        ])
+        return HEADER.pack(
+            HEADER.size + len(body),
+            NO_SEED if self.seed is None else self.seed,
+            self.index,
+            len(self.stream),
+            self.winner,
+            self.turns,
+            self.speed_arrow.value - 1,
+            self.first_turn,
+            len(self.codes),
+        ) + body
+
+    @staticmethod
+    def from_bytes(buffer: bytes, offset: int = 0) -> BattleReplay:
+        _, seed, index, stream_length, winner, battle_turns, speed_arrow, first_turn, turns = \
+            HEADER.unpack_from(buffer, offset)
+        offset += HEADER.size
+        stream = struct.unpack_from(f"<{stream_length}I", buffer, offset)
+        offset += struct.calcsize(f"<{stream_length}I")
+        positions = FIELD.unpack_from(buffer, offset)
+        team_classes, tems, offset = _unpack_teams(buffer, offset + FIELD.size)
+
+        return BattleReplay(
+            seed=None if seed == NO_SEED else seed,
+            winner=winner,
+            turns=battle_turns,
+            speed_arrow=list(Teams)[speed_arrow],
+            first_turn=first_turn,
+            positions=positions,
+            team_classes=team_classes,
+            tems=tems,
+            codes=np.frombuffer(
+                buffer, dtype=np.uint8, count=turns * CODES_PER_TURN, offset=offset
+            ).reshape(turns, CODES_PER_TURN),
+            stream=stream,
+            index=index,
+        )
+
+
+class BattleRecorder:
+    """
+    Records a battle as it is played, to build its `BattleReplay` once it's over.
+    `BattleHandler`s call `record_turn` when a `BattleContext` has a recorder.
+    """
+    def __init__(
+            self,
+            seed: Optional[int] = None,
+            stream: tuple[int, ...] = (),
+            index: int = 0
+    ) -> None:
+        """
+        seed, stream and index say where the battle's random draws came from, as in
+        `BattleReplay`.
+        """
+        self.__seed = seed
+        self.__stream = stream
+        self.__index = index
+        self.reset()
+
+    @staticmethod
+    def on_stream(rng: Rng, index: int) -> BattleRecorder:
+        """
+        Records the battle played on rng after `index` others. Streams that weren't seeded
+        with an int64 (like fresh OS entropy) are recorded without their seed.
+        """
+        seed_sequence = rng.seed_sequence
+        if seed_sequence is None or not isinstance(seed_sequence.entropy, int) or \
+                not 0 <= seed_sequence.entropy < 1 << 63:
+            return BattleRecorder(index=index)
+        return BattleRecorder(seed_sequence.entropy, tuple(seed_sequence.spawn_key), index)
+
+    def reset(self):
+        """
+        Forgets the recorded battle, for when the state is restored.
+        """
+        self.__start: Optional[tuple[Teams, int, tuple[int, ...], tuple[int, ...]]] = None
+        self.__tems: tuple[tuple[TemRecord, ...], ...] = ()
+        self.__codes: bytearray = bytearray()
+
+    @property
+    def turns(self) -> int:
+        return len(self.__codes) // CODES_PER_TURN
+
+    def record_turn(self, state: BattleState):
+        """
+        Records the turn's selected actions, before they run. The first recorded turn
+        also records the teams and the field.
+        """
+        if self.__start is None:
+            self.__record_start(state)
+
+        codes = [ActionCode.NO_ACTION] * CODES_PER_TURN
+        for team, position, action in state.selected_actions:
+            codes[(team.value - 1) * POSITIONS + position.value - 1] = \
+                action.encode(team, position, state)
+        self.__codes.extend(codes)
+
+    def __record_start(self, state: BattleState):
+        positions: list[int] = []
+        for team in Teams:
+            for position in TeamBattlePosition:
+                tem = state.get_tem(team, position)
+                positions.append(EMPTY if tem is None else state.get_team_index(team, tem))
+
+        self.__start = (
+            state.speed_arrow,
+            state.phase[1],
+            tuple(positions),
+            tuple(TEAM_CLASSES.index(type(state.get_team(team))) for team in Teams),
+        )
+        self.__tems = tuple(
+            tuple(TemRecord.from_tem(tem) for tem in state.get_team(team)) for team in Teams
+        )
+
+    def replay(self, state: BattleState) -> BattleReplay:
+        """
+        The replay of the recorded battle, which must be over.
+        """
+        assert state.is_over and self.__start is not None, \
+            "Only battles that were recorded until the end can be replayed"
+        speed_arrow, first_turn, positions, team_classes = self.__start
+        result = state.result
+
+        return BattleReplay(
+            seed=self.__seed,
+            stream=self.__stream,
+            index=self.__index,
+            winner=DRAW if result.winner is None else result.winner.value - 1,
+            turns=result.turns,
+            speed_arrow=speed_arrow,
+            first_turn=first_turn,
+            positions=positions,
+            team_classes=team_classes,
+            tems=self.__tems,
+            codes=np.frombuffer(bytes(self.__codes), dtype=np.uint8).reshape(
+                self.turns, CODES_PER_TURN
+            ),
+        )
+
+
+class ReplayLog:
+    """
+    Replays stored one after the other in a file, e.g. one per campaign. Appending
+    only writes the new records, and reading memory maps the file, so replays are only
+    decoded when they are accessed.
+    """
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.__path = path
+        self.__offsets: list[int] = []
+        self.__indexed: int = 0 # how many bytes of the file the offsets cover
+
+    @property
+    def path(self) -> str | os.PathLike:
+        return self.__path
+
+    def append(self, *replays: BattleReplay):
+        with open(self.__path, "ab") as file:
+            for replay in replays:
+                file.write(replay.to_bytes())
+
+    def __index(self, buffer: mmap.mmap):
+        """
+        Finds the records appended since the last time the log was read.
+        """
+        offset = self.__indexed
+        while offset + HEADER.size <= len(buffer):
+            size = HEADER.unpack_from(buffer, offset)[0]
+            if offset + size > len(buffer):
+                break # a record that is still being written
+            self.__offsets.append(offset)
+            offset += size
+        self.__indexed = offset
+
+    def __mapped(self) -> Optional[tuple[BinaryIO, mmap.mmap]]:
+        """
+        Maps the file and finds the records appended since it was last read.
+        None if there are no records yet.
+        """
+        if not os.path.exists(self.__path) or os.path.getsize(self.__path) == 0:
+            return None
+
+        file = open(self.__path, "rb") #pylint: disable=consider-using-with
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__index(buffer)
+        return (file, buffer)
+
+    def __records(self, indexes: Optional[range] = None) -> Iterator[bytes]:
+        """
+        Yields the bytes of each record, in order.
+        """
+        mapped = self.__mapped()
+        if mapped is None:
+            return
+
+        file, buffer = mapped
+        with file, buffer:
+            for index in range(len(self.__offsets)) if indexes is None else indexes:
+                offset = self.__offsets[index]
+                yield buffer[offset:offset + HEADER.unpack_from(buffer, offset)[0]]
+
+    def __len__(self) -> int:
+        mapped = self.__mapped()
+        if mapped is not None:
+            mapped[1].close()
+            mapped[0].close()
+        return len(self.__offsets)
+
+    def __getitem__(self, index: int) -> BattleReplay:
+        if not 0 <= index < len(self):
+            raise IndexError(f"Replay index out of range: {index=} {len(self)=}")
+        return BattleReplay.from_bytes(next(self.__records(range(index, index + 1))))
+
+    def __iter__(self) -> Iterator[BattleReplay]:
+        for record in self.__records():
+            yield BattleReplay.from_bytes(record)
+
+    def results(self) -> Iterator[BattleResult]:
+        """
+        The result of every battle, read from the record headers only.
+        """
+        for record in self.__records():
+            winner, turns = HEADER.unpack_from(record)[4:6]
+            yield BattleResult(None if winner == DRAW else list(Teams)[winner], turns)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import random
+from typing import MutableSequence, Optional, Sequence, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+SeedLike = int | np.random.SeedSequence | None
+
+
+class Rng:
+    """
+    The random number generator every random draw of the engine goes through.
+
+    Scalar draws use a `random.Random` and bulk draws a NumPy `Generator`, both seeded
+    from the same `SeedSequence`. `split` derives independent child streams from it, so
+    parallel workers and lockstep batches get their own reproducible streams.
+    """
+    def __init__(self, seed: SeedLike = None, scalar: Optional[random.Random] = None) -> None:
+        """
+        Args:
+        - seed (SeedLike): Seeds both generators. Fresh OS entropy if None.
+        - scalar (Optional[random.Random]): Follow an existing generator instead of seeding
+            new ones (see `GLOBAL_RNG`). The seed is ignored.
+        """
+        self.__seed_sequence: Optional[np.random.SeedSequence] = None
+        self.__numpy: Optional[np.random.Generator] = None
+
+        if scalar is not None:
+            self.__scalar = scalar
+            return
+
+        self.__seed_sequence = seed if isinstance(seed, np.random.SeedSequence) \
+            else np.random.SeedSequence(seed)
+        # PCG64 uses the first words of the sequence's state, the scalar generator the next
+        words = self.__seed_sequence.generate_state(16)
+        self.__scalar = random.Random(int.from_bytes(words[8:].tobytes(), "little"))
+        self.__numpy = np.random.Generator(np.random.PCG64(self.__seed_sequence))
+
+    @property
+    def seed_sequence(self) -> Optional[np.random.SeedSequence]:
+        """
+        What the generators were seeded from. None for generators that follow an existing
+        `random.Random`.
+        """
+        return self.__seed_sequence
+
+    @property
+    def numpy(self) -> np.random.Generator:
+        """
+        The generator for bulk draws. Generators that follow an existing `random.Random`
+        seed a new one from it on every call, so keep it around when drawing in a loop.
+        """
+        if self.__numpy is None:
+            return np.random.Generator(np.random.PCG64(self.__scalar.getrandbits(128)))
+        return self.__numpy
+
+    def split(self, n: int) -> list[Rng]:
+        """
+        Returns n new independent generators. Splitting again gives n different ones.
+        """
+        seed_sequence = np.random.SeedSequence(self.__scalar.getrandbits(128)) \
+            if self.__seed_sequence is None else self.__seed_sequence
+        return [Rng(child) for child in seed_sequence.spawn(n)]
+
+    def random(self) -> float:
+        return self.__scalar.random()
+
+    def randint(self, a: int, b: int) -> int:
+        """
+        Returns an integer in [a, b].
+        """
+        return self.__scalar.randint(a, b)
+
+    def randrange(self, stop: int) -> int:
+        """
+        Returns an integer in [0, stop).
+        """
+        return self.__scalar.randrange(stop)
+
+    def choice(self, seq: Sequence[T]) -> T:
+        return self.__scalar.choice(seq)
+
+    def sample(self, population: Sequence[T], k: int) -> list[T]:
+        return self.__scalar.sample(population, k)
+
+    def shuffle(self, seq: MutableSequence[T]):
+        self.__scalar.shuffle(seq)
+
+
+# follows the `random` module, so code that isn't given a generator can still be seeded
+# with `random.seed`
+GLOBAL_RNG: Rng = Rng(scalar=random.random.__self__) # type: ignore
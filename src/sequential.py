@@ -0,0 +1,122 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+import math
+from statistics import NormalDist
+from typing import Final, Optional
+
+
+@dataclass(frozen=True)
+class Welford:
+    """
+    The running mean and variance of a stream of values (Welford's algorithm). Two of them
+    add up to the statistics of both streams, so chunks can be aggregated in any order.
+    """
+    count: int = 0
+    mean: float = 0
+    m2: float = 0 # the sum of squared differences from the mean
+
+    def add(self, value: float) -> Welford:
+        count = self.count + 1
+        delta = value - self.mean
+        mean = self.mean + delta / count
+        return Welford(count, mean, self.m2 + delta * (value - mean))
+
+    def __add__(self, other: Welford) -> Welford:
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        return Welford(
+            count,
+            self.mean + delta * other.count / count,
+            self.m2 + other.m2 + delta ** 2 * self.count * other.count / count,
+        )
+
+    @property
+    def variance(self) -> float:
+        """
+        The sample variance, 0 until there are two values.
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0
+
+    @property
+    def standard_error(self) -> float:
+        return math.sqrt(self.variance / self.count) if self.count > 0 else math.inf
+
+    def interval(self, confidence: float = 0.95) -> tuple[float, float]:
+        """
+        The normal approximation confidence interval of the mean.
+        """
+        margin = NormalDist().inv_cdf((1 + confidence) / 2) * self.standard_error
+        return self.mean - margin, self.mean + margin
+
+
+# two wins and two losses, like the Agresti-Coull interval adds
+PSEUDO_SCORES: Final[Welford] = Welford(4, 0.5, 1.0)
+
+
+class StoppingRule(ABC):
+    """
+    Decides when a stream of battle scores (1 for a win, 0.5 for a draw, 0 for a loss)
+    says enough to stop running battles. Rules never stop before `min_battles`, and
+    judge the scores with `PSEUDO_SCORES` added, so that a run of identical scores can't
+    pass for a precise estimate.
+    """
+    min_battles: int
+
+    @abstractmethod
+    def is_met(self, scores: Welford) -> bool:
+        pass
+
+    def should_stop(self, scores: Welford) -> bool:
+        return scores.count >= self.min_battles and self.is_met(scores)
+
+
+@dataclass(frozen=True)
+class IntervalWidth(StoppingRule):
+    """
+    Stops once the confidence interval of the mean score is at most `width` wide.
+    """
+    width: float
+    confidence: float = 0.95
+    min_battles: int = 30
+
+    def is_met(self, scores: Welford) -> bool:
+        low, high = (scores + PSEUDO_SCORES).interval(self.confidence)
+        return high - low <= self.width
+
+
+@dataclass(frozen=True)
+class SPRT(StoppingRule):
+    """
+    Wald's sequential probability ratio test of the mean score being `p0` against it
+    being `p1`, with the given error rates. The log likelihood ratio uses the normal
+    approximation with the sample variance, so draws count as half a win.
+    """
+    p0: float
+    p1: float
+    alpha: float = 0.05 # the chance of accepting p1 when it's p0
+    beta: float = 0.05 # the chance of accepting p0 when it's p1
+    min_battles: int = 30
+
+    def llr(self, scores: Welford) -> float:
+        scores = scores + PSEUDO_SCORES
+        return scores.count * (self.p1 - self.p0) * \
+            (2 * scores.mean - self.p0 - self.p1) / (2 * scores.variance)
+
+    def verdict(self, scores: Welford) -> Optional[bool]:
+        """
+        True once p1 is accepted, False once p0 is, None while the test goes on.
+        """
+        llr = self.llr(scores)
+        if llr >= math.log((1 - self.beta) / self.alpha):
+            return True
+        if llr <= math.log(self.beta / (1 - self.alpha)):
+            return False
+        return None
+
+    def is_met(self, scores: Welford) -> bool:
+        return self.verdict(scores) is not None
@@ -0,0 +1,286 @@
+from __future__ import annotations
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+import json
+import os
+import time
+from typing import Iterator, Optional
+
+from src.battle import Battle
+from src.battle_agent import BattleAgent
+from src.battle_handler import TamerBattleHandler
+from src.battle_state import BattleState
+from src.battle_team import Teams
+from src.replay import BattleRecorder, BattleReplay, ReplayLog
+from src.rng import Rng
+from src.sequential import SPRT, IntervalWidth, StoppingRule, Welford
+from src.team import PlaythroughTeam
+from src.tem import Tem, TemBattleConfig, TemSpeciesConfig
+from src.tem_stat import Stat
+
+
+def agent_classes() -> dict[str, type[BattleAgent]]:
+    return {agent.__name__: agent for agent in BattleAgent.__subclasses__()}
+
+
+def load_team(path: str, rng: Optional[Rng] = None) -> PlaythroughTeam:
+    """
+    Loads a team from a json list of tems, in the format of nuzlocke_helper's my_team.json.
+    Missing SVs are drawn with rng, missing TVs are 0 and tems without a "trait" battle without one.
+    """
+    with open(path, encoding="utf8") as file:
+        configs = json.load(file)
+
+    return PlaythroughTeam([
+        Tem(
+            species_config=TemSpeciesConfig.from_data(config["name"]),
+            battle_config=TemBattleConfig.from_data(
+                battle_techniques=config["techniques"],
+                level=config["level"],
+                svs=config.get("svs"),
+                tvs=config.get("tvs", [0] * len(Stat)),
+                rng=rng,
+                trait=config.get("trait")
+            ),
+            nickname=config.get("nickname", ""),
+            rng=rng
+        ) for config in configs
+    ])
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    """
+    Attributes:
+        teams (dict[Teams, Optional[str]]): The json file of each team, None for random teams.
+        agents (dict[Teams, str]): The `BattleAgent` class name of each team.
+        replay_log (Optional[str | os.PathLike]): Where to append the replay of every
+            battle. Battles aren't recorded if None.
+        stopping (Optional[StoppingRule]): Stops `simulate` early once orange's scores
+            meet it. Every battle is run if None.
+    """
+    teams: dict[Teams, Optional[str]]
+    agents: dict[Teams, str]
+    replay_log: Optional[str | os.PathLike] = None
+    stopping: Optional[StoppingRule] = None
+
+    def new_state(self, rng: Optional[Rng] = None) -> BattleState:
+        teams = {
+            team: PlaythroughTeam.get_random(rng) if path is None else load_team(path, rng)
+                for team, path in self.teams.items()
+        }
+        return BattleState(team_orange=teams[Teams.ORANGE], team_blue=teams[Teams.BLUE])
+
+
+@dataclass(frozen=True)
+class SimulationResults:
+    battles: int = 0
+    orange_wins: int = 0
+    blue_wins: int = 0
+    turns: int = 0
+    seconds: float = 0 # spent running battles, summed over every worker
+    replays: tuple[BattleReplay, ...] = () # of the battles, when they are recorded
+    scores: Welford = Welford() # of orange: 1 for a win, 0.5 for a draw, 0 for a loss
+
+    @property
+    def draws(self) -> int:
+        return self.battles - self.orange_wins - self.blue_wins
+
+    @property
+    def mean_turns(self) -> float:
+        return self.turns / self.battles if self.battles > 0 else 0
+
+    def win_rate(self, team: Optional[Teams]) -> float:
+        """
+        The fraction of battles won by the team, or drawn if team is None.
+        """
+        if self.battles == 0:
+            return 0
+        wins = {None: self.draws, Teams.ORANGE: self.orange_wins, Teams.BLUE: self.blue_wins}
+        return wins[team] / self.battles
+
+    def __add__(self, other: SimulationResults) -> SimulationResults:
+        return SimulationResults(
+            self.battles + other.battles,
+            self.orange_wins + other.orange_wins,
+            self.blue_wins + other.blue_wins,
+            self.turns + other.turns,
+            self.seconds + other.seconds,
+            self.replays + other.replays,
+            self.scores + other.scores,
+        )
+
+    def __str__(self) -> str:
+        return f"{self.battles} battles | " + \
+            f"orange {self.win_rate(Teams.ORANGE):.1%} " + \
+            f"blue {self.win_rate(Teams.BLUE):.1%} " + \
+            f"draws {self.win_rate(None):.1%} | " + \
+            f"orange score {self.scores.mean:.3f} ± {self.scores.standard_error * 1.96:.3f} | " + \
+            f"{self.mean_turns:.1f} turns/battle"
+
+
+def run_battles(config: SimulationConfig, battles: int, rng: Rng) -> SimulationResults:
+    """
+    Runs battles one after the other, with teams and agents drawing from rng.
+    When both teams come from files, the same state is reset between battles.
+    Battles with a replay log are returned as replays, which record rng's seed and
+    stream and the battle's index in the chunk.
+    """
+    record = config.replay_log is not None
+    start = time.perf_counter()
+    agents = agent_classes()
+    players: dict[Teams, BattleAgent] = {
+        team: agents[name](rng) for team, name in config.agents.items()
+    }
+    fixed_teams = all(path is not None for path in config.teams.values())
+    results = SimulationResults()
+    battle: Optional[Battle] = None
+
+    for index in range(battles):
+        if battle is not None and fixed_teams:
+            battle.reset()
+            state = battle.state
+        else:
+            state = config.new_state(rng)
+        battle = Battle(
+            state,
+            TamerBattleHandler(),
+            BattleRecorder.on_stream(rng, index) if record else None
+        )
+
+        result = battle.run(players)
+        results = results + SimulationResults(
+            battles=1,
+            orange_wins=int(result.winner == Teams.ORANGE),
+            blue_wins=int(result.winner == Teams.BLUE),
+            turns=result.turns,
+            replays=(battle.replay(),) if record else (),
+            scores=Welford().add(
+                0.5 if result.winner is None else float(result.winner == Teams.ORANGE)
+            ),
+        )
+
+    return results + SimulationResults(seconds=time.perf_counter() - start)
+
+
+def simulate(
+    config: SimulationConfig,
+    battles: int,
+    workers: int = 1,
+    seed: int = 0,
+    chunk_size: int = 10
+) -> Iterator[SimulationResults]:
+    """
+    Runs the battles in chunks across a process pool, yielding the results accumulated so
+    far every time a chunk finishes. Each chunk gets its own stream, split from `seed` by
+    the chunk's index, so the final results don't depend on the number of workers.
+    With a single worker, the chunks run in this process.
+    With a replay log, every battle is recorded and appended to it as its chunk finishes
+    (in the order chunks finish), instead of being kept in the results.
+    With a stopping rule, `battles` is the most that are run: the simulation stops as soon
+    as the results of the finished chunks meet it. Across a process pool, chunks finish in
+    any order, so where it stops can vary.
+    """
+    sizes = [min(chunk_size, battles - first) for first in range(0, battles, chunk_size)]
+    rngs = Rng(seed).split(len(sizes))
+    total = SimulationResults()
+
+    def add(results: SimulationResults) -> SimulationResults:
+        if config.replay_log is not None:
+            ReplayLog(config.replay_log).append(*results.replays)
+        return total + replace(results, replays=())
+
+    def stop() -> bool:
+        return config.stopping is not None and config.stopping.should_stop(total.scores)
+
+    if workers <= 1:
+        for size, rng in zip(sizes, rngs):
+            total = add(run_battles(config, size, rng))
+            yield total
+            if stop():
+                return
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(run_battles, config, size, rng)
+                for size, rng in zip(sizes, rngs)
+        ]
+        for future in as_completed(futures):
+            total = add(future.result())
+            yield total
+            if stop():
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+
+
+def main():
+    agents = list(agent_classes())
+    parser = argparse.ArgumentParser(
+        description="Runs many battles between two teams and reports the aggregated results."
+    )
+    for team in Teams:
+        name = team.name.lower()
+        parser.add_argument(
+            f"--{name}",
+            type=str,
+            default=None,
+            help=f"A json file with the {name} team (like my_team.json). Random if missing.",
+        )
+        parser.add_argument(
+            f"--{name}_agent",
+            choices=agents,
+            default=agents[0],
+            help=f"The agent that plays the {name} team.",
+        )
+    parser.add_argument("--battles", type=int, default=100, help="How many battles to run.")
+    parser.add_argument("--workers", type=int, default=1, help="How many processes to use.")
+    parser.add_argument("--seed", type=int, default=0, help="Seeds every battle.")
+    parser.add_argument(
+        "--chunk_size", type=int, default=10, help="How many battles each task runs."
+    )
+    parser.add_argument(
+        "--replay_log",
+        type=str,
+        default=None,
+        help="Appends the replay of every battle to this file.",
+    )
+    stopping = parser.add_mutually_exclusive_group()
+    stopping.add_argument(
+        "--ci_width",
+        type=float,
+        default=None,
+        help="Stops once the 95%% confidence interval of orange's score is this narrow.",
+    )
+    stopping.add_argument(
+        "--sprt",
+        type=float,
+        nargs=2,
+        metavar=("P0", "P1"),
+        default=None,
+        help="Stops once an SPRT accepts that orange's mean score is P0 or P1.",
+    )
+    args = parser.parse_args()
+
+    config = SimulationConfig(
+        teams={team: getattr(args, team.name.lower()) for team in Teams},
+        agents={team: getattr(args, f"{team.name.lower()}_agent") for team in Teams},
+        replay_log=args.replay_log,
+        stopping=IntervalWidth(args.ci_width) if args.ci_width is not None
+            else SPRT(*args.sprt) if args.sprt is not None else None,
+    )
+    start = time.perf_counter()
+    results = SimulationResults()
+    for results in simulate(config, args.battles, args.workers, args.seed, args.chunk_size):
+        elapsed = time.perf_counter() - start
+        print(f"{results} | {results.battles / elapsed:.1f} battles/s", flush=True)
+
+    if isinstance(config.stopping, SPRT):
+        verdict = config.stopping.verdict(results.scores)
+        print(f"SPRT: {'undecided' if verdict is None else 'P1' if verdict else 'P0'}")
+    print(f"done in {time.perf_counter() - start:.2f} s ({results.seconds:.2f} s of battles)")
+
+
+if __name__ == "__main__":
+    main()
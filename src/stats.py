@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-import random
-from typing import TypeVar
+from typing import Optional, TypeVar
 
+import numpy as np
+from numpy.typing import NDArray
 from typing_extensions import NotRequired, TypedDict
 
+from src.rng import GLOBAL_RNG, Rng
 import src.tem_tem_constants as TemTemConstants
 from src.tem_stat import Stat, StatValueType, TemStat
 from src.stats_initializer import BaseValueInitializer, SvsInitializer, TvsInitializer
@@ -13,7 +15,7 @@ T = TypeVar("T")
 U = TypeVar("U")
 
 
-def array_sum(n: int, s: int, m: int) -> list[int]:
+def array_sum(n: int, s: int, m: int, rng: Optional[Rng] = None) -> list[int]:
     """
     Generate a list of n random integers between 1 and m that sum up to s or as close as possible.
 
@@ -21,6 +23,7 @@ def array_sum(n: int, s: int, m: int) -> list[int]:
         n (int): Length of the list to be generated.
         s (int): Desired sum of the list to be generated.
         m (int): Maximum possible integer value for the elements of the list to be generated.
+        rng (Optional[Rng]): The random number generator. GLOBAL_RNG if None.
 
     Returns:
         list[int]: A list of n random integers between 1 and m that sum up to s
@@ -36,6 +39,8 @@ def array_sum(n: int, s: int, m: int) -> list[int]:
         min(n, s, m) > 0 and m * n >= s
     ), f"Cant provide an array with length {n} and sum {s} having max element  {m}."
 
+    rng = GLOBAL_RNG if rng is None else rng
+
     # Initialize a list of n elements with 0s
     result = [0] * n
 
@@ -46,7 +51,7 @@ def array_sum(n: int, s: int, m: int) -> list[int]:
     while sum(result) < s:
 
         # Pick a random index from the not_maxed list
-        i = random.randint(0, len(not_maxed) - 1)
+        i = rng.randint(0, len(not_maxed) - 1)
         j = not_maxed[i]
 
         # Get the current value of the element at index j
@@ -54,7 +59,7 @@ def array_sum(n: int, s: int, m: int) -> list[int]:
 
         # Generate a random integer between 1 and the remaining amount needed to reach
         # the desired sum or m, whichever is smaller
-        v = random.randint(1, min(m, s - sum(result)))
+        v = rng.randint(1, min(m, s - sum(result)))
 
         # Set the new value of the element at index j to be the minimum of the random
         # value v + the current value and m
@@ -67,7 +72,9 @@ def array_sum(n: int, s: int, m: int) -> list[int]:
     return result
 
 
-def rand_values_dict_max_sum(keys: list[U], intendd_sum: int, max_element: int) -> dict[U, int]:
+def rand_values_dict_max_sum(
+    keys: list[U], intendd_sum: int, max_element: int, rng: Optional[Rng] = None
+) -> dict[U, int]:
     """
     Returns a dictionary with random values as the values and the given keys as the keys.
     The sum of the values in the dictionary is equal to the given sum, and each value is
@@ -77,13 +84,14 @@ def rand_values_dict_max_sum(keys: list[U], intendd_sum: int, max_element: int)
         keys (list[U]) List of keys to use for the dictionary.
         sum (int) The sum of all the values in the dictionary.
         max_element (int) The maximum value for any element in the dictionary.
+        rng (Optional[Rng]) The random number generator. GLOBAL_RNG if None.
 
     Returns:
         dict[U, int]: A dictionary with the given keys and random values
     """
 
     # Generate a list of random values that add up to the desired sum
-    vals = array_sum(len(keys), intendd_sum, max_element)
+    vals = array_sum(len(keys), intendd_sum, max_element, rng)
 
     # Create a dictionary with the given keys and the random values
     return {keys[i]: vals[i] for i in range(len(keys))}
@@ -95,6 +103,7 @@ StatsArguments = TypedDict(
         "base": BaseValueInitializer,
         "svs": NotRequired[SvsInitializer],
         "tvs": NotRequired[TvsInitializer],
+        "rng": NotRequired[Optional[Rng]],
     }
 )
 """
@@ -106,6 +115,7 @@ Attributes:
         Defaults to None.
     tvs (Optional[TvsInitializer]): The initial values for the Temtem's TVs (training values).
         Defaults to None.
+    rng (Optional[Rng]): The random number generator of stats with random values.
 """
 
 class Stats:
@@ -237,6 +247,18 @@ class Stats:
         """
         return {stat: temstat(level) for stat, temstat in self.__stats.items()}
 
+    def curves(self, levels: NDArray[np.int_]) -> dict[Stat, NDArray[np.int_]]:
+        """
+        Returns a dictionary with the TemTem's stats at each of the given levels.
+
+        Args:
+            levels (NDArray[np.int_]): The levels to calculate the stats at.
+
+        Returns:
+            A dictionary mapping each stat to an array with its value at each level.
+        """
+        return {stat: temstat.curve(levels) for stat, temstat in self.__stats.items()}
+
     def __repr__(self) -> str:
         """
         Returns a string representation of the Stats object.
@@ -281,11 +303,8 @@ class RandomStats(Stats):
     def __init__(
         self,
         base: BaseValueInitializer,
-        tvs: TvsInitializer = TvsInitializer(
-            values=rand_values_dict_max_sum(
-                Stat.to_list(), TemTemConstants.MAX_TV_TOTAL, TemTemConstants.MAX_TV
-            )
-        ),
+        tvs: Optional[TvsInitializer] = None,
+        rng: Optional[Rng] = None,
     ) -> None:
         """
         Inherits from Stats and initializes SvsInitializer with default value
@@ -295,14 +314,18 @@ class RandomStats(Stats):
             base (BaseValueInitializer): BaseValueInitializer object representing
                 the Temtem's base values.
             tvs (TvsInitializer, optional): TvsInitializer object representing the
-                Temtem's trained values. Defaults to
-                TvsInitializer(
-                    values=rand_values_dict_max_sum(
-                        Stat.to_list(), MAX_TV_TOTAL, MAX_TV
-                    )
-                ).
+                Temtem's trained values. Defaults to new random TVs drawn with
+                rand_values_dict_max_sum(Stat.to_list(), MAX_TV_TOTAL, MAX_TV).
+            rng (Rng, optional): Draws the random values. Defaults to GLOBAL_RNG.
         """
-        super().__init__(base, SvsInitializer(), tvs)
+        rng = GLOBAL_RNG if rng is None else rng
+        if tvs is None:
+            tvs = TvsInitializer(
+                values=rand_values_dict_max_sum(
+                    Stat.to_list(), TemTemConstants.MAX_TV_TOTAL, TemTemConstants.MAX_TV, rng
+                )
+            )
+        super().__init__(base, SvsInitializer(default_value=rng.randint), tvs)
 
 
 class RandomEncounterStats(RandomStats):
@@ -311,13 +334,14 @@ class RandomEncounterStats(RandomStats):
 
     """
 
-    def __init__(self, base: BaseValueInitializer) -> None:
+    def __init__(self, base: BaseValueInitializer, rng: Optional[Rng] = None) -> None:
         """
         Inherits from RandomStats and initializes TvsInitializer with default value of 0.
 
         Args:
             base (BaseValueInitializer): BaseValueInitializer object representing the
                 Temtem's base values.
+            rng (Rng, optional): Draws the random values. Defaults to GLOBAL_RNG.
 
         """
-        super().__init__(base, tvs=TvsInitializer())
+        super().__init__(base, tvs=TvsInitializer(), rng=rng)
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-import random
 from abc import ABC
 from typing import Callable, Mapping, Optional
 
+from src.rng import GLOBAL_RNG
 import src.tem_tem_constants as TemTemConstants
 from src.tem_stat import Stat
 
@@ -86,7 +86,7 @@ class SvsInitializer(StatsInitializer):
     def __init__(
         self,
         values: Optional[dict[Stat, int]] = None,
-        default_value: int | Callable[[int, int], int] = random.randint,
+        default_value: int | Callable[[int, int], int] = GLOBAL_RNG.randint,
     ) -> None:
         """
         Initializes the stats of a Temtem's SVs (single values).
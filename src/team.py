@@ -1,6 +1,7 @@
 from abc import ABC
-from typing import Iterable, Self, Type
+from typing import Iterable, Optional, Self, Type
 
+from src.rng import Rng
 from src.tem import Tem
 import src.tem_tem_constants as TemTemConstants
 from src.tempedia import Tempedia
@@ -18,7 +19,7 @@ class Team(ABC):
         """
         assert type(self)._max_team_size > 0, \
             f"Team subclass must define a max team size > 0 {type(self)._max_team_size=}"
-        tem_list = list(set(tems))  # no dupes.
+        tem_list = list(dict.fromkeys(tems))  # no dupes, in order.
         list_size = len(tem_list)
         assert (
             0 < list_size <= type(self)._max_team_size
@@ -55,10 +56,10 @@ class Team(ABC):
         self.__tems.remove(tem)
 
     @classmethod
-    def get_random(cls: Type[Self]) -> Self:
+    def get_random(cls: Type[Self], rng: Optional[Rng] = None) -> Self:
         tems: list[Tem] = [
             Tem.from_random_stats(
-                Tempedia.get_random_id()
+                Tempedia.get_random_id(rng), rng=rng
             ) for _ in range(cls._max_team_size)
         ]
         return cls(tems)
@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import json
 import math
-import random
 from enum import Enum, auto
-from typing import Iterable
+from typing import Iterable, Optional
+
+import numpy as np
+from numpy.typing import NDArray
 
 from src.json_typed_dict import TechniqueJson
+from src.rng import GLOBAL_RNG, Rng
 from src.tem_stat import Stat
 from src.tem_tem_type import TemTemType, TemType
 from src.targets import TechniqueTargets
@@ -18,6 +21,16 @@ with open("./temtem_api/techniques.json", encoding="utf8") as file:
 _techniques: dict[str, TechniqueJson] = {}
 for t in d:
     _techniques[t["name"].lower()] = t
+# compact technique ids, in techniques.json order
+_technique_names: list[str] = list(_techniques)
+_technique_ids: dict[str, int] = {name: i for i, name in enumerate(_technique_names)}
+
+def damage_formula(atkr_lvl, base_damage, atk, df, modifier):
+    """
+    The damage formula, before rounding down, shared by the scalar and vectorised
+    damage calculations. Works with both numbers and numpy arrays.
+    """
+    return (7 + (atkr_lvl / 200) * base_damage * (atk / df)) * modifier
 
 # ic| k: 'class'
 #     set([t[k] for t in _techniques.values()]): {'Special', 'Status', 'Physical'}
@@ -182,7 +195,9 @@ class Technique:
 
     @staticmethod
     def get_random_technique(
-        *temtem_type: TemTemType, classes: Iterable[TechniqueClass] = TechniqueClass
+        *temtem_type: TemTemType,
+        classes: Iterable[TechniqueClass] = TechniqueClass,
+        rng: Optional[Rng] = None
     ) -> Technique:
         """
         Returns a randomly chosen technique that matches the specified classes and types.
@@ -190,6 +205,7 @@ class Technique:
         Args:
         - classes (Iterable[TechniqueClass]): The list of technique classes to choose from.
         - *type (TemTemType): The list of Temtem types to choose from.
+        - rng (Optional[Rng]): The random number generator. GLOBAL_RNG if None.
 
         Returns:
         - Technique: A randomly chosen technique.
@@ -205,7 +221,7 @@ class Technique:
         ]
 
         if any(names):
-            rand_name = random.choice(names)
+            rand_name = (GLOBAL_RNG if rng is None else rng).choice(names)
             return Technique(rand_name)
 
         raise ValueError(
@@ -216,6 +232,27 @@ class Technique:
     def name(self) -> str:
         return self.__name
 
+    @property
+    def technique_id(self) -> int:
+        """
+        The technique's index in techniques.json, see `from_id`.
+        """
+        return _technique_ids[self.__name.lower()]
+
+    @staticmethod
+    def from_id(technique_id: int) -> Technique:
+        return Technique(_technique_names[technique_id])
+
+    @property
+    def base_damage(self) -> int:
+        """
+        The base damage of the technique, before any stats or modifiers are applied.
+
+        Returns:
+        - int: The base damage of the technique.
+        """
+        return self.__damage
+
     @property
     def inflicts_damage(self) -> bool:
         return self.__class != TechniqueClass.STATUS
@@ -234,6 +271,28 @@ class Technique:
         """
         return self.__held >= self.__hold
 
+    @property
+    def hold(self) -> int:
+        """
+        How many turns the technique has to be held for before it's ready.
+        """
+        return self.__hold
+
+    @property
+    def stamina_cost(self) -> int:
+        return self.__stamina_cost
+
+    @property
+    def priority(self) -> TechniquePriority:
+        return self.__priority
+
+    @property
+    def held(self) -> int:
+        """
+        How many turns the technique has been held for.
+        """
+        return self.__held
+
     @property
     def atk_stat(self) -> Stat:
         """
@@ -254,6 +313,10 @@ class Technique:
         """
         return self.__class.def_stat
 
+    @property
+    def technique_class(self) -> TechniqueClass:
+        return self.__class
+
     @property
     def type(self) -> TemTemType:
         """
@@ -288,9 +351,35 @@ class Technique:
         modifier = (
             math.prod(extra_modifiers) if len(extra_modifiers) > 0 else 1
         ) * self.type.get_multiplier(*types)
-        return math.floor(
-            (7 + (atkr_lvl / 200) * self.__damage * (atk / df)) * modifier
-        )
+        return math.floor(damage_formula(atkr_lvl, self.__damage, atk, df, modifier))
+
+    def calculate_damage_curve(
+        self,
+        atkr_lvls: NDArray[np.int_],
+        atk: NDArray[np.int_],
+        df: NDArray[np.int_],
+        types: TemType,
+        *extra_modifiers: int | float
+    ) -> NDArray[np.int_]:
+        """
+        Vectorised version of `calculate_damage`, over a level axis.
+
+        Args:
+        - atkr_lvls (NDArray[np.int_]): The levels of the attacking Temtem.
+        - atk (NDArray[np.int_]): The attacking stat of the attacking Temtem, for each level.
+        - df (NDArray[np.int_]): The defending stat of the defending Temtem, for each level.
+        - types (TemType): The types of the defending Temtem.
+        - *extra_modifiers: Any additional damage modifiers to be applied.
+
+        Returns:
+        - NDArray[np.int_]: The damage that the technique will inflict, for each level.
+        """
+        modifier = (
+            math.prod(extra_modifiers) if len(extra_modifiers) > 0 else 1
+        ) * self.type.get_multiplier(*types)
+        return np.floor(
+            damage_formula(np.asarray(atkr_lvls), self.__damage, atk, df, modifier)
+        ).astype(np.int_)
 
     def increment_held(self, amount: int = 1):
         """
@@ -1,13 +1,13 @@
 from abc import ABC
-import random
-from typing import Callable, Final, Iterator
+from typing import Callable, Final, Iterator, Optional
+from src.rng import GLOBAL_RNG, Rng
 from src.technique import Technique
 import src.tem_tem_constants as TemTemConstants
 
 
 class TechniqueSet(ABC):
     def __init__(self, techniques: list[str], max_set_size: int):
-        techniques_set = set(techniques)  # no dupes
+        techniques_set = list(dict.fromkeys(techniques))  # no dupes, in order
         assert (
             len(techniques_set) <= max_set_size
         ), f"Too many techniques: {len(techniques_set)=} {max_set_size=}"
@@ -49,7 +49,10 @@ class TechniqueSet(ABC):
         self.add(new_technique)
 
     def get_random_techniques(
-        self, number_of_techniques, fltr: Callable[[Technique], bool] = lambda a: True
+        self,
+        number_of_techniques,
+        fltr: Callable[[Technique], bool] = lambda a: True,
+        rng: Optional[Rng] = None
     ) -> list[Technique]:
         """
         Gets random techniques from the set, with an optional filter.
@@ -64,12 +67,14 @@ class TechniqueSet(ABC):
         if n == len(self):
             return self._techniques.copy()
 
-        return random.sample(list(filter(fltr, self._techniques)), n)
+        return (GLOBAL_RNG if rng is None else rng).sample(
+            list(filter(fltr, self._techniques)), n
+        )
 
     def get_random_technique(
-        self, fltr: Callable[[Technique], bool] = lambda a: True
+        self, fltr: Callable[[Technique], bool] = lambda a: True, rng: Optional[Rng] = None
     ) -> Technique:
-        return self.get_random_techniques(1, fltr)[0]
+        return self.get_random_techniques(1, fltr, rng)[0]
 
     def __len__(self) -> int:
         return len(self._techniques)
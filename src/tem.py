@@ -1,12 +1,14 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 
-import random
 from abc import ABC
 from typing import Callable, Optional, Self, Type, final
 
+import numpy as np
+from numpy.typing import NDArray
 from typing_extensions import NotRequired, TypedDict
 from src.technique_set import BattleTechniques, LearnableTechniques
+from src.rng import GLOBAL_RNG, Rng
 
 import src.tem_tem_constants as TemTemConstants
 from src.stats import (
@@ -70,6 +72,10 @@ class TemSpecies(ABC):
             t[1] = secondary_type
         self.__type = TemType(*t)
 
+    @property
+    def species_id(self) -> int:
+        return self._id
+
     @property
     def species_name(self) -> str:
         """Get the name of the species.
@@ -127,25 +133,29 @@ class SpeciesIdentifier():
         return cls(Tempedia.get_id_from_name(species_name))
 
 
-# TODO inject random
 @dataclass(frozen=True)
 class TemBattleConfig:
     stat_cls: Type[Stats] = Stats
     battle_technique_names: list[str] = field(default_factory=list)
     tvs: Optional[TvsInitializer] = None
     svs: Optional[SvsInitializer] = None
-    level: int | Callable[[int, int], int] = random.randint
+    level: Optional[int | Callable[[int, int], int]] = None # drawn by the Tem's rng if None
+    # one of the species' traits, unknown if None (battles then run the tem without one)
+    trait: Optional[str] = None
 
     @classmethod
-    def from_data(
+    def from_data( #pylint: disable=too-many-arguments,too-many-positional-arguments
         cls,
         battle_techniques: list[str],
         tvs: Optional[list[int]] = None,
         svs: Optional[list[int]] = None,
-        level: int = random.randint(
-            TemTemConstants.TEM_MIN_LEVEL, TemTemConstants.TEM_MAX_LEVEL
-        )
+        level: Optional[int] = None,
+        rng: Optional[Rng] = None,
+        trait: Optional[str] = None
     ) -> Self:
+        """
+        Missing SVs are drawn with rng (GLOBAL_RNG if None), a missing level by the Tem.
+        """
         if svs is None:
             svs = []
 
@@ -157,7 +167,8 @@ class TemBattleConfig:
             len(Stat),
         ], f"SVs list does not have acceptable size: {len(svs)=} {len(Stat)=}"
         svs_init = SvsInitializer(
-            {} if len(svs) == 0 else Stat.initializer_dict_from_list(svs)
+            {} if len(svs) == 0 else Stat.initializer_dict_from_list(svs),
+            default_value=(GLOBAL_RNG if rng is None else rng).randint
         )
         assert len(tvs) in [
             0,
@@ -171,7 +182,8 @@ class TemBattleConfig:
             battle_technique_names=battle_techniques,
             level=level,
             tvs=tvs_init,
-            svs=svs_init
+            svs=svs_init,
+            trait=trait
         )
 
 
@@ -196,16 +208,19 @@ class TemSpeciesConfig:
             )
 
 
-class Tem(TemSpecies):
+class Tem(TemSpecies): #pylint: disable=too-many-public-methods
     def __init__(
             self,
             species_config: TemSpeciesConfig,
             battle_config: TemBattleConfig,
-            nickname: str = ""
+            nickname: str = "",
+            rng: Optional[Rng] = None
     ) -> None:
         """
-        Initializes a new Tem.
+        Initializes a new Tem. Anything random (like the secondary type of tems that can
+        have many, a missing level or random stats) is drawn with rng, GLOBAL_RNG if None.
         """
+        rng = GLOBAL_RNG if rng is None else rng
 
         kwargs: TemSpeciesArg = {"species_id":
                                  species_config.species_identifier.species_id}
@@ -215,7 +230,9 @@ class Tem(TemSpecies):
         ).lower() in TemTemConstants.MULTIPLE_SECONDARY_TYPE:
             #if secondary_type == TemTemType.NO_TYPE:
             #    secondary_type = TemTemType.get_random_type(secondary_type)
-            kwargs["secondary_type"] = TemTemType.get_random_type(species_config.secondary_type) \
+            kwargs["secondary_type"] = TemTemType.get_random_type(
+                species_config.secondary_type, rng=rng
+            ) \
                 if species_config.secondary_type == TemTemType.NO_TYPE \
                     else species_config.secondary_type
 
@@ -225,14 +242,23 @@ class Tem(TemSpecies):
             kargs["tvs"] = battle_config.tvs
         if battle_config.svs is not None:
             kargs["svs"] = battle_config.svs
+        if issubclass(battle_config.stat_cls, RandomStats):
+            kargs["rng"] = rng
         self.__stats = battle_config.stat_cls(**kargs)
+        level = rng.randint if battle_config.level is None else battle_config.level
         self.__level = (
-            battle_config.level(
+            level(
                 TemTemConstants.TEM_MIN_LEVEL, TemTemConstants.TEM_MAX_LEVEL
-            ) if callable(battle_config.level)
-                else battle_config.level
+            ) if callable(level)
+                else level
         )
         self.__nickname = nickname
+        self.__trait: Optional[str] = None
+        if battle_config.trait is not None:
+            traits = {trait.lower(): trait for trait in Tempedia.get_traits(self.species_id)}
+            assert battle_config.trait.lower() in traits, \
+                f"{self.species_name} can't have the trait {battle_config.trait}: {traits=}"
+            self.__trait = traits[battle_config.trait.lower()]
 
         battle_technique_names = battle_config.battle_technique_names \
             if any(battle_config.battle_technique_names) \
@@ -242,6 +268,7 @@ class Tem(TemSpecies):
 
         self.__battle_techniques = BattleTechniques(battle_technique_names)
         self.__hp = self.stats[Stat.HP]
+        self.__stamina = self.stats[Stat.STA]
 
         assert (
             TemTemConstants.TEM_MIN_LEVEL <= self.__level <= TemTemConstants.TEM_MAX_LEVEL
@@ -249,7 +276,10 @@ class Tem(TemSpecies):
 
     @classmethod
     def from_random_encounter(
-        cls, species_id: int, secondary_type: TemTemType = TemTemType.NO_TYPE
+        cls,
+        species_id: int,
+        secondary_type: TemTemType = TemTemType.NO_TYPE,
+        rng: Optional[Rng] = None
     ) -> Self:
         """
         Creates a new Tem with random encounter stats.
@@ -258,6 +288,7 @@ class Tem(TemSpecies):
         - id (int): The ID of the Tem species.
         - secondary_type (TemTemType, optional): The Tem's secondary type.
             Defaults to TemTemType.NO_TYPE.
+        - rng (Rng, optional): Draws the random values. Defaults to GLOBAL_RNG.
 
         Returns:
         - Tem: The newly created Tem.
@@ -269,12 +300,16 @@ class Tem(TemSpecies):
             ),
             TemBattleConfig(
                 RandomEncounterStats
-            )
+            ),
+            rng=rng
         )
 
     @classmethod
     def from_random_stats(
-        cls, species_id: int, secondary_type: TemTemType = TemTemType.NO_TYPE
+        cls,
+        species_id: int,
+        secondary_type: TemTemType = TemTemType.NO_TYPE,
+        rng: Optional[Rng] = None
     ) -> Self:
         """
         Creates a new Tem with random stats.
@@ -283,6 +318,7 @@ class Tem(TemSpecies):
         - id (int): The ID of the Tem species.
         - secondary_type (TemTemType, optional): The Tem's secondary type.
             Defaults to TemTemType.NO_TYPE.
+        - rng (Rng, optional): Draws the random values. Defaults to GLOBAL_RNG.
 
         Returns:
         - Tem: The newly created Tem.
@@ -294,7 +330,8 @@ class Tem(TemSpecies):
             ),
             TemBattleConfig(
                 RandomStats
-            )
+            ),
+            rng=rng
         )
 
     @classmethod
@@ -377,6 +414,21 @@ class Tem(TemSpecies):
         """
         self.__nickname = nckname
 
+    @property
+    def trait(self) -> Optional[str]:
+        """
+        The name of the tem's trait, as the Tempedia spells it. None if it isn't known.
+        """
+        return self.__trait
+
+    @property
+    def possible_traits(self) -> tuple[str, ...]:
+        """
+        The tem's trait if it's known, every trait of its species otherwise.
+        """
+        return tuple(Tempedia.get_traits(self.species_id)) if self.__trait is None \
+            else (self.__trait,)
+
     @property
     def level(self) -> int:
         """
@@ -397,6 +449,18 @@ class Tem(TemSpecies):
         """
         return self.__stats(self.level)
 
+    def stats_curves(self, levels: NDArray[np.int_]) -> dict[Stat, NDArray[np.int_]]:
+        """
+        Get the stats of the TemTem at each of the given levels, without levelling it.
+
+        Args:
+        - levels (NDArray[np.int_]): The levels to get the stats at.
+
+        Returns:
+        - dict[Stat, NDArray[np.int_]]: A dictionary with the stat values at each level.
+        """
+        return self.__stats.curves(levels)
+
     @property
     def svs(self) -> dict[Stat, int]:
         """
@@ -425,10 +489,35 @@ class Tem(TemSpecies):
     def current_hp(self) -> int:
         return self.__hp
 
+    @property
+    def current_stamina(self) -> int:
+        return self.__stamina
+
     @property
     def is_alive(self) -> bool:
         return self.current_hp > 0
 
+    def set_hp(self, hp: int):
+        """
+        Sets the Tem's current HP.
+
+        Args:
+        - hp (int): The new current HP, between 0 and the Tem's max HP.
+        """
+        assert 0 <= hp <= self.stats[Stat.HP], f"Invalid HP: {hp=} {self.stats[Stat.HP]=}"
+        self.__hp = hp
+
+    def set_stamina(self, stamina: int):
+        """
+        Sets the Tem's current stamina.
+
+        Args:
+        - stamina (int): The new current stamina, between 0 and the Tem's max stamina.
+        """
+        assert 0 <= stamina <= self.stats[Stat.STA], \
+            f"Invalid stamina: {stamina=} {self.stats[Stat.STA]=}"
+        self.__stamina = stamina
+
     def _get_type_multiplier(self, attacking_type: TemTemType) -> float:
         """
         Get the type multiplier for the TemTem based on the attacking type.
@@ -480,6 +569,45 @@ class Tem(TemSpecies):
             self.level, atk, df, def_tem.types, *extra_modifiers
         )
 
+    def calculate_atacking_damage_curve(
+        self,
+        technique: Technique,
+        def_tem: Tem,
+        levels: NDArray[np.int_],
+        *extra_modifiers: float,
+        def_levels: Optional[NDArray[np.int_]] = None
+    ) -> NDArray[np.int_]:
+        """
+        Calculates the damage a technique will deal to a defending Tem at each of the given levels.
+
+        Args:
+        - technique (Technique): The technique being used to attack.
+        - def_tem (Tem): The defending Tem that the technique is being used on.
+        - levels (NDArray[np.int_]): The levels of the attacking Tem.
+        - *extra_modifiers (float): Any extra modifiers to apply to the damage calculation.
+        - def_levels (NDArray[np.int_], optional): The levels of the defending Tem.
+            Defaults to `levels`.
+
+        Returns:
+        - NDArray[np.int_]: The amount of damage the technique will deal, for each level.
+        """
+        levels = np.asarray(levels)
+        if not technique.inflicts_damage:
+            return np.zeros(levels.shape, dtype=np.int_)
+
+        if def_levels is None:
+            def_levels = levels
+
+        atk = self.stats_curves(levels)[technique.atk_stat]
+        df = def_tem.stats_curves(def_levels)[technique.def_stat]
+
+        if technique.type in self.types:
+            extra_modifiers = extra_modifiers + (TemTemConstants.STAB_MODIFIER,)
+
+        return technique.calculate_damage_curve(
+            levels, atk, df, def_tem.types, *extra_modifiers
+        )
+
     def calculate_defensive_damage(
         self, technique: Technique, atk_tem: Tem, *extra_modifiers: float
     ) -> int:
@@ -524,8 +652,8 @@ if __name__ == "__main__":
     from typing import Final
 
     NUMBER_OF_TEMTEMS: Final[int] = Tempedia.size()
-    t_enc = Tem.from_random_encounter(species_id=random.randint(1, NUMBER_OF_TEMTEMS))
-    t_rand = Tem.from_random_stats(species_id=random.randint(1, NUMBER_OF_TEMTEMS))
+    t_enc = Tem.from_random_encounter(species_id=GLOBAL_RNG.randint(1, NUMBER_OF_TEMTEMS))
+    t_rand = Tem.from_random_stats(species_id=GLOBAL_RNG.randint(1, NUMBER_OF_TEMTEMS))
     t_comp = Tem.from_competitive(
         species_id=Tempedia.get_id_from_name("hedgine"),
         tvs=TvsInitializer({Stat.SPD: 500, Stat.SPATK: 500}),
@@ -2,6 +2,10 @@ from __future__ import annotations
 
 from enum import Enum, auto
 from math import floor
+from typing import Callable
+
+import numpy as np
+from numpy.typing import NDArray
 
 from src.tem_tem_constants import MAX_TV, MAX_TV_TOTAL, MIN_TV
 from src.json_typed_dict import TemTemStatsJson
@@ -164,49 +168,63 @@ class TemStat:
             MIN_TV,
         )
 
-    def __calc_hp(self, level: int) -> int:
+    def __calc_hp(self, level, rounding: Callable = floor):
         """
         Calculates the HP stat.
 
         Args:
         - level (int): The level of the Temtem.
+        - rounding (Callable): The function used to round the result down.
 
         Returns:
         - int: The total value of the HP stat.
         """
         a = ((1.5 * self.base) + self.sv + (self.tv / 5)) * level
         b = self.sv * self.base * level
-        return floor((a / 80) + (b / 20000) + level + 15)
+        return rounding((a / 80) + (b / 20000) + level + 15)
 
-    def __calc_sta(self, level: int) -> int:
+    def __calc_sta(self, level, rounding: Callable = floor):
         """
         Calculates the STA stat.
 
         Args:
         - level (int): The level of the Temtem.
+        - rounding (Callable): The function used to round the result down.
 
         Returns:
         - int: The total value of the STA stat.
         """
         a = self.sv * self.base * level
         b = self.tv * self.base * level
-        return floor(
+        return rounding(
             (self.base / 4) + ((level**0.35) * 6) + (a / 20000) + (b / 30000)
         )
 
-    def __calc_others(self, level: int) -> int:
+    def __calc_others(self, level, rounding: Callable = floor):
         """
         Calculates the total value of the stat for all stats except for HP and STA.
 
         Args:
         - level (int): The level of the Temtem.
+        - rounding (Callable): The function used to round the result down.
 
         Returns:
         - int: The total value of the stat.
         """
         a = ((1.5 * self.base) + self.sv + (self.tv / 5)) * level
         b = self.sv * self.base * level
-        return floor((a / 100) + (b / 25000) + 10)
+        return rounding((a / 100) + (b / 25000) + 10)
+
+    def __calc(self, level, rounding: Callable = floor):
+        match self.__stat:
+            case Stat.HP:
+                st = self.__calc_hp(level, rounding)
+            case Stat.STA:
+                st = self.__calc_sta(level, rounding)
+            case _:
+                st = self.__calc_others(level, rounding)
+
+        return st  # TODO implement stages. status condition modifiers are applied later
 
     def __call__(self, level: int) -> int:
         """
@@ -218,15 +236,19 @@ class TemStat:
         Returns:
         - int: The total value of the stat.
         """
-        match self.__stat:
-            case Stat.HP:
-                st = self.__calc_hp(level)
-            case Stat.STA:
-                st = self.__calc_sta(level)
-            case _:
-                st = self.__calc_others(level)
+        return self.__calc(level)
 
-        return st  # TODO implement stages. status condition modifiers are applied later
+    def curve(self, levels: NDArray[np.int_]) -> NDArray[np.int_]:
+        """
+        Calculates the total value of the stat for every level in `levels` at once.
+
+        Args:
+        - levels (NDArray[np.int_]): The levels of the Temtem.
+
+        Returns:
+        - NDArray[np.int_]: The total value of the stat at each of the given levels.
+        """
+        return self.__calc(np.asarray(levels, dtype=np.float64), np.floor).astype(np.int_)
 
     def __repr__(self):
         """
@@ -1,6 +1,9 @@
 from typing import Final
 
 NUMBER_OF_STAGES: Final[int] = 8
+# how far stat stages go, up or down
+MAX_STAT_STAGE: Final[int] = 5
+
 
 MAX_TV: Final[int] = 500
 MIN_TV: Final[int] = 0
@@ -24,3 +27,5 @@ PLAYTHROUGH_TEAM_SIZE: Final[int] = 6
 NUMBER_OF_BATTLE_TECHNIQUES: Final[int] = 4
 
 BATTLE_MAX_TURNS: Final[int] = 30
+# the fraction of its max stamina a tem recovers by resting
+REST_STAMINA_RECOVERY: Final[float] = 0.4
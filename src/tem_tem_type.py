@@ -2,10 +2,10 @@ from __future__ import annotations
 
 import json
 import math
-import random
 from enum import Enum, auto
-from typing import Iterable, Iterator
+from typing import Iterable, Iterator, Optional
 
+from src.rng import GLOBAL_RNG, Rng
 
 
 class TemTemType(Enum):
@@ -67,17 +67,20 @@ class TemTemType(Enum):
             else TemTemType[temtem_type.upper()]
 
     @staticmethod
-    def get_random_type(*exclude_type: TemTemType) -> TemTemType:
+    def get_random_type(*exclude_type: TemTemType, rng: Optional[Rng] = None) -> TemTemType:
         """Return a random TemTemType that is not in the exclude_type list.
 
         Args:
         - *exclude_type: A list of TemTemTypes that the returned TemTemType
                          should not be.
+        - rng (Optional[Rng]): The random number generator. GLOBAL_RNG if None.
 
         Returns:
         - TemTemType: A random TemTemType that is not in the exclude_type list.
         """
-        return random.choice([t for t in TemTemType if not t in exclude_type])
+        return (GLOBAL_RNG if rng is None else rng).choice(
+            [t for t in TemTemType if not t in exclude_type]
+        )
 
 
 # __multipliers[attacker][defender] returns the multiplier. defaults to 1 on initialization
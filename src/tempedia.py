@@ -1,10 +1,10 @@
 
 import json
-import random
 import re
-from typing import Callable, Tuple
+from typing import Callable, Optional, Tuple
 
 from src.json_typed_dict import TemTemJson
+from src.rng import GLOBAL_RNG, Rng
 from src.tem_stat import Stat
 from src.stats_initializer import BaseValueInitializer
 import src.tem_tem_constants as TemTemConstants
@@ -44,7 +44,8 @@ class Tempedia():
 
     @staticmethod
     def _get_random_id_from_filter(
-        fltr: Callable[[Tuple[int, TemTemJson]], bool]
+        fltr: Callable[[Tuple[int, TemTemJson]], bool],
+        rng: Optional[Rng] = None
     ) -> int:
         """
         Returns a random id of a temtem that satisfies the given filter.
@@ -52,6 +53,7 @@ class Tempedia():
         Args:
         - fltr (Callable[[Tuple[int, TemTemJson]], bool]): A function that
             returns True for temtems that should be considered.
+        - rng (Optional[Rng]): The random number generator. GLOBAL_RNG if None.
 
         Returns:
         - int: A random id of a temtem that satisfies the given filter.
@@ -61,10 +63,10 @@ class Tempedia():
         """
         l = dict(filter(fltr, _tems.items()))
         assert len(l) > 0, "No results for given filter."
-        return random.choice(list(l.keys()))
+        return (GLOBAL_RNG if rng is None else rng).choice(list(l.keys()))
 
     @staticmethod
-    def get_random_atk_id() -> int:
+    def get_random_atk_id(rng: Optional[Rng] = None) -> int:
         """
         Returns the id of a temtem that has a higher atk stat than spatk stat.
 
@@ -74,10 +76,10 @@ class Tempedia():
         fltr: Callable[[Tuple[int, TemTemJson]], bool] = (
             lambda a: a[1]["stats"]["atk"] > a[1]["stats"]["spatk"]
         )
-        return Tempedia._get_random_id_from_filter(fltr)
+        return Tempedia._get_random_id_from_filter(fltr, rng)
 
     @staticmethod
-    def get_random_spatk_id() -> int:
+    def get_random_spatk_id(rng: Optional[Rng] = None) -> int:
         """
         Returns the id of a temtem that has a higher spatk stat than atk stat.
 
@@ -87,11 +89,11 @@ class Tempedia():
         fltr: Callable[[Tuple[int, TemTemJson]], bool] = (
             lambda a: a[1]["stats"]["spatk"] > a[1]["stats"]["atk"]
         )
-        return Tempedia._get_random_id_from_filter(fltr)
+        return Tempedia._get_random_id_from_filter(fltr, rng)
 
 
     @staticmethod
-    def get_random_id() -> int:
+    def get_random_id(rng: Optional[Rng] = None) -> int:
         """
         Returns the id of a random temtem.
 
@@ -101,7 +103,7 @@ class Tempedia():
         fltr: Callable[[Tuple[int, TemTemJson]], bool] = (
             lambda a: True
         )
-        return Tempedia._get_random_id_from_filter(fltr)
+        return Tempedia._get_random_id_from_filter(fltr, rng)
 
     @staticmethod
     def get_id_from_name(name: str) -> int:
@@ -178,6 +180,23 @@ class Tempedia():
 
         return [t["name"] for t in techs[:max_number_of_techniques]]
 
+    @staticmethod
+    def get_traits(species_id: int) -> list[str]:
+        """
+        Returns the names of the traits a temtem with the given id can have.
+
+        Args:
+        - id (int): The id of the temtem.
+
+        Returns:
+        - list[str]: The names of the traits of the temtem.
+        """
+        return _tems[species_id]["traits"]
+
+    @staticmethod
+    def get_ids() -> list[int]:
+        return list(_tems.keys())
+
     @staticmethod
     def get_names() -> list[str]:
         return [t["name"] for t in _tems.values()]
@@ -0,0 +1,61 @@
+from typing import Callable, Optional
+
+import pytest
+
+from src.battle import Battle
+from src.battle_agent import RandomBattleAgent
+from src.battle_core import BattleCore
+from src.battle_handler import TamerBattleHandler
+from src.battle_state import BattleState
+from src.battle_team import TeamBattlePosition, Teams
+from src.replay import BattleRecorder
+from src.rng import Rng
+from src.team import PlaythroughTeam
+
+@pytest.fixture(name="new_state", scope="session")
+def fixture_new_state() -> Callable[..., BattleState]:
+    """
+    Makes battle states between two random teams. Unless `on_field` is False, the first
+    tems of each team are put on the field, in team order.
+
+    Session scoped, so that hypothesis tests can make a new state for every example.
+    """
+    def make(rng: Optional[Rng] = None, on_field: bool = True) -> BattleState:
+        state = BattleState(
+            team_orange=PlaythroughTeam.get_random(rng),
+            team_blue=PlaythroughTeam.get_random(rng)
+        )
+        if on_field:
+            for team in Teams:
+                for position in TeamBattlePosition:
+                    state.set_battlefield_position(team, position, position.value - 1)
+        return state
+
+    return make
+
+@pytest.fixture(name="play_battle", scope="session")
+def fixture_play_battle(
+    new_state: Callable[..., BattleState]
+) -> Callable[[int], tuple[Battle, list[BattleCore]]]:
+    """
+    Plays a recorded battle between random agents with `TamerBattleHandler`, seeded with
+    the given seed. Returns the battle and how it was after each turn, as cores.
+    """
+    def play(seed: int) -> tuple[Battle, list[BattleCore]]:
+        rng = Rng(seed)
+        battle = Battle(
+            new_state(rng, on_field=False),
+            TamerBattleHandler(),
+            BattleRecorder(seed)
+        )
+        players = {
+            team: RandomBattleAgent(agent_rng) for team, agent_rng in zip(Teams, rng.split(2))
+        }
+        turns: list[BattleCore] = []
+        over = False
+        while not over:
+            over = battle.step(players)
+            turns.append(BattleCore.from_state(battle.state))
+        return battle, turns
+
+    return play
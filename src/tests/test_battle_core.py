@@ -0,0 +1,82 @@
+from hypothesis import event, given, settings, strategies as st
+
+from src.action_code import ActionCode
+from src.battle_core import DRAW, POSITIONS, BattleCore
+from src.battle_state import BattlePhase
+from src.battle_team import TeamBattlePosition, Teams
+from src.rng import Rng
+from src.targets import ActionTarget
+import src.tem_tem_constants as TemTemConstants
+
+@given(seed=st.random_module())
+def test_core_round_trips_the_state(new_state, seed):
+    event(seed)
+    state = new_state()
+    snapshot = state.snapshot()
+    BattleCore.from_state(state).to_state(state)
+    assert state.snapshot() == snapshot
+
+@given(seed=st.random_module())
+def test_core_damage_matches_tem_damage(new_state, seed):
+    event(seed)
+    state = new_state()
+    attacker = state.get_tem(Teams.ORANGE, TeamBattlePosition.RIGHT)
+    defender = state.get_tem(Teams.BLUE, TeamBattlePosition.LEFT)
+    assert attacker is not None and defender is not None
+
+    for slot, technique in enumerate(attacker.battle_techniques):
+        if not technique.is_ready or \
+                ActionTarget.OPPONENT_LEFT not in technique.targets.to_action_target():
+            continue
+        event("technique used")
+        core = BattleCore.from_state(state)
+        codes = [ActionCode.REST] * (len(Teams) * POSITIONS)
+        codes[TeamBattlePosition.RIGHT.value - 1] = \
+            ActionCode.technique(slot, ActionTarget.OPPONENT_LEFT)
+        core.run_turn(codes)
+
+        # the defender is the blue tem in team slot LEFT.value - 1
+        defender_index = TemTemConstants.COMPETITIVE_TEAM_SIZE + TeamBattlePosition.LEFT.value - 1
+        assert core.hp[defender_index] == max(
+            0, defender.current_hp - attacker.calculate_atacking_damage(technique, defender)
+        )
+
+@given(seed=st.integers(min_value=0))
+def test_random_core_battles_end(new_state, seed: int):
+    state = new_state()
+    core = BattleCore.from_state(state)
+    winner = core.copy().play(Rng(seed))
+    assert core.turn == 1 and not core.is_over
+
+    played = core.copy()
+    played.play(Rng(seed))
+    assert played.winner == winner
+    assert played.turn <= TemTemConstants.BATTLE_MAX_TURNS + 1
+
+    played.to_state(state)
+    assert state.phase[0] == BattlePhase.FINISHED
+    for team_index, team in enumerate(Teams):
+        if winner == team_index:
+            assert state.has_alive_temtems(team)
+        elif winner != DRAW:
+            assert not state.has_alive_temtems(team)
+
+@settings(max_examples=25, deadline=None)
+@given(seed=st.integers(min_value=0, max_value=2**32))
+def test_core_plays_turns_like_the_handler(play_battle, seed: int):
+    battle, turns = play_battle(seed)
+    replay = battle.replay()
+    core = replay.new_core()
+    assert len(turns) == len(replay.codes)
+
+    for codes, expected in zip(replay.codes.tolist(), turns[:-1]):
+        core.run_turn(codes)
+        assert not core.is_over
+        assert core.hash == expected.hash
+
+    # the finished state doesn't keep the turn, so the last turn is compared without it
+    core.run_turn(replay.codes.tolist()[-1])
+    expected = turns[-1]
+    assert core.is_over and core.winner == replay.winner
+    assert (list(core.hp), list(core.stamina), list(core.held), list(core.positions)) == \
+        (list(expected.hp), list(expected.stamina), list(expected.held), list(expected.positions))
@@ -0,0 +1,69 @@
+from src.battle_handler import ActionGenerationCache, ActionScheduler
+from src.battle_state import (
+    BattleState, RestAction, RunnableAction, SwitchTemAction, UseTechniqueAction
+)
+from src.battle_team import TeamBattlePosition, Teams
+from src.simulate import load_team
+from src.targets import ActionTarget
+
+def test_action_generation_cache_reuses_until_invalidated(new_state):
+    state = new_state()
+    cache = ActionGenerationCache()
+    action_types = [RestAction, SwitchTemAction, UseTechniqueAction]
+
+    def generate() -> dict:
+        return {
+            (action_type, team, position): set(
+                cache.get_possible_actions(action_type, team, position, state)
+            ) for action_type in action_types
+                for team in Teams
+                    for position in TeamBattlePosition
+        }
+
+    first = generate()
+    generated = len(first)
+    assert cache.stats.generated == generated and cache.stats.reused == 0
+
+    assert generate() == first
+    assert cache.stats.generated == generated and cache.stats.reused == generated
+
+    # moving tems around only invalidates that team's switches and the moved position
+    state.set_battlefield_position(Teams.BLUE, TeamBattlePosition.RIGHT, 3)
+    after_switch = generate()
+    assert cache.stats.generated == generated + len(TeamBattlePosition) + 1
+    assert after_switch != first
+
+    # a technique changing readiness only invalidates its position
+    technique = next(iter(state.get_techniques(Teams.ORANGE, TeamBattlePosition.LEFT)))
+    technique.increment_held(-1 if technique.is_ready else 100)
+    generate()
+    assert cache.stats.generated == generated + len(TeamBattlePosition) + 2
+    assert cache.stats.reuse_rate > 0.5
+
+def test_scheduler_orders_by_rank_speed_and_speed_arrow():
+    # the same team on both sides: every tem ties with the opposing tem in its slot
+    state = BattleState(
+        team_orange=load_team("nuzlocke_helper_configs/my_team.json"),
+        team_blue=load_team("nuzlocke_helper_configs/my_team.json")
+    )
+    for team in Teams:
+        for position in TeamBattlePosition:
+            state.set_battlefield_position(team, position, position.value - 1)
+    actions = [
+        RunnableAction(
+            RestAction(ActionTarget.SELF), team, position, state.get_tem(team, position)
+        ) for team in Teams for position in TeamBattlePosition
+    ]
+    scheduler = ActionScheduler()
+
+    for favoured in [Teams.ORANGE, Teams.BLUE]:
+        scheduler.schedule(actions, state)
+        assert state.speed_arrow == favoured
+        order = [scheduler.pop() for _ in range(len(actions))]
+        assert len(scheduler) == 0
+        assert [action.priority for action in order] == \
+            sorted(action.priority for action in actions)
+        assert [action.team for action in order[::2]] == [favoured] * len(TeamBattlePosition)
+
+    scheduler.schedule(actions[:len(TeamBattlePosition)], state)
+    assert state.speed_arrow == Teams.BLUE
@@ -0,0 +1,186 @@
+from itertools import product
+import random
+
+from hypothesis import event, given, strategies as st
+
+from src.action_code import ActionCode
+from src.action_space import EncodedActionSpace, TeamActionSpace
+from src.battle_core import BattleCore
+from src.battle_field import BattleField
+from src.battle_state import Action, RestAction, SwitchTemAction, TeamAction, UseTechniqueAction
+from src.battle_team import TeamBattlePosition, Teams
+from src.targets import ActionTarget
+from src.technique import Technique
+from src.tem import Tem
+from src.team import PlaythroughTeam
+
+bench: list[Tem] = list(PlaythroughTeam.get_random())
+techniques: list[Technique] = [tech for tem in bench for tech in tem.battle_techniques]
+
+def position_actions(draw, tems: list[Tem]) -> list[Action]:
+    actions: list[Action] = [SwitchTemAction(tem) for tem in tems]
+    actions += [
+        UseTechniqueAction(ActionTarget.OPPONENT_LEFT, technique)
+            for technique in draw(st.lists(st.sampled_from(techniques), max_size=4))
+    ]
+    if draw(st.booleans()):
+        actions.append(RestAction(ActionTarget.SELF))
+    return actions
+
+@st.composite
+def action_spaces(draw) -> dict[TeamBattlePosition, list[Action]]:
+    return {
+        position: position_actions(
+            draw, draw(st.lists(st.sampled_from(bench), unique=True))
+        ) for position in draw(st.sets(st.sampled_from(TeamBattlePosition)))
+    }
+
+def as_tuple(team_action: TeamAction) -> tuple:
+    return tuple(sorted(((p.value, id(a)) for p, a in team_action)))
+
+@given(position_actions_dict=action_spaces())
+def test_team_action_space_matches_brute_force(
+    position_actions_dict: dict[TeamBattlePosition, list[Action]]
+):
+    space = TeamActionSpace(position_actions_dict)
+    positions = [p for p in TeamBattlePosition if any(position_actions_dict.get(p, []))]
+
+    expected = [
+        as_tuple(team_action) for team_action in (
+            TeamAction(dict(zip(positions, actions)))
+                for actions in product(*(position_actions_dict[p] for p in positions))
+        ) if team_action.are_actions_compatible
+    ]
+
+    assert len(space) == len(expected)
+    assert [as_tuple(a) for a in space] == expected
+    assert [as_tuple(space[k]) for k in range(len(space))] == expected
+
+    if len(space) > 0:
+        assert as_tuple(space.sample(random.Random(0))) in expected
+
+@given(seed=st.random_module())
+def test_encoded_action_space_matches_action_objects(new_state, seed):
+    event(seed)
+    state = new_state()
+
+    allowed: list[type[Action]] = [RestAction, SwitchTemAction, UseTechniqueAction]
+
+    for team in Teams:
+        space = TeamActionSpace({
+            position: [
+                action for action_type in allowed
+                    for action in action_type.get_possible_actions(
+                        team, position, state
+                    ).get_actions(team, position)
+            ] for position in TeamBattlePosition
+        })
+        encoded = EncodedActionSpace(state, team, allowed)
+
+        codes = {encoded.encode(team_action) for team_action in space}
+        assert codes == set(encoded.legal_codes)
+        assert len(codes) == len(space)
+
+        for team_action in space:
+            decoded = encoded.decode(encoded.encode(team_action))
+            assert dict(decoded) == dict(team_action)
+
+@given(
+    placements=st.lists(st.tuples(
+        st.sampled_from(TeamBattlePosition),
+        st.integers(min_value=0, max_value=len(bench) - 1)
+    )),
+    fainted=st.sets(st.integers(min_value=0, max_value=len(bench) - 1))
+)
+def test_battle_field_masks_match_tems(
+    placements: list[tuple[TeamBattlePosition, int]],
+    fainted: set[int]
+):
+    team = PlaythroughTeam(bench)
+    field = BattleField({Teams.ORANGE: team, Teams.BLUE: PlaythroughTeam.get_random()})
+    before = field.copy()
+    positions: dict[TeamBattlePosition, int] = {}
+
+    for position, index in placements:
+        if index in positions.values() and positions.get(position) != index:
+            continue
+        field.set_position(Teams.ORANGE, position, index)
+        positions[position] = index
+    for index in fainted:
+        field.set_fainted(Teams.ORANGE, index)
+
+    tems = list(team)
+    active = [tems[index] for index in positions.values()]
+    assert {tem for _, tem in field.get_active(Teams.ORANGE)} == set(active)
+    assert list(field.get_bench(Teams.ORANGE)) == [tem for tem in tems if tem not in active]
+    assert list(BattleField.to_indexes(field.switch_mask(Teams.ORANGE))) == [
+        index for index, tem in enumerate(tems) if tem not in active and index not in fainted
+    ]
+    assert field.alive_mask(Teams.ORANGE) == BattleField.to_mask(
+        index for index in range(len(tems)) if index not in fainted
+    )
+
+    copy = field.copy()
+    assert copy == field and hash(copy) == hash(field)
+    assert (before == field) == (len(positions) == 0 and len(fainted) == 0)
+
+@given(seed=st.random_module(), damage=st.integers(min_value=0))
+def test_restore_undoes_the_battle_changes(new_state, seed, damage: int):
+    event(seed)
+    state = new_state(on_field=False)
+    for position in TeamBattlePosition:
+        state.set_battlefield_position(Teams.ORANGE, position, position.value - 1)
+    snapshot = state.snapshot()
+
+    tem = next(iter(state.get_team(Teams.BLUE)))
+    hp = tem.current_hp
+    technique = next(iter(tem.battle_techniques))
+    tem.set_hp(max(0, hp - damage))
+    technique.increment_held(3)
+    state.set_battlefield_position(Teams.ORANGE, TeamBattlePosition.RIGHT, 2)
+    state.set_battlefield_position(Teams.BLUE, TeamBattlePosition.LEFT, 0)
+    state.next_phase()
+    state.speed_tie()
+    state.select_action(
+        TeamAction({TeamBattlePosition.LEFT: RestAction(ActionTarget.SELF)}), Teams.BLUE
+    )
+    assert state.snapshot() != snapshot
+
+    state.restore(snapshot)
+    assert state.snapshot() == snapshot
+    assert tem.current_hp == hp and technique.held == 0
+    assert state.get_tem(Teams.BLUE, TeamBattlePosition.LEFT) is None
+    assert not state.is_team_action_selected(Teams.BLUE)
+
+@given(seed=st.random_module(), held=st.lists(st.integers(min_value=0, max_value=3)))
+def test_unready_techniques_are_never_offered(new_state, seed, held: list[int]):
+    event(seed)
+    state = new_state()
+    for technique, amount in zip(
+        (tech for team in Teams for tem in state.get_team(team) for tech in tem.battle_techniques),
+        held
+    ):
+        technique.increment_held(amount)
+
+    core = BattleCore.from_state(state)
+    allowed: list[type[Action]] = [RestAction, SwitchTemAction, UseTechniqueAction]
+
+    for team_index, team in enumerate(Teams):
+        encoded = EncodedActionSpace(state, team, allowed)
+        for code in encoded.legal_codes:
+            for action in dict(encoded.decode(code)).values():
+                if isinstance(action, UseTechniqueAction):
+                    assert action.technique.is_ready
+
+        for position in TeamBattlePosition:
+            assert all(
+                isinstance(action, UseTechniqueAction) and action.technique.is_ready
+                    for action in UseTechniqueAction.get_possible_actions(
+                        team, position, state
+                    ).get_actions(team, position)
+            )
+            codes = set(UseTechniqueAction.get_possible_codes(team, position, state))
+            assert codes == {
+                code for code in core.legal_codes(team_index, position.value - 1)
+                    if code >= ActionCode.TECHNIQUE
+            }
@@ -0,0 +1,60 @@
+import pytest
+
+from src.battle_team import Teams
+from src.campaign import Campaign, CampaignPolicy
+from src.sequential import IntervalWidth
+from src.replay import ReplayLog
+from src.simulate import SimulationConfig
+
+def matchup(orange_agent: str, blue_agent: str, **kwargs) -> SimulationConfig:
+    return SimulationConfig(
+        teams={team: None for team in Teams},
+        agents={Teams.ORANGE: orange_agent, Teams.BLUE: blue_agent},
+        **kwargs
+    )
+
+MATCHUPS = {
+    "lopsided": matchup("GreedyBattleAgent", "FirstActionAvailableBattleAgent"),
+    "close": matchup("RandomBattleAgent", "RandomBattleAgent"),
+}
+
+def test_uncertain_matchups_get_more_battles():
+    progress = list(Campaign(MATCHUPS, budget=120, chunk_size=5, seed=2).run())
+    final = progress[-1]
+    assert final.battles == 120 and len(progress) == 24
+    assert final.results["close"].battles > final.results["lopsided"].battles > 0
+
+    uniform = list(Campaign(MATCHUPS, 120, CampaignPolicy.UNIFORM, 5, seed=2).run())[-1]
+    assert uniform.results["close"].battles == uniform.results["lopsided"].battles == 60
+    assert "battles/s" in str(final)
+
+def test_campaigns_run_across_workers():
+    final = list(Campaign(MATCHUPS, budget=40, chunk_size=5, seed=2).run(workers=2))[-1]
+    assert final.battles == 40
+    assert final.results["lopsided"].scores.mean == pytest.approx(
+        final.results["lopsided"].win_rate(Teams.ORANGE) +
+            final.results["lopsided"].win_rate(None) / 2
+    )
+
+def test_matchups_stop_once_precise_enough():
+    matchups = {
+        "lopsided": matchup(
+            "GreedyBattleAgent", "FirstActionAvailableBattleAgent",
+            stopping=IntervalWidth(0.3, min_battles=10)
+        ),
+    }
+    final = list(Campaign(matchups, budget=500, chunk_size=5).run())[-1]
+    assert 10 <= final.battles < 500
+
+def test_matchups_append_their_replays_to_their_log(tmp_path):
+    matchups = {
+        **MATCHUPS, "logged": matchup(
+            "RandomBattleAgent", "GreedyBattleAgent", replay_log=tmp_path / "logged.replays"
+        ),
+    }
+    final = list(Campaign(matchups, budget=30, chunk_size=5, seed=2).run())[-1]
+    assert not any(results.replays for results in final.results.values())
+    log = ReplayLog(tmp_path / "logged.replays")
+    assert len(log) == final.results["logged"].battles > 0
+    assert sum(result.winner == Teams.ORANGE for result in log.results()) == \
+        final.results["logged"].orange_wins
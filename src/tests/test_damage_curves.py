@@ -0,0 +1,31 @@
+from hypothesis import event, given, strategies as st
+
+from src.damage_curves import level_axis
+from src.tem import Tem
+from src.tempedia import Tempedia
+import src.tem_tem_constants as TemTemConstants
+
+
+@given(
+    seed=st.random_module(),
+    attacker_id=st.integers(min_value=1, max_value=Tempedia.size()),
+    defender_id=st.integers(min_value=1, max_value=Tempedia.size()),
+)
+def test_damage_curve_matches_scalar_damage(seed, attacker_id: int, defender_id: int):
+    event(seed)
+    attacker = Tem.from_random_stats(attacker_id)
+    defender = Tem.from_random_stats(defender_id)
+
+    # both at the attacker's level, so that the scalar calculation is comparable
+    defender.level_up(attacker.level - defender.level)
+    levels = level_axis(TemTemConstants.TEM_MIN_LEVEL, TemTemConstants.TEM_MAX_LEVEL)
+
+    assert all(
+        attacker.stats_curves(levels)[stat][attacker.level - 1] == value
+            for stat, value in attacker.stats.items()
+    )
+
+    for technique in attacker.battle_techniques:
+        curve = attacker.calculate_atacking_damage_curve(technique, defender, levels)
+        assert curve[attacker.level - 1] == \
+            attacker.calculate_atacking_damage(technique, defender)
@@ -0,0 +1,125 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from src.battle import Battle
+from src.battle_agent import BattleAgent, FirstActionAvailableBattleAgent, MCTSBattleAgent
+from src.battle_core import BattleCore
+from src.battle_handler import TamerBattleHandler
+from src.battle_state import BattleState, SidedBattleState, TeamAction
+from src.battle_team import Teams
+from src.decision_budget import DecisionBudget, DecisionLatencies, FallbackPolicy
+from src.mcts import SearchConfig
+from src.rng import Rng
+from src.team import PlaythroughTeam
+
+class SlowAgent(FirstActionAvailableBattleAgent):
+    def choose_action(self, state: SidedBattleState) -> TeamAction:
+        time.sleep(0.2)
+        return super().choose_action(state)
+
+class SlowAsyncAgent(FirstActionAvailableBattleAgent):
+    async def achoose_action(self, state: SidedBattleState) -> TeamAction:
+        await asyncio.sleep(0.2)
+        return self.choose_action(state)
+
+class LateAgent(FirstActionAvailableBattleAgent):
+    """
+    Reads the battle once the handler has moved on without it.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.moved_on = threading.Event()
+        self.hashes: list[tuple[int, int, int]] = []
+
+    def choose_action(self, state: SidedBattleState) -> TeamAction:
+        assert state.battle_state is not None
+        before = BattleCore.from_state(state.battle_state).hash
+        self.moved_on.wait(1)
+        self.hashes.append((
+            before,
+            BattleCore.from_state(state.battle_state, snapshot=state.snapshot).hash,
+            BattleCore.from_state(state.battle_state).hash
+        ))
+        return super().choose_action(state)
+
+class SearchingAgent(MCTSBattleAgent):
+    def __init__(self) -> None:
+        super().__init__(Rng(0), SearchConfig(iterations=10**9))
+        self.returned = threading.Event()
+
+    def choose_action(self, state: SidedBattleState) -> TeamAction:
+        action = super().choose_action(state)
+        self.returned.set()
+        return action
+
+def new_battle() -> Battle:
+    return Battle(
+        BattleState(
+            team_orange=PlaythroughTeam.get_random(),
+            team_blue=PlaythroughTeam.get_random()
+        ),
+        TamerBattleHandler()
+    )
+
+@pytest.mark.parametrize("fallback", list(FallbackPolicy))
+@pytest.mark.parametrize("slow_agent_class", [SlowAgent, SlowAsyncAgent])
+def test_slow_agents_fall_back(fallback: FallbackPolicy, slow_agent_class: type[BattleAgent]):
+    slow = slow_agent_class()
+    slow.decision_budget = DecisionBudget(0.01, fallback)
+    players: dict[Teams, BattleAgent] = {
+        Teams.ORANGE: slow, Teams.BLUE: FirstActionAvailableBattleAgent()
+    }
+    battle = new_battle()
+
+    start = time.perf_counter()
+    battle.step(players)
+    asyncio.run(battle.astep(players))
+    assert time.perf_counter() - start < 0.3
+
+    latencies = battle.context.latencies
+    assert latencies[Teams.ORANGE].timeouts == 2 and len(latencies[Teams.ORANGE]) == 2
+    assert latencies[Teams.BLUE].timeouts == 0 and len(latencies[Teams.BLUE]) == 2
+    assert max(latencies[Teams.ORANGE].samples) < 0.1
+    assert Teams.ORANGE in battle.context.last_action_codes or \
+        fallback != FallbackPolicy.LAST_ACTION
+
+def test_timed_out_agents_read_the_battle_they_were_given():
+    late = LateAgent()
+    executor = ThreadPoolExecutor(1)
+    late.decision_budget = DecisionBudget(0.01, executor=executor)
+    battle = new_battle()
+
+    battle.step({Teams.ORANGE: late, Teams.BLUE: FirstActionAvailableBattleAgent()})
+    assert battle.context.latencies[Teams.ORANGE].timeouts == 1
+    late.moved_on.set()
+    executor.shutdown()
+
+    assert len(late.hashes) == 1
+    before, snapshot, live = late.hashes[0]
+    assert snapshot == before
+    assert live != before
+
+def test_searching_agents_stop_at_their_deadline():
+    searching = SearchingAgent()
+    searching.decision_budget = DecisionBudget(0.05)
+    battle = new_battle()
+
+    battle.step({Teams.ORANGE: searching, Teams.BLUE: FirstActionAvailableBattleAgent()})
+    assert searching.returned.wait(1)
+    assert 0 < searching.stats.iterations < 10**9
+
+def test_latency_percentiles():
+    latencies = DecisionLatencies()
+    assert not latencies.percentiles()
+
+    for millis in range(1, 101):
+        latencies.record(millis / 1000, timed_out=millis > 95)
+    other = DecisionLatencies()
+    other.merge(latencies)
+
+    assert other.timeouts == 5 and len(other) == 100
+    assert other.percentiles((50, 99)) == pytest.approx({50: 0.0505, 99: 0.09901})
@@ -0,0 +1,51 @@
+from src.action_code import ActionCode
+from src.battle import Battle
+from src.battle_agent import GreedyBattleAgent, RandomBattleAgent
+from src.battle_core import POSITIONS, BattleCore
+from src.battle_handler import TamerBattleHandler
+from src.battle_team import Teams
+from src.greedy import DamageTable, score_actions
+from src.mcts import team_actions
+from src.rng import Rng
+
+def test_damage_table_works_fields_out_once(new_state):
+    core = BattleCore.from_state(new_state())
+    table = DamageTable(core.tables)
+    hits = table.hits(core.positions)
+    assert table.hits(core.positions) is hits and len(table) == 1
+
+    for index, tem in enumerate(core.positions):
+        assert {code for code, _ in core.tables.technique_codes[tem]} == set(hits[index])
+    for technique, defenders in hits[0].values():
+        for defender, damage in defenders:
+            assert damage == core.tables.damage[technique * len(core.hp) + defender]
+
+    core.run_turn([ActionCode.REST] * len(core.positions))
+    table.hits(core.positions)
+    assert len(table) == 1 # resting doesn't change the field
+
+def test_scores_weigh_damage_dealt_and_taken(new_state):
+    core = BattleCore.from_state(new_state())
+    table = DamageTable(core.tables)
+    actions = team_actions(core, 0) + [(ActionCode.RUN,) * POSITIONS]
+    scores = score_actions(core, 0, actions, table)
+
+    assert scores[-1] == -float("inf")
+    rest = scores[actions.index((ActionCode.REST,) * POSITIONS)]
+    assert rest <= 0 # resting deals nothing
+    assert max(scores) >= rest
+
+def test_greedy_agent_beats_random_agents(new_state):
+    wins = 0
+    for seed in range(10):
+        rng = Rng(seed)
+        battle = Battle(
+            new_state(rng, on_field=False),
+            TamerBattleHandler()
+        )
+        agent = GreedyBattleAgent(rng)
+        result = battle.run({Teams.ORANGE: agent, Teams.BLUE: RandomBattleAgent(rng)})
+        assert agent.damage_table(battle.state) is agent.damage_table(battle.state)
+        wins += result.winner == Teams.ORANGE
+
+    assert wins >= 7
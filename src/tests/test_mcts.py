@@ -0,0 +1,44 @@
+from src.battle import Battle
+from src.battle_agent import MCTSBattleAgent, RandomBattleAgent
+from src.battle_core import BattleCore
+from src.battle_handler import TamerBattleHandler
+from src.battle_team import Teams
+from src.mcts import SearchConfig, evaluate, search, team_actions
+from src.rng import Rng
+
+def test_search_spreads_its_iterations_over_the_root_actions(new_state):
+    core = BattleCore.from_state(new_state())
+    before = core.hash
+    actions = team_actions(core, 0)
+
+    visits, stats = search(
+        core, 0, actions, Rng(1), SearchConfig(iterations=len(actions) * 2)
+    )
+    assert core.hash == before and not core.is_over
+    assert sum(visits) == stats.iterations == len(actions) * 2
+    assert min(visits) >= 1 # every action is tried before any is tried again
+    assert stats.iterations_per_second > 0
+
+    visits, stats = search(core, 0, actions, Rng(1), SearchConfig(seconds=0.05))
+    assert sum(visits) == stats.iterations > 0
+
+def test_evaluate_prefers_the_winner(new_state):
+    core = BattleCore.from_state(new_state())
+    assert 0 < evaluate(core, 0) < 1
+    assert evaluate(core, 0) + evaluate(core, 1) == 1
+    core.winner = 1
+    assert (evaluate(core, 0), evaluate(core, 1)) == (0, 1)
+
+def test_mcts_agent_plays_battles(new_state):
+    rng = Rng(7)
+    for workers in [1, 2]:
+        battle = Battle(
+            new_state(rng, on_field=False),
+            TamerBattleHandler()
+        )
+        agent = MCTSBattleAgent(rng, SearchConfig(iterations=10), workers)
+        result = battle.run({Teams.ORANGE: agent, Teams.BLUE: RandomBattleAgent(rng)})
+
+        assert result.turns > 0
+        assert agent.stats.iterations >= 10 * workers
+        assert agent.stats.iterations_per_second > 0
@@ -0,0 +1,90 @@
+from hypothesis import event, given, settings, strategies as st
+
+from src.battle import Battle
+from src.battle_agent import MinimaxBattleAgent, RandomBattleAgent
+from src.battle_core import BattleCore
+from src.battle_handler import TamerBattleHandler
+from src.battle_team import Teams
+from src.minimax import (
+    WIN, MinimaxConfig, MinimaxSearch, OpponentModel, expected_damage, heuristic, ordered_actions
+)
+from src.rng import Rng
+
+BREADTH = 3
+
+def brute_force(core: BattleCore, depth: int) -> float:
+    """
+    The worst case value of the core for team 0, searching every answer without pruning.
+    """
+    if core.is_over or depth == 0:
+        return heuristic(core, 0)
+    values = []
+    for action in ordered_actions(core, 0, BREADTH):
+        worst = float("inf")
+        for answer in ordered_actions(core, 1, BREADTH):
+            child = core.copy()
+            child.run_turn(action + answer)
+            worst = min(worst, brute_force(child, depth - 1))
+        values.append(worst)
+    return max(values)
+
+def test_heuristic_is_zero_sum(new_state):
+    core = BattleCore.from_state(new_state())
+    assert heuristic(core, 0) == -heuristic(core, 1)
+    core.winner = 0
+    assert (heuristic(core, 0), heuristic(core, 1)) == (WIN, -WIN)
+
+def test_actions_are_ordered_by_expected_damage(new_state):
+    core = BattleCore.from_state(new_state())
+    actions = ordered_actions(core, 0)
+    damages = [
+        sum(expected_damage(core, 0, position, code) for position, code in enumerate(action))
+            for action in actions
+    ]
+    assert damages == sorted(damages, reverse=True)
+    assert ordered_actions(core, 0, BREADTH) == actions[:BREADTH]
+
+@settings(max_examples=10, deadline=None)
+@given(seed=st.random_module(), depth=st.integers(min_value=1, max_value=2))
+def test_pruned_search_finds_the_minimax_action(new_state, seed, depth):
+    event(seed)
+    core = BattleCore.from_state(new_state())
+    before = core.hash
+    root_actions = ordered_actions(core, 0, BREADTH)
+
+    best, stats = MinimaxSearch(MinimaxConfig(max_depth=depth, breadth=BREADTH)).search(
+        core, 0, root_actions
+    )
+    assert core.hash == before
+    assert stats.depth == depth and stats.nodes > 0
+
+    def worst_case(action):
+        values = []
+        for answer in ordered_actions(core, 1, BREADTH):
+            child = core.copy()
+            child.run_turn(action + answer)
+            values.append(brute_force(child, depth - 1))
+        return min(values)
+
+    assert worst_case(best) == max(worst_case(action) for action in root_actions)
+
+def test_deepening_always_finishes_the_first_depth(new_state):
+    core = BattleCore.from_state(new_state())
+    root_actions = ordered_actions(core, 0)
+    for opponent in OpponentModel:
+        best, stats = MinimaxSearch(
+            MinimaxConfig(max_depth=5, seconds=0, opponent=opponent)
+        ).search(core, 0, root_actions)
+        assert best in root_actions and stats.depth == 1
+
+def test_minimax_agent_plays_battles(new_state):
+    rng = Rng(11)
+    battle = Battle(
+        new_state(rng, on_field=False),
+        TamerBattleHandler()
+    )
+    agent = MinimaxBattleAgent(rng, MinimaxConfig(max_depth=2, breadth=4))
+    result = battle.run({Teams.ORANGE: agent, Teams.BLUE: RandomBattleAgent(rng)})
+
+    assert result.turns > 0
+    assert agent.stats.depth >= 1 and agent.stats.nodes > 0
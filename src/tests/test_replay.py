@@ -0,0 +1,84 @@
+from hypothesis import given, settings, strategies as st
+import pytest
+
+from src.battle import Battle
+from src.battle_agent import RandomBattleAgent
+from src.battle_core import TEAM_SIZE
+from src.battle_handler import TamerBattleHandler
+from src.battle_state import BattleState
+from src.battle_team import Teams
+from src.replay import BattleRecorder, BattleReplay, ReplayLog
+from src.rng import Rng
+from src.simulate import load_team
+from src.team import PlaythroughTeam
+from src.tem import Tem, TemBattleConfig, TemSpeciesConfig
+
+def play_recorded(orange: PlaythroughTeam, blue: PlaythroughTeam) -> Battle:
+    rng = Rng(0)
+    battle = Battle(BattleState(orange, blue), TamerBattleHandler(), BattleRecorder(0))
+    players = {team: RandomBattleAgent(agent_rng) for team, agent_rng in zip(Teams, rng.split(2))}
+    while not battle.step(players):
+        pass
+    return battle
+
+@settings(max_examples=25, deadline=None)
+@given(seed=st.integers(min_value=0, max_value=2**32))
+def test_replays_reproduce_battles(play_battle, seed: int):
+    battle, _ = play_battle(seed)
+    replay = battle.replay()
+    assert replay.seed == seed
+    assert replay.result == battle.state.result
+
+    core = replay.replay()
+    assert core.is_over
+    assert core.winner == replay.winner
+    for team_index, team in enumerate(Teams):
+        hps = [tem.current_hp for tem in battle.state.get_team(team)]
+        assert list(core.hp[team_index * TEAM_SIZE:team_index * TEAM_SIZE + len(hps)]) == hps
+
+def test_replay_log_appends_and_reads_back(play_battle, tmp_path):
+    log = ReplayLog(tmp_path / "campaign.replays")
+    assert len(log) == 0 and not list(log)
+
+    battles = [play_battle(seed)[0] for seed in range(3)]
+    log.append(battles[0].replay())
+    assert len(log) == 1
+    log.append(*(battle.replay() for battle in battles[1:]))
+
+    assert len(log) == len(battles)
+    assert list(log.results()) == [battle.state.result for battle in battles]
+    for battle, replay in zip(battles, log):
+        assert replay.to_bytes() == battle.replay().to_bytes()
+        assert replay.replay().winner == replay.winner
+    assert log[2].seed == 2
+
+def test_replays_keep_traits_but_only_replay_battles_they_did_nothing_in():
+    # none of the opponent tems' traits are modelled
+    battle = play_recorded(
+        load_team("nuzlocke_helper_configs/opponent_tems.json", Rng(1)),
+        load_team("nuzlocke_helper_configs/my_team.json", Rng(2))
+    )
+    replay = BattleReplay.from_bytes(battle.replay().to_bytes())
+    assert [tem.trait for tem in replay.new_state().get_team(Teams.ORANGE)] == \
+        [tem.trait for tem in battle.state.get_team(Teams.ORANGE)]
+    assert not replay.has_traits
+    assert replay.replay().winner == replay.winner
+
+def test_trait_battles_are_recorded_but_not_replayed():
+    saku = [
+        Tem(
+            species_config=TemSpeciesConfig.from_data("Saku"),
+            battle_config=TemBattleConfig.from_data(
+                battle_techniques=["Debris Typhoon"], level=50, trait="air specialist"
+            )
+        ) for _ in range(2)
+    ]
+    battle = play_recorded(
+        PlaythroughTeam(saku), load_team("nuzlocke_helper_configs/my_team.json", Rng(2))
+    )
+    replay = BattleReplay.from_bytes(battle.replay().to_bytes())
+    assert [tem.trait for tem in replay.new_state().get_team(Teams.ORANGE)] == \
+        ["Air Specialist"] * 2
+    assert replay.has_traits
+    with pytest.raises(AssertionError, match="traits"):
+        replay.replay()
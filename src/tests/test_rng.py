@@ -0,0 +1,37 @@
+import random
+
+from hypothesis import given, strategies as st
+
+from src.rng import GLOBAL_RNG, Rng
+from src.team import PlaythroughTeam
+
+def draws(rng: Rng) -> tuple:
+    return (
+        [rng.randint(0, 1000) for _ in range(10)],
+        rng.numpy.integers(0, 1000, 10).tolist(),
+    )
+
+@given(seed=st.integers(min_value=0))
+def test_split_streams_are_reproducible_and_independent(seed: int):
+    rng, same = Rng(seed), Rng(seed)
+    assert draws(rng) == draws(same)
+
+    children = rng.split(3)
+    assert [draws(child) for child in children] == [draws(child) for child in same.split(3)]
+    assert len({str(draws(child)) for child in children + rng.split(3)}) == 6
+
+def test_global_rng_follows_the_random_module():
+    random.seed(7)
+    first = draws(GLOBAL_RNG), [draws(child) for child in GLOBAL_RNG.split(2)]
+    random.seed(7)
+    assert (draws(GLOBAL_RNG), [draws(child) for child in GLOBAL_RNG.split(2)]) == first
+
+@given(seed=st.integers(min_value=0))
+def test_random_teams_are_reproducible(seed: int):
+    first, second = [
+        [
+            (tem.species_name, tem.level, tem.stats, tem.battle_techniques.names)
+                for tem in PlaythroughTeam.get_random(Rng(seed))
+        ] for _ in range(2)
+    ]
+    assert first == second
@@ -0,0 +1,42 @@
+from functools import reduce
+
+from hypothesis import given, strategies as st
+import numpy as np
+import pytest
+
+from src.sequential import SPRT, IntervalWidth, Welford
+
+scores = st.lists(st.sampled_from([0.0, 0.5, 1.0]), min_size=2, max_size=200)
+
+def accumulate(values: list[float]) -> Welford:
+    return reduce(Welford.add, values, Welford())
+
+@given(values=scores, split=st.integers(min_value=0, max_value=200))
+def test_welford_matches_batch_statistics(values: list[float], split: int):
+    stats = accumulate(values)
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(np.mean(values))
+    assert stats.variance == pytest.approx(np.var(values, ddof=1), abs=1e-12)
+
+    merged = accumulate(values[:split]) + accumulate(values[split:])
+    assert merged.count == stats.count
+    assert merged.mean == pytest.approx(stats.mean)
+    assert merged.m2 == pytest.approx(stats.m2, abs=1e-9)
+
+def test_interval_width_stops_lopsided_matchups_sooner():
+    rule = IntervalWidth(0.2)
+    lopsided = [1.0] * 200
+    balanced = [1.0, 0.0] * 100
+    first_stop = [
+        next(count for count in range(1, 201) if rule.should_stop(accumulate(values[:count])))
+            for values in (lopsided, balanced)
+    ]
+    assert rule.min_battles <= first_stop[0] < first_stop[1]
+
+def test_sprt_accepts_the_right_hypothesis():
+    rule = SPRT(0.5, 0.6)
+    assert rule.verdict(accumulate([1.0, 0.0] * 5)) is None
+    assert rule.verdict(accumulate([1.0] * 40)) is True
+    assert rule.verdict(accumulate([1.0, 0.0, 0.0] * 100)) is False
+    assert not rule.should_stop(accumulate([1.0] * (rule.min_battles - 1)))
+    assert rule.should_stop(accumulate([1.0] * rule.min_battles))
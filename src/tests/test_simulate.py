@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from src.battle_team import Teams
+from src.replay import ReplayLog
+from src.rng import Rng
+from src.sequential import IntervalWidth
+from src.simulate import SimulationConfig, run_battles, simulate
+
+def test_simulation_results_do_not_depend_on_workers():
+    config = SimulationConfig(
+        teams={Teams.ORANGE: None, Teams.BLUE: "nuzlocke_helper_configs/my_team.json"},
+        agents={Teams.ORANGE: "FirstActionAvailableBattleAgent", Teams.BLUE: "RandomBattleAgent"},
+    )
+    serial = list(simulate(config, battles=6, workers=1, seed=3, chunk_size=2))
+    parallel = list(simulate(config, battles=6, workers=2, seed=3, chunk_size=2))
+
+    assert [results.battles for results in serial] == [2, 4, 6]
+    final = serial[-1]
+    assert (final.orange_wins, final.blue_wins, final.turns) == \
+        (parallel[-1].orange_wins, parallel[-1].blue_wins, parallel[-1].turns)
+    assert sum(final.win_rate(team) for team in [*Teams, None]) == pytest.approx(1)
+    assert final.scores.count == final.battles
+    assert final.scores.mean == pytest.approx(final.win_rate(Teams.ORANGE) + final.draws / 12)
+
+def test_simulation_appends_replays_to_the_log(tmp_path):
+    config = SimulationConfig(
+        teams={team: None for team in Teams},
+        agents={team: "RandomBattleAgent" for team in Teams},
+        replay_log=tmp_path / "campaign.replays",
+    )
+    results = list(simulate(config, battles=4, workers=1, seed=5, chunk_size=3))
+
+    log = ReplayLog(tmp_path / "campaign.replays")
+    assert len(log) == results[-1].battles == 4
+    assert results[-1].replays == ()
+    assert all(replay.seed == 5 for replay in log)
+    assert [(replay.stream, replay.index) for replay in log] == \
+        [((0,), 0), ((0,), 1), ((0,), 2), ((1,), 0)]
+    assert sum(result.winner == Teams.ORANGE for result in log.results()) == results[-1].orange_wins
+
+    # a battle is played again by running its chunk's stream up to it
+    replay = log[2]
+    again = run_battles(
+        config,
+        replay.index + 1,
+        Rng(np.random.SeedSequence(replay.seed, spawn_key=replay.stream))
+    )
+    assert again.replays[-1].to_bytes() == replay.to_bytes()
+
+def test_simulation_stops_once_precise_enough():
+    config = SimulationConfig(
+        teams={team: None for team in Teams},
+        agents={Teams.ORANGE: "GreedyBattleAgent", Teams.BLUE: "FirstActionAvailableBattleAgent"},
+        stopping=IntervalWidth(0.3, min_battles=10),
+    )
+    results = list(simulate(config, battles=1000, workers=1, seed=1, chunk_size=5))
+    assert 10 <= results[-1].battles < 1000
+    assert config.stopping is not None and config.stopping.should_stop(results[-1].scores)
+    assert not config.stopping.should_stop(results[-2].scores)
@@ -0,0 +1,74 @@
+from hypothesis import event, given, settings, strategies as st
+
+from src.technique import Technique
+from src.tem import Tem, TemBattleConfig, TemSpeciesConfig
+from src.tem_stat import Stat
+from src.tem_tem_type import TemTemType
+from src.tempedia import Tempedia
+from src.threats import ReverseQuery, SpeciesFilter, find_kos, find_threats
+from src.traits import damage_bounds
+import src.tem_tem_constants as TemTemConstants
+
+def species_tem(species_id: int, level: int, techniques: list[str], sv: int) -> Tem:
+    name = Tempedia.get_name(species_id)
+    return Tem(
+        species_config=TemSpeciesConfig.from_data(
+            name,
+            TemTemType.get_random_type(TemTemType.NO_TYPE, *Tempedia.get_types(species_id)) \
+                if name.lower() in TemTemConstants.MULTIPLE_SECONDARY_TYPE else None
+        ),
+        battle_config=TemBattleConfig.from_data(
+            battle_techniques=techniques, svs=[sv] * len(Stat), level=level
+        )
+    )
+
+@settings(max_examples=25)
+@given(
+    seed=st.random_module(),
+    attacker_id=st.integers(min_value=1, max_value=Tempedia.size()),
+    level=st.integers(
+        min_value=TemTemConstants.TEM_MIN_LEVEL, max_value=TemTemConstants.TEM_MAX_LEVEL
+    )
+)
+def test_find_kos_matches_scalar_damage(seed, attacker_id: int, level: int):
+    event(seed)
+    attacker = Tem.from_random_stats(attacker_id)
+
+    for technique in attacker.battle_techniques:
+        kos = find_kos(
+            attacker, technique, ReverseQuery(level, hits=TemTemConstants.BATTLE_MAX_TURNS)
+        )
+        assert [k.max_percent for k in kos] == sorted((k.max_percent for k in kos), reverse=True)
+
+        for ko in kos[:3]:
+            defender = species_tem(ko.species_id, level, [technique.name], TemTemConstants.MAX_SV)
+            low, _ = damage_bounds(attacker, technique, defender)
+            assert ko.min_percent == attacker.calculate_atacking_damage(
+                technique, defender, low
+            ) / defender.stats[Stat.HP]
+
+@settings(max_examples=25)
+@given(
+    seed=st.random_module(),
+    defender_id=st.integers(min_value=1, max_value=Tempedia.size()),
+    level=st.integers(
+        min_value=TemTemConstants.TEM_MIN_LEVEL, max_value=TemTemConstants.TEM_MAX_LEVEL
+    ),
+    species_type=st.sampled_from([t for t in TemTemType if t != TemTemType.NO_TYPE])
+)
+def test_find_threats_matches_scalar_damage(seed, defender_id: int, level: int, species_type):
+    event(seed)
+    defender = Tem.from_random_stats(defender_id)
+    threats = find_threats(defender, ReverseQuery(
+        level, hits=TemTemConstants.BATTLE_MAX_TURNS,
+        species_filter=SpeciesFilter(types=frozenset([species_type]))
+    ))
+
+    for threat in threats[:3]:
+        assert species_type in Tempedia.get_types(threat.species_id)
+        attacker = species_tem(threat.species_id, level, [threat.technique], TemTemConstants.MAX_SV)
+        technique = Technique(threat.technique)
+        _, high = damage_bounds(attacker, technique, defender)
+        assert threat.max_percent == defender.calculate_defensive_damage(
+            technique, attacker, high
+        ) / defender.stats[Stat.HP]
@@ -0,0 +1,86 @@
+from itertools import combinations
+
+import pytest
+
+from src.team import PlaythroughTeam
+from src.tournament import (
+    Game, GameResult, Pairing, Tournament, TournamentConfig, elo_ratings, glicko_ratings,
+    schedule
+)
+
+AGENTS = ("GreedyBattleAgent", "RandomBattleAgent", "FirstActionAvailableBattleAgent")
+
+def test_ratings_rank_the_stronger_agent_first():
+    agents = ("strong", "weak")
+    results = [
+        GameResult(Game(round_index, 0, agents), (3, 1), 0, 0) for round_index in range(5)
+    ]
+    elo = elo_ratings(agents, results)
+    assert elo["strong"] > elo["weak"]
+    assert elo["strong"] + elo["weak"] == pytest.approx(3000)
+
+    glicko = glicko_ratings(agents, results)
+    assert glicko["strong"].rating > glicko["weak"].rating
+    fewer = glicko_ratings(agents, results[:1])
+    assert glicko["strong"].deviation < fewer["strong"].deviation
+    low, high = glicko["strong"].interval()
+    assert low < glicko["strong"].rating < high
+
+def test_round_robin_pairs_everyone():
+    config = TournamentConfig(AGENTS)
+    games = schedule(config, 0, [])
+    assert {frozenset(game.agents) for game in games} == \
+        {frozenset(pair) for pair in combinations(AGENTS, 2)}
+    assert [game.agents[::-1] for game in games] == \
+        [game.agents for game in schedule(config, 1, [])]
+
+def test_swiss_rotates_who_sits_out():
+    config = TournamentConfig(AGENTS, pairing=Pairing.SWISS, rounds=3)
+    results: list[GameResult] = []
+    sat_out = set()
+    for round_index in range(config.rounds):
+        games = schedule(config, round_index, results)
+        assert len(games) == 1
+        sat_out |= set(AGENTS) - set(games[0].agents)
+        results += [GameResult(game, (1, 0), 0, 0) for game in games]
+    assert sat_out == set(AGENTS)
+
+def test_games_draw_random_teams_once(monkeypatch, tmp_path):
+    get_random = PlaythroughTeam.get_random
+    drawn: list[PlaythroughTeam] = []
+    def draw(rng=None) -> PlaythroughTeam:
+        drawn.append(get_random(rng))
+        return drawn[-1]
+    monkeypatch.setattr(PlaythroughTeam, "get_random", draw)
+
+    config = TournamentConfig(AGENTS[:2], battles=4)
+    (result,) = Tournament(config, tmp_path / "tournament.jsonl").run()
+    assert result.battles == 4
+    assert len(drawn) == 2 # one team per side, for all the battles of the game
+
+def test_tournaments_resume_where_they_stopped(tmp_path):
+    config = TournamentConfig(AGENTS, rounds=2, battles=2, seed=3)
+    path = tmp_path / "tournament.jsonl"
+
+    for _ in Tournament(config, path).run():
+        break # interrupted after the first game
+    with path.open("a", encoding="utf8") as file:
+        file.write('{"game": {"rou') # and while writing the second
+
+    resumed = Tournament(config, path)
+    assert len(resumed.results) == 1
+    assert len(list(resumed.run())) == 5
+    assert not list(Tournament(config, path).run())
+
+    complete = Tournament(config, tmp_path / "complete.jsonl")
+    list(complete.run(workers=2))
+    assert sorted(complete.results, key=str) == sorted(resumed.results, key=str)
+    assert [standing.agent for standing in complete.standings()][0] == "GreedyBattleAgent"
+
+    with pytest.raises(ValueError):
+        Tournament(TournamentConfig(AGENTS), path)
+
+    swiss = TournamentConfig(AGENTS, pairing=Pairing.SWISS, rounds=3, battles=2, seed=1)
+    played = [result.game for result in Tournament(swiss, tmp_path / "swiss.jsonl").run()]
+    assert [game.round for game in played] == [0, 1, 2]
+    assert not list(Tournament(swiss, tmp_path / "swiss.jsonl").run())
@@ -0,0 +1,101 @@
+import pytest
+
+from src.battle_state import BattleState, RestAction, SwitchTemAction, UseTechniqueAction
+from src.battle_team import TeamBattlePosition, Teams
+from src.targets import ActionTarget
+from src.team import PlaythroughTeam
+from src.technique import Technique, TechniqueClass
+from src.tem import Tem, TemBattleConfig, TemSpeciesConfig
+from src.tem_stat import Stat
+from src.tem_tem_type import TemTemType
+from src.tempedia import Tempedia
+from src.traits import TRAITS, TraitEvent, damage_bounds
+
+SAKU, VENMET, VENX = 49, 155, 154
+
+def trait_tem(species_id: int, techniques: list[str], trait=None) -> Tem:
+    return Tem(
+        species_config=TemSpeciesConfig.from_data(Tempedia.get_name(species_id)),
+        battle_config=TemBattleConfig.from_data(
+            battle_techniques=techniques, svs=[25] * len(Stat), level=50, trait=trait
+        )
+    )
+
+def battle(orange: list[Tem], blue: list[Tem]) -> BattleState:
+    state = BattleState(PlaythroughTeam(orange), PlaythroughTeam(blue))
+    for team in Teams:
+        # a single tem on the field, the others are benched
+        state.set_battlefield_position(team, TeamBattlePosition.LEFT, 0)
+    return state
+
+def test_specs_compile_into_effects():
+    (air_specialist,) = TRAITS["Air Specialist"].effects
+    assert air_specialist.event == TraitEvent.TECHNIQUE_TYPE_USED
+    assert (air_specialist.technique_type, air_specialist.dmg_modifier) == \
+        (TemTemType.WIND, 1.15)
+    # Brawny keeps its technique class under "type"
+    assert TRAITS["Brawny"].effects[0].technique_class == TechniqueClass.PHYSICAL
+    # type changes aren't modelled
+    assert not TRAITS["Adaptive"].effects and not TRAITS["Adaptive"].is_modelled
+
+def test_traits_change_the_damage_dealt():
+    def hit(trait) -> int:
+        saku = trait_tem(SAKU, ["Debris Typhoon"], trait)
+        defender = trait_tem(VENMET, ["Scratch"])
+        state = battle([saku], [defender])
+        action = UseTechniqueAction(ActionTarget.OPPONENT_LEFT, next(iter(saku.battle_techniques)))
+        action.execute(Teams.ORANGE, TeamBattlePosition.LEFT, state)
+        return defender.stats[Stat.HP] - defender.current_hp
+
+    saku, defender = trait_tem(SAKU, ["Debris Typhoon"]), trait_tem(VENMET, ["Scratch"])
+    technique = next(iter(saku.battle_techniques))
+    assert hit(None) == saku.calculate_atacking_damage(technique, defender)
+    assert hit("air specialist") == saku.calculate_atacking_damage(technique, defender, 1.15)
+    assert hit("Botanist") == hit(None)
+
+def test_battles_without_traits_listen_to_nothing():
+    state = battle([trait_tem(SAKU, ["Debris Typhoon"])], [trait_tem(VENMET, ["Scratch"])])
+    assert not state.traits.events
+
+def test_stat_stages_are_snapshotted():
+    venmet = trait_tem(VENMET, ["Scratch"], "Aggressor")
+    bench = trait_tem(VENMET, ["Scratch"], "Aggressor")
+    state = battle([venmet, bench], [trait_tem(SAKU, ["Debris Typhoon"])])
+    assert state.traits.stat_stages(venmet) == {Stat.ATK: 1, Stat.DEF: -1}
+    assert not state.traits.stat_stages(bench)
+
+    snapshot = state.snapshot()
+    SwitchTemAction(bench).execute(Teams.ORANGE, TeamBattlePosition.LEFT, state)
+    RestAction(ActionTarget.SELF).execute(Teams.ORANGE, TeamBattlePosition.LEFT, state)
+    assert state.traits.stat_stages(bench) == {Stat.ATK: 1, Stat.DEF: -1}
+
+    state.restore(snapshot)
+    assert state.traits.stat_stages(venmet) == {Stat.ATK: 1, Stat.DEF: -1}
+    assert not state.traits.stat_stages(bench)
+
+def test_trait_state_is_hashed():
+    venmet = trait_tem(VENMET, ["Scratch"], "Aggressor")
+    state = battle([venmet], [trait_tem(SAKU, ["Debris Typhoon"])])
+    snapshot = state.snapshot()
+    hashed = state.zobrist_hash
+
+    state.traits.restore(())
+    assert not state.traits.stat_stages(venmet)
+    assert state.zobrist_hash != hashed
+    state.restore(snapshot)
+    assert state.zobrist_hash == hashed
+
+def test_unknown_traits_widen_the_damage_bounds():
+    saku, venmet = trait_tem(SAKU, ["Debris Typhoon"]), trait_tem(VENMET, ["Scratch"])
+    wind = next(iter(saku.battle_techniques))
+    # Air Specialist or Botanist
+    assert damage_bounds(saku, wind, venmet) == (1, 1.15)
+    assert damage_bounds(trait_tem(SAKU, ["Debris Typhoon"], "Botanist"), wind, venmet) == (1, 1)
+    # Parrier or Arcane Wrap, which only cuts special damage
+    venx = trait_tem(VENX, ["Scratch"])
+    assert damage_bounds(saku, wind, venx) == (1, 1.15)
+    assert damage_bounds(venmet, Technique("Water Blade"), venx) == (0.8, 1)
+
+def test_tems_only_get_their_species_traits():
+    with pytest.raises(AssertionError):
+        trait_tem(SAKU, ["Debris Typhoon"], "Aggressor")
@@ -0,0 +1,85 @@
+import numpy as np
+from hypothesis import event, given, settings, strategies as st
+
+from src.battle_core import POSITIONS, BattleCore
+from src.battle_team import Teams
+from src.rng import Rng
+from src.vector_battles import GreedyVectorPolicy, RandomVectorPolicy, VectorBattles, VectorPolicy
+
+@settings(max_examples=25)
+@given(
+    seed=st.random_module(),
+    rng_seed=st.integers(min_value=0),
+    orange_policy=st.sampled_from(VectorPolicy.__subclasses__()),
+    blue_policy=st.sampled_from(VectorPolicy.__subclasses__())
+)
+def test_vector_battles_match_the_scalar_core(
+    new_state, seed, rng_seed: int, orange_policy, blue_policy
+):
+    event(seed)
+    battles = VectorBattles(BattleCore.from_state(new_state()), 16)
+    cores = [battles.core(battle) for battle in range(len(battles))]
+    policies: dict[Teams, VectorPolicy] = {
+        Teams.ORANGE: orange_policy(), Teams.BLUE: blue_policy()
+    }
+    rng = np.random.default_rng(rng_seed)
+
+    while battles.active.any():
+        legal = battles.legal_mask()
+        codes = np.concatenate([
+            policies[team].choose(battles, legal[:, i * POSITIONS:(i + 1) * POSITIONS], i, rng)
+                for i, team in enumerate(Teams)
+        ], axis=1)
+
+        for battle, scalar in enumerate(cores):
+            if not scalar.is_over:
+                for index in range(len(Teams) * POSITIONS):
+                    assert set(scalar.legal_codes(index // POSITIONS, index % POSITIONS)) == \
+                        set(np.flatnonzero(legal[battle, index]).tolist())
+                scalar.run_turn(codes[battle].tolist())
+
+        battles.run_turn(codes)
+
+        for battle, scalar in enumerate(cores):
+            vector = battles.core(battle)
+            assert list(vector.hp) == list(scalar.hp)
+            assert list(vector.stamina) == list(scalar.stamina)
+            assert list(vector.held) == list(scalar.held)
+            assert list(vector.positions) == list(scalar.positions)
+            assert (vector.turn, vector.speed_arrow, vector.winner) == \
+                (scalar.turn, scalar.speed_arrow, scalar.winner)
+
+@given(seed=st.random_module(), rng_seed=st.integers(min_value=0))
+def test_vector_battles_run_until_every_battle_is_over(new_state, seed, rng_seed: int):
+    event(seed)
+    battles = VectorBattles(BattleCore.from_state(new_state()), 200)
+    battles.run(
+        {Teams.ORANGE: GreedyVectorPolicy(), Teams.BLUE: RandomVectorPolicy()},
+        Rng(rng_seed)
+    )
+    assert not battles.active.any()
+    assert battles.win_rate(Teams.ORANGE) + battles.win_rate(Teams.BLUE) <= 1
+
+@settings(max_examples=25, deadline=None)
+@given(seed=st.integers(min_value=0, max_value=2**32))
+def test_vector_battles_play_turns_like_the_handler(play_battle, seed: int):
+    battle, turns = play_battle(seed)
+    replay = battle.replay()
+    core = replay.new_core()
+    battles = VectorBattles(core, 1)
+    assert len(turns) == len(replay.codes)
+
+    for codes, expected in zip(replay.codes, turns[:-1]):
+        battles.run_turn(codes.astype(np.int64)[np.newaxis])
+        vector = battles.core(0)
+        assert not vector.is_over
+        assert vector.compute_hash() == expected.hash
+
+    # the finished state doesn't keep the turn, so the last turn is compared without it
+    battles.run_turn(replay.codes[-1].astype(np.int64)[np.newaxis])
+    vector, expected = battles.core(0), turns[-1]
+    assert vector.is_over and vector.winner == replay.winner
+    assert list(vector.hp) == list(expected.hp)
+    assert list(vector.stamina) == list(expected.stamina)
+    assert list(vector.held) == list(expected.held)
+    assert list(vector.positions) == list(expected.positions)
@@ -0,0 +1,66 @@
+from hypothesis import given, settings, strategies as st
+
+from src.battle_core import BattleCore
+from src.rng import Rng
+from src.zobrist import TranspositionTable
+
+@settings(deadline=None)
+@given(seed=st.integers(min_value=0))
+def test_core_hash_is_kept_up_to_date(new_state, seed: int):
+    rng = Rng(seed)
+    state = new_state()
+    core = BattleCore.from_state(state)
+    assert core.hash == state.zobrist_hash
+
+    while not core.is_over:
+        before = core.hash
+        copy = core.copy()
+        core.run_turn(core.random_codes(rng))
+        assert copy.hash == before
+        assert core.hash == core.compute_hash()
+
+    core.to_state(state)
+    assert state.zobrist_hash == core.hash
+
+@settings(deadline=None)
+@given(seed=st.integers(min_value=0))
+def test_hash_only_depends_on_the_position(new_state, seed: int):
+    rng = Rng(seed)
+    state = new_state()
+    start = state.snapshot()
+    core = BattleCore.from_state(state)
+    core.run_turn(core.random_codes(rng))
+    core.to_state(state)
+    played = state.snapshot()
+
+    # getting to the same position another way gives the same hash
+    state.restore(start)
+    assert state.zobrist_hash == BattleCore.from_state(state).hash != core.hash
+    state.restore(played)
+    assert state.zobrist_hash == BattleCore.from_state(state).hash == core.hash
+
+    core.hp[0] += 1
+    assert core.compute_hash() != core.hash
+    core.rehash()
+    assert core.hash == core.compute_hash()
+
+def test_transposition_table_keeps_deeper_searches():
+    table: TranspositionTable[str] = TranspositionTable(size=4)
+    assert table.put(1, "deep", depth=3)
+    assert table.get(1) == "deep" and table.get(1, depth=4) is None
+
+    # 5 wants the same slot as 1
+    assert not table.put(5, "shallow", depth=1)
+    assert table.get(5) is None and table.get(1) == "deep"
+
+    table.new_search()
+    assert table.put(5, "new", depth=0)
+    assert table.get(5) == "new" and table.get(1) is None
+
+    stats = table.stats
+    assert (stats.probes, stats.hits, stats.stores, stats.replacements, stats.rejections) == \
+        (6, 3, 2, 1, 1)
+    assert stats.hit_rate == 0.5
+    assert len(table) == 1
+    table.clear()
+    assert len(table) == 0 and table.stats.probes == 0
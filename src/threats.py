@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Iterable, Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+import src.tem_tem_constants as TemTemConstants
+from src.technique import Technique, TechniqueClass, damage_formula
+from src.tem import Tem
+from src.tem_stat import Stat, TemStat
+from src.tem_tem_type import TemTemType
+from src.tempedia import Tempedia
+from src.traits import ATTACK_MODIFIERS, DEFENCE_MODIFIERS, modifier_bounds
+
+
+@dataclass(frozen=True)
+class SpeciesTable:
+    """
+    The species data needed for damage calculations, as arrays indexed by species.
+    """
+    ids: NDArray[np.int_]
+    base_stats: NDArray[np.int_]  # (species, stat)
+    types: NDArray[np.int_]  # (species, 2), TemTemType values
+    traits: tuple[frozenset[str], ...]  # lower case
+
+    @staticmethod
+    @cache
+    def get() -> SpeciesTable:
+        ids = Tempedia.get_ids()
+        return SpeciesTable(
+            ids=np.array(ids),
+            base_stats=np.array([
+                [Tempedia.get_base_value_initializer(i)[stat] for stat in Stat] for i in ids
+            ]),
+            types=np.array([[tp.value for tp in Tempedia.get_types(i)] for i in ids]),
+            traits=tuple(
+                frozenset(trait.lower() for trait in Tempedia.get_traits(i)) for i in ids
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def stats(self, level: int, sv: int) -> NDArray[np.int_]:
+        """
+        Returns the stats of every species at the given level, with the given SVs and no TVs.
+
+        Returns:
+        - NDArray[np.int_]: An array of shape (species, stat).
+        """
+        # TemStat's formulas broadcast over the species axis of the base values
+        return np.stack([
+            TemStat(self.base_stats[:, stat.value], sv, 0, stat).curve(level) # type: ignore
+                for stat in Stat
+        ], axis=1)
+
+    def type_multipliers(self, attacking_type: TemTemType) -> NDArray[np.float64]:
+        """
+        Returns the multiplier of the attacking type against every species.
+        """
+        by_type = np.ones(max(t.value for t in TemTemType) + 1)
+        for defending_type in TemTemType:
+            by_type[defending_type.value] = attacking_type.get_multiplier(defending_type)
+        return by_type[self.types[:, 0]] * by_type[self.types[:, 1]]
+
+
+@cache
+def _species_modifiers(
+    attacking: bool,
+    technique_type: TemTemType,
+    technique_class: TechniqueClass
+) -> NDArray[np.float64]:
+    """
+    The trait damage modifier bounds (see `modifier_bounds`) of every species, as the
+    attacker or the defender of a technique.
+
+    Returns:
+    - NDArray[np.float64]: An array of shape (whether it's effective, low/high, species).
+    """
+    modifiers = ATTACK_MODIFIERS if attacking else DEFENCE_MODIFIERS
+    return np.array([
+        np.array([
+            modifier_bounds(modifiers, traits, technique_type, technique_class, effective)
+                for traits in SpeciesTable.get().traits
+        ]).T for effective in (False, True)
+    ])
+
+
+@dataclass(frozen=True)
+class SpeciesFilter:
+    """
+    Restricts the species considered in a reverse query. Empty sets don't filter anything.
+
+    Attributes:
+        types (frozenset[TemTemType]): Only species having any of these types.
+        traits (frozenset[str]): Only species that can have any of these traits.
+    """
+    types: frozenset[TemTemType] = field(default_factory=frozenset)
+    traits: frozenset[str] = field(default_factory=frozenset)
+
+    def mask(self, table: SpeciesTable) -> NDArray[np.bool_]:
+        result = np.ones(len(table), dtype=np.bool_)
+
+        if any(self.types):
+            result &= np.isin(table.types, [t.value for t in self.types]).any(axis=1)
+
+        if any(self.traits):
+            wanted = {t.lower() for t in self.traits}
+            result &= np.array([not wanted.isdisjoint(traits) for traits in table.traits])
+
+        return result
+
+
+@dataclass(frozen=True)
+class Threat:
+    """
+    The damage range of a technique, as a fraction of the defender's HP.
+    """
+    species_id: int
+    technique: str
+    min_percent: float
+    max_percent: float
+
+    @property
+    def species_name(self) -> str:
+        return Tempedia.get_name(self.species_id)
+
+    def kos(self, hits: int, guaranteed: bool = False) -> bool:
+        """
+        Whether the technique KOs in `hits` hits, in the worst (guaranteed) or best case.
+        """
+        return (self.min_percent if guaranteed else self.max_percent) * hits >= 1
+
+    def __str__(self) -> str:
+        return f"{self.species_name} [{self.technique}] = " + \
+            f"{self.min_percent * 100:.1f} % - {self.max_percent * 100:.1f} %"
+
+
+@dataclass(frozen=True)
+class ReverseQuery:
+    """
+    The species side of a reverse query.
+
+    Attributes:
+        level (int): The level of every queried species.
+        hits (int): The number of hits to KO (1 for OHKO, 2 for 2HKO...).
+        species_filter (SpeciesFilter): Restricts the queried species.
+        guaranteed (bool): Only return KOs that happen in the worst case too.
+        min_sv (int): The SVs of the weakest version of every species.
+        max_sv (int): The SVs of the strongest version of every species.
+    """
+    level: int
+    hits: int = 1
+    species_filter: SpeciesFilter = SpeciesFilter()
+    guaranteed: bool = False
+    min_sv: int = TemTemConstants.MIN_SV
+    max_sv: int = TemTemConstants.MAX_SV
+
+    def sorted_threats(
+        self,
+        species_ids: NDArray[np.int_],
+        techniques: list[str],
+        min_percent: NDArray[np.float64],
+        max_percent: NDArray[np.float64]
+    ) -> list[Threat]:
+        percent = min_percent if self.guaranteed else max_percent
+        # sorted by damage percentage, highest first
+        order = np.lexsort((-min_percent, -max_percent))
+        return [
+            Threat(
+                int(species_ids[i]), techniques[i], float(min_percent[i]), float(max_percent[i])
+            ) for i in order if percent[i] * self.hits >= 1
+        ]
+
+
+def find_kos(attacker: Tem, technique: Technique, query: ReverseQuery) -> list[Threat]:
+    """
+    Finds the species that the attacker's technique KOs.
+    The least damage is done to the species with `query.max_sv` SVs and the least
+    favourable of their traits (and the attacker's, if its trait isn't known).
+
+    Args:
+    - attacker (Tem): The attacking Tem.
+    - technique (Technique): The technique being used to attack.
+    - query (ReverseQuery): The defending species.
+
+    Returns:
+    - list[Threat]: The KO'd species, sorted by damage percentage.
+    """
+    table = SpeciesTable.get()
+    mask = query.species_filter.mask(table)
+
+    if not technique.inflicts_damage or not any(mask):
+        return []
+
+    type_multiplier = table.type_multipliers(technique.type)[mask]
+    effective = type_multiplier > 1
+    # (low/high, species), in the same order as `Technique.calculate_damage` multiplies them
+    attack = np.array([
+        modifier_bounds(
+            ATTACK_MODIFIERS, attacker.possible_traits,
+            technique.type, technique.technique_class, is_effective
+        ) for is_effective in (False, True)
+    ])[effective.astype(np.int_)].T
+    defence = _species_modifiers(False, technique.type, technique.technique_class)[:, :, mask]
+    modifier = attack * np.where(effective, defence[1], defence[0])
+    if technique.type in attacker.types:
+        modifier = modifier * TemTemConstants.STAB_MODIFIER
+    modifier = modifier * type_multiplier
+    atk = attacker.stats[technique.atk_stat]
+
+    def percent(sv: int, bound: int) -> NDArray[np.float64]:
+        stats = table.stats(query.level, sv)[mask]
+        dmg = np.floor(damage_formula(
+            attacker.level, technique.base_damage, atk, stats[:, technique.def_stat.value],
+            modifier[bound]
+        ))
+        return dmg / stats[:, Stat.HP.value]
+
+    return query.sorted_threats(
+        table.ids[mask], [technique.name] * int(mask.sum()),
+        percent(query.max_sv, 0), percent(query.min_sv, 1)
+    )
+
+
+@cache
+def _learnable_techniques(species_id: int, level: int) -> tuple[Technique, ...]:
+    return tuple(
+        Technique(name) for name in Tempedia.get_latest_learnable_technique_names(
+            species_id, level, TemTemConstants.NUMBER_OF_BATTLE_TECHNIQUES
+        )
+    )
+
+
+def _technique_pairs(
+    query: ReverseQuery,
+    techniques: Optional[Iterable[Technique]]
+) -> tuple[NDArray[np.int_], list[Technique]]:
+    """
+    Returns one (species index, technique) pair per damaging technique of each queried species.
+    """
+    table = SpeciesTable.get()
+    fixed_techniques = None if techniques is None else tuple(techniques)
+    pair_species: list[int] = []
+    pair_techniques: list[Technique] = []
+
+    for i in np.flatnonzero(query.species_filter.mask(table)):
+        for technique in (
+            _learnable_techniques(int(table.ids[i]), query.level) if fixed_techniques is None
+                else fixed_techniques
+        ):
+            if technique.inflicts_damage:
+                pair_species.append(i)
+                pair_techniques.append(technique)
+
+    return np.array(pair_species, dtype=np.int_), pair_techniques
+
+
+def _pair_trait_modifiers(
+    defender: Tem,
+    species: NDArray[np.int_],
+    techniques: list[Technique]
+) -> NDArray[np.float64]:
+    """
+    The trait damage modifier bounds of each (species index, technique) pair against the
+    defender, of shape (low/high, pair).
+    """
+    effective = [t.type.get_multiplier(*defender.types) > 1 for t in techniques]
+    return np.array([
+        _species_modifiers(True, t.type, t.technique_class)[int(is_effective), :, i]
+            for i, t, is_effective in zip(species, techniques, effective)
+    ]).T * np.array([
+        modifier_bounds(
+            DEFENCE_MODIFIERS, defender.possible_traits, t.type, t.technique_class, is_effective
+        ) for t, is_effective in zip(techniques, effective)
+    ]).T
+
+
+def find_threats(
+    defender: Tem,
+    query: ReverseQuery,
+    techniques: Optional[Iterable[Technique]] = None
+) -> list[Threat]:
+    """
+    Finds the species that KO the defender.
+    Each species attacks with the latest techniques it learns by `query.level`
+    (or with `techniques`, if given), and only its strongest one is reported.
+    The least damage is done by the species with `query.min_sv` SVs and the least
+    favourable of their traits (and the defender's, if its trait isn't known).
+
+    Args:
+    - defender (Tem): The defending Tem.
+    - query (ReverseQuery): The attacking species.
+    - techniques (Iterable[Technique], optional): The techniques every species attacks with.
+
+    Returns:
+    - list[Threat]: The species that KO the defender, sorted by damage percentage.
+    """
+    table = SpeciesTable.get()
+    # every (species, technique) pair is evaluated at once
+    species, pair_techniques = _technique_pairs(query, techniques)
+
+    if not any(pair_techniques):
+        return []
+
+    atk_stat = np.array([t.atk_stat.value for t in pair_techniques])
+    df = np.array([defender.stats[t.def_stat] for t in pair_techniques])
+    # in the same order as `Technique.calculate_damage` multiplies them
+    modifier = _pair_trait_modifiers(defender, species, pair_techniques) * np.where(
+        # same type attack bonus
+        (
+            table.types[species] == np.array([t.type.value for t in pair_techniques])[:, None]
+        ).any(axis=1),
+        TemTemConstants.STAB_MODIFIER, 1
+    ) * np.array([t.type.get_multiplier(*defender.types) for t in pair_techniques])
+    base_damage = np.array([t.base_damage for t in pair_techniques])
+
+    def percent(sv: int, bound: int) -> NDArray[np.float64]:
+        atk = table.stats(query.level, sv)[species, atk_stat]
+        dmg = np.floor(damage_formula(query.level, base_damage, atk, df, modifier[bound]))
+        return dmg / defender.stats[Stat.HP]
+
+    min_percent, max_percent = percent(query.min_sv, 0), percent(query.max_sv, 1)
+
+    # keep the strongest technique of each species
+    order = np.lexsort((-min_percent, -max_percent, species))
+    first = order[np.r_[True, species[order][1:] != species[order][:-1]]]
+
+    return query.sorted_threats(
+        table.ids[species[first]], [pair_techniques[i].name for i in first],
+        min_percent[first], max_percent[first]
+    )
@@ -0,0 +1,459 @@
+from __future__ import annotations
+import argparse
+from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from enum import Enum
+from itertools import combinations
+import json
+import math
+import os
+from pathlib import Path
+from typing import Final, Iterator, Optional
+
+import numpy as np
+
+from src.battle import Battle
+from src.battle_handler import TamerBattleHandler
+from src.battle_state import BattleState
+from src.battle_team import Teams
+from src.rng import Rng
+from src.simulate import agent_classes, load_team
+from src.team import PlaythroughTeam
+
+ELO_K: Final[float] = 16
+GLICKO_Q: Final[float] = math.log(10) / 400
+GLICKO_MAX_DEVIATION: Final[float] = 350
+GLICKO_DRIFT: Final[float] = 35 # how much a deviation grows every round
+
+
+class Pairing(Enum):
+    ROUND_ROBIN = "round_robin" # every round, every agent plays every other agent
+    SWISS = "swiss" # every round, agents play the closest ranked agent they haven't met
+
+
+@dataclass(frozen=True)
+class TournamentConfig:
+    """
+    Attributes:
+        agents (tuple[str, ...]): The `BattleAgent` class names taking part.
+        teams (tuple[Optional[str], ...]): The team pool: json files, or None for a random
+            team. Each game draws one team per side from it.
+        pairing (Pairing): How agents are paired every round.
+        rounds (int): How many rounds are played.
+        battles (int): How many battles each game has. The agents swap teams and sides
+            every other battle.
+        seed (int): Seeds every game.
+    """
+    agents: tuple[str, ...]
+    teams: tuple[Optional[str], ...] = (None,)
+    pairing: Pairing = Pairing.ROUND_ROBIN
+    rounds: int = 1
+    battles: int = 2
+    seed: int = 0
+
+    def to_json(self) -> dict:
+        return {**asdict(self), "pairing": self.pairing.value}
+
+    @staticmethod
+    def from_json(data: dict) -> TournamentConfig:
+        return TournamentConfig(
+            agents=tuple(data["agents"]),
+            teams=tuple(data["teams"]),
+            pairing=Pairing(data["pairing"]),
+            rounds=data["rounds"],
+            battles=data["battles"],
+            seed=data["seed"],
+        )
+
+
+@dataclass(frozen=True)
+class Game:
+    round: int
+    index: int # in its round
+    agents: tuple[str, str]
+
+
+@dataclass(frozen=True)
+class GameResult:
+    game: Game
+    wins: tuple[int, int] # of each of the game's agents
+    draws: int
+    turns: int
+
+    @property
+    def battles(self) -> int:
+        return sum(self.wins) + self.draws
+
+    def points(self, agent: str) -> float:
+        """
+        What the agent scored in the game: a point per win, half a point per draw.
+        """
+        return sum(
+            wins + self.draws / 2 for name, wins in zip(self.game.agents, self.wins)
+                if name == agent
+        )
+
+    def to_json(self) -> dict:
+        return asdict(self)
+
+    @staticmethod
+    def from_json(data: dict) -> GameResult:
+        game = data["game"]
+        return GameResult(
+            Game(game["round"], game["index"], tuple(game["agents"])), # type: ignore
+            tuple(data["wins"]), # type: ignore
+            data["draws"],
+            data["turns"],
+        )
+
+
+@dataclass(frozen=True)
+class Rating:
+    """
+    A Glicko rating: the strength estimate and its standard deviation.
+    """
+    rating: float = 1500
+    deviation: float = GLICKO_MAX_DEVIATION
+
+    def interval(self, z: float = 1.96) -> tuple[float, float]:
+        """
+        The confidence interval of the rating, 95% by default.
+        """
+        return self.rating - z * self.deviation, self.rating + z * self.deviation
+
+
+@dataclass(frozen=True)
+class Standing:
+    agent: str
+    points: float
+    battles: int
+    elo: float
+    glicko: Rating
+
+    def __str__(self) -> str:
+        low, high = self.glicko.interval()
+        return f"{self.agent}: {self.points:g}/{self.battles} points | " + \
+            f"elo {self.elo:.0f} | glicko {self.glicko.rating:.0f} [{low:.0f}, {high:.0f}]"
+
+
+def _outcomes(result: GameResult) -> Iterator[tuple[str, str, float]]:
+    """
+    Every battle of the game as (agent, opponent, agent's score).
+    """
+    first, second = result.game.agents
+    yield from [(first, second, 1.0)] * result.wins[0]
+    yield from [(first, second, 0.0)] * result.wins[1]
+    yield from [(first, second, 0.5)] * result.draws
+
+
+def elo_ratings(agents: tuple[str, ...], results: list[GameResult]) -> dict[str, float]:
+    """
+    Elo ratings updated after every battle, in the order games were scheduled.
+    """
+    ratings = {agent: 1500.0 for agent in agents}
+    for result in sorted(results, key=lambda result: (result.game.round, result.game.index)):
+        for agent, opponent, score in _outcomes(result):
+            expected = 1 / (1 + 10 ** ((ratings[opponent] - ratings[agent]) / 400))
+            ratings[agent] += ELO_K * (score - expected)
+            ratings[opponent] -= ELO_K * (score - expected)
+    return ratings
+
+
+def glicko_ratings(agents: tuple[str, ...], results: list[GameResult]) -> dict[str, Rating]:
+    """
+    Glicko ratings, with a rating period per round.
+    """
+    ratings = {agent: Rating() for agent in agents}
+
+    for round_index in sorted({result.game.round for result in results}):
+        games: dict[str, list[tuple[Rating, float]]] = {agent: [] for agent in agents}
+        for result in results:
+            if result.game.round == round_index:
+                for agent, opponent, score in _outcomes(result):
+                    games[agent].append((ratings[opponent], score))
+                    games[opponent].append((ratings[agent], 1 - score))
+
+        ratings = {agent: _glicko_update(rating, games[agent]) for agent, rating in ratings.items()}
+
+    return ratings
+
+
+def _glicko_update(rating: Rating, games: list[tuple[Rating, float]]) -> Rating:
+    """
+    The rating after a rating period with the games, as (opponent's rating, score).
+    """
+    deviation = min(math.hypot(rating.deviation, GLICKO_DRIFT), GLICKO_MAX_DEVIATION)
+    if not games:
+        return Rating(rating.rating, deviation)
+
+    weights = 1 / np.sqrt(
+        1 + 3 * (GLICKO_Q * np.array([opponent.deviation for opponent, _ in games]) / math.pi) ** 2
+    )
+    expected = 1 / (1 + 10 ** (-weights * np.array([
+        rating.rating - opponent.rating for opponent, _ in games
+    ]) / 400))
+    scores = np.array([score for _, score in games])
+    precision = 1 / deviation ** 2 + \
+        GLICKO_Q ** 2 * float(np.sum(weights ** 2 * expected * (1 - expected)))
+    return Rating(
+        rating.rating + GLICKO_Q / precision * float(np.sum(weights * (scores - expected))),
+        math.sqrt(1 / precision),
+    )
+
+
+def standings(config: TournamentConfig, results: list[GameResult]) -> list[Standing]:
+    """
+    The agents by Glicko rating.
+    """
+    elo = elo_ratings(config.agents, results)
+    glicko = glicko_ratings(config.agents, results)
+    return sorted((
+        Standing(
+            agent,
+            sum(result.points(agent) for result in results),
+            sum(result.battles for result in results if agent in result.game.agents),
+            elo[agent],
+            glicko[agent],
+        ) for agent in config.agents
+    ), key=lambda standing: -standing.glicko.rating)
+
+
+def schedule(config: TournamentConfig, round_index: int, results: list[GameResult]) -> list[Game]:
+    """
+    The games of a round. Swiss rounds depend on the results of the previous rounds: the
+    agents are ranked by points, then rating, and each one plays the best ranked agent
+    it hasn't met yet (or has met the least). With an odd number of agents, the worst
+    ranked of those that sat out the fewest rounds sits this one out.
+    """
+    if config.pairing == Pairing.ROUND_ROBIN:
+        pairs = [
+            # every other round, the agents swap who plays first
+            pair if round_index % 2 == 0 else (pair[1], pair[0])
+                for pair in combinations(config.agents, 2)
+        ]
+    else:
+        ranked = [standing.agent for standing in sorted(
+            standings(config, results), key=lambda standing: -standing.points
+        )]
+        met = {agent: [opponent for result in results
+            for opponent in result.game.agents
+                if agent in result.game.agents and opponent != agent] for agent in ranked}
+        if len(ranked) % 2 == 1:
+            played = {agent: len({result.game.round for result in results
+                if agent in result.game.agents}) for agent in ranked}
+            ranked.remove(max(reversed(ranked), key=played.__getitem__))
+        pairs = []
+        while len(ranked) > 1:
+            agent = ranked.pop(0)
+            opponent = min(ranked, key=met[agent].count) # the first of the least met
+            ranked.remove(opponent)
+            pairs.append((agent, opponent))
+
+    return [Game(round_index, index, pair) for index, pair in enumerate(pairs)]
+
+
+class _Arena:
+    """
+    Plays games in a worker process. The team files are loaded once, and the battle of
+    every pair of pool teams is built once. A game's battles all start from the same
+    battle, reset between them, so random teams are drawn once per game.
+    """
+    def __init__(self, config: TournamentConfig) -> None:
+        self.__config = config
+        self.__agents = agent_classes()
+        rng = Rng(config.seed)
+        # never battled with, only copied
+        self.__pool: list[Optional[PlaythroughTeam]] = [
+            None if path is None else load_team(path, rng) for path in config.teams
+        ]
+        self.__battles: dict[tuple[int, int], Battle] = {}
+
+    def battle(self, teams: tuple[int, int], rng: Rng) -> Battle:
+        """
+        A battle between the pool teams that hasn't started, with random teams drawn on rng.
+        """
+        if teams in self.__battles:
+            battle = self.__battles[teams]
+            battle.reset()
+            return battle
+
+        orange, blue = (
+            PlaythroughTeam.get_random(rng) if self.__pool[index] is None
+                else deepcopy(self.__pool[index]) for index in teams
+        )
+        battle = Battle(BattleState(team_orange=orange, team_blue=blue), TamerBattleHandler())
+        if all(self.__pool[index] is not None for index in teams):
+            self.__battles[teams] = battle
+        return battle
+
+    def play(self, game: Game) -> GameResult:
+        config = self.__config
+        rng = Rng(np.random.SeedSequence(config.seed, spawn_key=(game.round, game.index)))
+        teams = (rng.randrange(len(config.teams)), rng.randrange(len(config.teams)))
+        agents = [self.__agents[name](agent_rng) for name, agent_rng in
+            zip(game.agents, rng.split(2))]
+        wins, draws, turns = [0, 0], 0, 0
+        battle = self.battle(teams, rng)
+
+        for index in range(config.battles):
+            # the agents swap teams, and sides, every other battle
+            first = index % 2
+            if index > 0:
+                battle.reset()
+            result = battle.run({Teams.ORANGE: agents[first], Teams.BLUE: agents[1 - first]})
+            turns += result.turns
+            if result.winner is None:
+                draws += 1
+            else:
+                wins[first ^ (result.winner.value - 1)] += 1
+
+        return GameResult(game, (wins[0], wins[1]), draws, turns)
+
+
+_ARENA: Optional[_Arena] = None # of a worker process
+
+
+def _start_worker(config: TournamentConfig):
+    global _ARENA #pylint: disable=global-statement
+    _ARENA = _Arena(config)
+
+
+def _play(game: Game) -> GameResult:
+    assert _ARENA is not None, "The worker wasn't started"
+    return _ARENA.play(game)
+
+
+class Tournament:
+    """
+    Runs a tournament, appending every game's result to a json lines file as soon as it
+    finishes. The file starts with the config: running a tournament on an existing file
+    resumes it, skipping the games it already has.
+    """
+    def __init__(self, config: TournamentConfig, path: str | os.PathLike) -> None:
+        self.__config = config
+        self.__path = Path(path)
+        self.__results: list[GameResult] = self.__load()
+
+    @property
+    def config(self) -> TournamentConfig:
+        return self.__config
+
+    @property
+    def results(self) -> list[GameResult]:
+        return list(self.__results)
+
+    def standings(self) -> list[Standing]:
+        return standings(self.__config, self.__results)
+
+    def __load(self) -> list[GameResult]:
+        if not self.__path.exists() or self.__path.stat().st_size == 0:
+            self.__path.write_text(json.dumps(self.__config.to_json()) + "\n", encoding="utf8")
+            return []
+
+        text = self.__path.read_text(encoding="utf8")
+        if not text.endswith("\n"):
+            # the last result was cut off by an interruption
+            text = text[:text.rfind("\n") + 1]
+            self.__path.write_text(text, encoding="utf8")
+
+        lines = text.splitlines()
+        if TournamentConfig.from_json(json.loads(lines[0])) != self.__config:
+            raise ValueError(f"{self.__path} has the results of another tournament")
+        return [GameResult.from_json(json.loads(line)) for line in lines[1:]]
+
+    def __add(self, result: GameResult):
+        with self.__path.open("a", encoding="utf8") as file:
+            file.write(json.dumps(result.to_json()) + "\n")
+        self.__results.append(result)
+
+    def run(self, workers: int = 1) -> Iterator[GameResult]:
+        """
+        Plays the games that are missing, round by round, yielding their results as they
+        finish. The games of a round run across a process pool whose workers are started
+        once, with the tournament's teams loaded. With a single worker, games run in this
+        process.
+        """
+        config = self.__config
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_start_worker, initargs=(config,)
+        ) if workers > 1 else None
+        arena = _Arena(config) if executor is None else None
+
+        try:
+            for round_index in range(config.rounds):
+                done = {result.game for result in self.__results}
+                # Swiss pairings only depend on the rounds before, even when resuming
+                previous = [
+                    result for result in self.__results if result.game.round < round_index
+                ]
+                games = [
+                    game for game in schedule(config, round_index, previous) if game not in done
+                ]
+                if executor is None:
+                    for game in games:
+                        self.__add(arena.play(game)) # type: ignore
+                        yield self.__results[-1]
+                    continue
+
+                for future in as_completed([executor.submit(_play, game) for game in games]):
+                    self.__add(future.result())
+                    yield self.__results[-1]
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+
+def main():
+    agents = list(agent_classes())
+    parser = argparse.ArgumentParser(
+        description="Runs a tournament between battle agents and rates them."
+    )
+    parser.add_argument(
+        "results", type=str, help="The json lines file results go to. Resumed if it exists."
+    )
+    parser.add_argument(
+        "--agents", nargs="+", choices=agents, default=agents, help="The agents taking part."
+    )
+    parser.add_argument(
+        "--teams",
+        nargs="+",
+        default=[None],
+        help="The team pool, as json files (like my_team.json). Random teams if missing.",
+    )
+    parser.add_argument(
+        "--pairing",
+        choices=[pairing.value for pairing in Pairing],
+        default=Pairing.ROUND_ROBIN.value,
+        help="How agents are paired every round.",
+    )
+    parser.add_argument("--rounds", type=int, default=1, help="How many rounds to play.")
+    parser.add_argument("--battles", type=int, default=2, help="How many battles per game.")
+    parser.add_argument("--workers", type=int, default=1, help="How many processes to use.")
+    parser.add_argument("--seed", type=int, default=0, help="Seeds every game.")
+    args = parser.parse_args()
+
+    tournament = Tournament(
+        TournamentConfig(
+            agents=tuple(args.agents),
+            teams=tuple(args.teams),
+            pairing=Pairing(args.pairing),
+            rounds=args.rounds,
+            battles=args.battles,
+            seed=args.seed,
+        ),
+        args.results
+    )
+    for result in tournament.run(args.workers):
+        print(
+            f"round {result.game.round} | {result.game.agents[0]} {result.wins[0]}-" +
+                f"{result.wins[1]} {result.game.agents[1]} ({result.draws} draws)",
+            flush=True
+        )
+
+    for standing in tournament.standings():
+        print(standing)
+
+
+if __name__ == "__main__":
+    main()
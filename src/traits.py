@@ -0,0 +1,429 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from enum import Enum
+from itertools import product
+import json
+import math
+from typing import TYPE_CHECKING, Any, Final, Hashable, Iterable, Optional
+
+from src.battle_team import TeamBattlePosition, Teams
+from src.technique import Technique, TechniqueClass
+from src.tem import Tem
+from src.tem_stat import Stat
+from src.tem_tem_constants import MAX_STAT_STAGE
+from src.tem_tem_type import TemTemType
+
+if TYPE_CHECKING:
+    from src.battle_state import BattleState
+
+# the lowest and highest value of a damage modifier
+Bounds = tuple[float, float]
+NEUTRAL: Final[Bounds] = (1.0, 1.0)
+
+
+class TraitEvent(Enum):
+    """
+    The battle events trait effects are keyed by in traits.json. Events go to the tem
+    they happen to (the user of a technique for the *_used and *_dealt ones). Status
+    conditions, stat stage changes and type changes aren't modelled, so the events about
+    them are never emitted.
+    """
+    TECHNIQUE_TAKEN = "technique_taken"
+    TECHNIQUE_TYPE_USED = "technique_type_used"
+    TECHNIQUE_TYPE_TAKEN = "technique_type_taken"
+    TECHNIQUE_TYPE_TAKEN_BY_ALLY = "technique_type_taken_by_ally"
+    TECHNIQUE_CLASS_USED = "technique_class_used"
+    TECHNIQUE_CLASS_TAKEN = "technique_class_taken"
+    TECHNIQUE_DAMAGE_DEALT = "technique_damage_dealt"
+    TECHNIQUE_DAMAGE_TAKEN = "technique_damage_taken"
+    EFFECTIVE_DAMAGE_DEALT = "effective_damage_dealt"
+    EFFECTIVE_DAMAGE_TAKEN = "effective_damage_taken"
+    BATTLEFIELD_ENTRY = "batlefield_entry" # as traits.json spells it
+    RIVAL_SWITCHING_OUT = "rival_switching_out"
+    ALLY_KNOCKED_OUT = "ally_knocked_out"
+    RESTING = "resting"
+    START_OF_TURN = "start_of_turn"
+    CURRENT_HP = "current_hp"
+    STATUS_CONDITION_APPLIED = "status_condition_applied"
+    RIVAL_GETS_CONDITION = "rival_gets_condition"
+    TARGET_STATUS_CONDITION_PRESENT = "target_status_condition_present"
+    NEGATIVE_STAT_STAGE_CHANGE = "negative_stat_stage_change"
+
+
+# the spec keys an effect can be compiled from, anything else (conditions, type changes,
+# targets other than the holder...) isn't modelled
+SUPPORTED_KEYS: Final[frozenset[str]] = frozenset({
+    "type", "class", "not_yet_triggered", "max_hp",
+    "dmg_modifier", "stat_stages", "restore_hp_percentage_max_hp", "hp_loss_from_max",
+})
+# the events whose effects need a technique type to filter on
+TYPED_EVENTS: Final[frozenset[TraitEvent]] = frozenset({
+    TraitEvent.TECHNIQUE_TYPE_USED,
+    TraitEvent.TECHNIQUE_TYPE_TAKEN,
+    TraitEvent.TECHNIQUE_TYPE_TAKEN_BY_ALLY,
+})
+
+
+@dataclass(frozen=True)
+class TraitEffect: #pylint: disable=too-many-instance-attributes
+    """
+    What a trait does on one event: when its filters match, the damage being worked out
+    is multiplied by `dmg_modifier`, the holder's stat stages change and it gets
+    `hp_change` of its max HP back (or loses it, if negative).
+    """
+    trait: str
+    event: TraitEvent
+    technique_type: Optional[TemTemType] = None # any if None
+    technique_class: Optional[TechniqueClass] = None # any if None
+    once: bool = False # only triggers once per battle
+    max_hp: Optional[float] = None # only triggers at or below this fraction of max HP
+    dmg_modifier: float = 1
+    stat_stages: tuple[tuple[Stat, int], ...] = ()
+    hp_change: float = 0
+
+    @staticmethod
+    def compile(trait: str, event: TraitEvent, spec: dict[str, Any]) -> Optional[TraitEffect]:
+        """
+        The effect of a traits.json spec, None if it uses anything that isn't modelled.
+        """
+        if set(spec) - SUPPORTED_KEYS or (event in TYPED_EVENTS and "type" not in spec) or \
+                spec.get("dmg_modifier", 1) <= 0: # absorbing techniques isn't modelled either
+            return None
+
+        technique_type, technique_class = None, None
+        for key in ("type", "class"):
+            # some specs put the technique class under "type"
+            value = spec.get(key)
+            if value is not None and value.upper() in TechniqueClass.__members__:
+                technique_class = TechniqueClass.from_string(value)
+            elif value is not None:
+                technique_type = TemTemType.from_string(value)
+
+        return TraitEffect(
+            trait=trait,
+            event=event,
+            technique_type=technique_type,
+            technique_class=technique_class,
+            once=spec.get("not_yet_triggered", False),
+            max_hp=spec.get("max_hp"),
+            dmg_modifier=spec.get("dmg_modifier", 1),
+            stat_stages=tuple(
+                (Stat[stat], stages) for stat, stages in spec.get("stat_stages", {}).items()
+            ),
+            hp_change=spec.get("restore_hp_percentage_max_hp", 0) -
+                spec.get("hp_loss_from_max", 0),
+        )
+
+    @property
+    def is_situational(self) -> bool:
+        """
+        Whether it depends on more than the technique, so it may not trigger on a hit.
+        """
+        return self.once or self.max_hp is not None
+
+    def applies_to(self, technique_type: TemTemType, technique_class: TechniqueClass) -> bool:
+        return (self.technique_type is None or technique_type == self.technique_type) and \
+            (self.technique_class is None or technique_class == self.technique_class)
+
+    def matches(self, holder: Tem, technique: Optional[Technique]) -> bool:
+        if technique is not None and \
+                not self.applies_to(technique.type, technique.technique_class):
+            return False
+        return self.max_hp is None or holder.current_hp <= holder.stats[Stat.HP] * self.max_hp
+
+
+@dataclass(frozen=True)
+class Trait:
+    name: str
+    effects: tuple[TraitEffect, ...]
+    unsupported: tuple[TraitEvent, ...] # the events of the effects that aren't modelled
+
+    @property
+    def is_modelled(self) -> bool:
+        return not self.unsupported
+
+    def modifier_bounds(
+            self,
+            events: frozenset[TraitEvent],
+            technique_type: TemTemType,
+            technique_class: TechniqueClass
+    ) -> Bounds:
+        """
+        The lowest and highest damage modifier the effects on the events give a technique:
+        situational effects only widen the bounds.
+        """
+        low, high = NEUTRAL
+        for effect in self.effects:
+            if effect.event not in events or not effect.applies_to(technique_type, technique_class):
+                continue
+            if effect.is_situational:
+                low, high = low * min(1, effect.dmg_modifier), high * max(1, effect.dmg_modifier)
+            else:
+                low, high = low * effect.dmg_modifier, high * effect.dmg_modifier
+        return low, high
+
+
+def _compile_traits(path: str) -> dict[str, Trait]:
+    with open(path, encoding="utf8") as file:
+        data = json.load(file)
+
+    traits: dict[str, Trait] = {}
+    for trait in data:
+        effects, unsupported = [], []
+        for event_name, spec in (trait.get("effects") or {}).items():
+            event = TraitEvent(event_name)
+            effect = TraitEffect.compile(trait["name"], event, spec)
+            if effect is None:
+                unsupported.append(event)
+            else:
+                effects.append(effect)
+        traits[trait["name"]] = Trait(trait["name"], tuple(effects), tuple(unsupported))
+    return traits
+
+
+# compiled once, by name
+TRAITS: Final[dict[str, Trait]] = _compile_traits("./temtem_api/traits.json")
+
+# the events whose damage modifiers a trait gives its holder's techniques, or the
+# techniques that hit it, by whether the technique is effective
+ATTACK_EVENTS: Final[dict[bool, frozenset[TraitEvent]]] = {
+    False: frozenset({
+        TraitEvent.TECHNIQUE_TYPE_USED,
+        TraitEvent.TECHNIQUE_CLASS_USED,
+        TraitEvent.TECHNIQUE_DAMAGE_DEALT,
+    }),
+}
+ATTACK_EVENTS[True] = ATTACK_EVENTS[False] | {TraitEvent.EFFECTIVE_DAMAGE_DEALT}
+DEFENCE_EVENTS: Final[dict[bool, frozenset[TraitEvent]]] = {
+    False: frozenset({
+        TraitEvent.TECHNIQUE_TAKEN,
+        TraitEvent.TECHNIQUE_TYPE_TAKEN,
+        TraitEvent.TECHNIQUE_CLASS_TAKEN,
+    }),
+}
+DEFENCE_EVENTS[True] = DEFENCE_EVENTS[False] | {TraitEvent.EFFECTIVE_DAMAGE_TAKEN}
+
+# (lower case trait, technique type, technique class, whether it's effective)
+ModifierKey = tuple[str, TemTemType, TechniqueClass, bool]
+
+
+def _modifier_table(events: dict[bool, frozenset[TraitEvent]]) -> dict[ModifierKey, Bounds]:
+    """
+    The `Trait.modifier_bounds` of every trait and technique, only the ones that aren't
+    neutral.
+    """
+    table: dict[ModifierKey, Bounds] = {}
+    for trait in TRAITS.values():
+        if not trait.effects:
+            continue
+        for technique_type, technique_class, effective in product(
+            TemTemType, TechniqueClass, (False, True)
+        ):
+            bounds = trait.modifier_bounds(events[effective], technique_type, technique_class)
+            if bounds != NEUTRAL:
+                table[(trait.name.lower(), technique_type, technique_class, effective)] = bounds
+    return table
+
+
+# precomputed, so that damage calculations with traits are a few lookups away
+ATTACK_MODIFIERS: Final[dict[ModifierKey, Bounds]] = _modifier_table(ATTACK_EVENTS)
+DEFENCE_MODIFIERS: Final[dict[ModifierKey, Bounds]] = _modifier_table(DEFENCE_EVENTS)
+
+
+def modifier_bounds(
+    table: dict[ModifierKey, Bounds],
+    traits: Iterable[str],
+    technique_type: TemTemType,
+    technique_class: TechniqueClass,
+    effective: bool
+) -> Bounds:
+    """
+    The lowest and highest damage modifier any of the traits can give a technique, from
+    `ATTACK_MODIFIERS` or `DEFENCE_MODIFIERS`. Neutral if there are no traits.
+    """
+    bounds = [
+        table.get((trait.lower(), technique_type, technique_class, effective), NEUTRAL)
+            for trait in traits
+    ]
+    if not bounds:
+        return NEUTRAL
+    return min(low for low, _ in bounds), max(high for _, high in bounds)
+
+
+def damage_bounds(attacker: Tem, technique: Technique, defender: Tem) -> Bounds:
+    """
+    The lowest and highest damage modifier the traits of both tems give a technique. Tems
+    whose trait isn't known could have any of their `Tem.possible_traits`.
+    """
+    effective = technique.type.get_multiplier(*defender.types) > 1
+    attack_low, attack_high = modifier_bounds(
+        ATTACK_MODIFIERS, attacker.possible_traits,
+        technique.type, technique.technique_class, effective
+    )
+    defence_low, defence_high = modifier_bounds(
+        DEFENCE_MODIFIERS, defender.possible_traits,
+        technique.type, technique.technique_class, effective
+    )
+    return attack_low * defence_low, attack_high * defence_high
+
+
+class TraitEngine:
+    """
+    Runs the traits of a battle's tems. The effects are indexed by event and then by the
+    tem holding them, and only tems with a modelled trait are indexed, so an event that
+    no trait listens to costs a dict lookup (and a battle without traits returns before
+    that). Damage events return the product of the triggered damage modifiers.
+
+    Stat stages are only kept track of: nothing reads them in the damage formula yet.
+    """
+    def __init__(self, state: BattleState, tems: Iterable[Tem]):
+        self.__state = state
+        self.__listeners: dict[TraitEvent, dict[Tem, tuple[TraitEffect, ...]]] = {}
+        self.__holders: list[Tem] = []
+        for tem in tems:
+            trait = TRAITS.get(tem.trait) if tem.trait is not None else None
+            if trait is None or not trait.effects:
+                continue
+            self.__holders.append(tem)
+            for effect in trait.effects:
+                by_tem = self.__listeners.setdefault(effect.event, {})
+                by_tem[tem] = by_tem.get(tem, ()) + (effect,)
+        self.__stages: dict[Tem, tuple[int, ...]] = {}
+        self.__triggered: frozenset[tuple[int, TraitEffect]] = frozenset()
+
+    @property
+    def events(self) -> frozenset[TraitEvent]:
+        """
+        The events some tem of the battle listens to.
+        """
+        return frozenset(self.__listeners)
+
+    def stat_stages(self, tem: Tem) -> dict[Stat, int]:
+        """
+        The stat stages the tem's trait gave it, only the ones that aren't 0.
+        """
+        stages = self.__stages.get(tem, ())
+        return {stat: stage for stat, stage in zip(Stat, stages) if stage != 0}
+
+    @property
+    def key(self) -> Hashable:
+        """
+        Everything the engine changes during a battle, for `BattleSnapshot`s.
+        """
+        return (
+            tuple(self.__stages.get(tem, ()) for tem in self.__holders),
+            self.__triggered
+        )
+
+    def restore(self, key: Hashable):
+        """
+        Brings the engine back to a `key`, or to the start of the battle if it's empty.
+        """
+        if not key:
+            self.__stages, self.__triggered = {}, frozenset()
+            return
+        stages, triggered = key # type: ignore
+        self.__stages = {tem: stage for tem, stage in zip(self.__holders, stages) if stage}
+        self.__triggered = triggered
+
+    def emit(
+            self,
+            event: TraitEvent,
+            team: Teams,
+            tem: Tem,
+            technique: Optional[Technique] = None
+    ) -> float:
+        """
+        Runs the effects the tem of the team listens to on the event. Returns their
+        damage modifier.
+        """
+        listeners = self.__listeners.get(event)
+        effects = listeners.get(tem) if listeners is not None else None
+        if effects is None:
+            return 1.0
+
+        modifier = 1.0
+        index = self.__holders.index(tem)
+        for effect in effects:
+            if (effect.once and (index, effect) in self.__triggered) or \
+                    not effect.matches(tem, technique):
+                continue
+            if effect.once:
+                self.__triggered = self.__triggered | {(index, effect)}
+            modifier *= effect.dmg_modifier
+            self.__apply(effect, team, tem)
+        return modifier
+
+    def emit_team(self, event: TraitEvent, team: Teams, exclude: Optional[Tem] = None):
+        """
+        Emits the event to the team's active tems that are still alive.
+        """
+        if event not in self.__listeners:
+            return
+        for position in TeamBattlePosition:
+            tem = self.__state.get_tem(team, position)
+            if tem is not None and tem is not exclude and tem.is_alive:
+                self.emit(event, team, tem)
+
+    def technique_used(self, team: Teams, user: Tem, technique: Technique) -> float:
+        """
+        The events of the user of a technique, before it hits. Returns the damage modifier.
+        """
+        if not self.__listeners:
+            return 1.0
+        return self.emit(TraitEvent.TECHNIQUE_TYPE_USED, team, user, technique) * \
+            self.emit(TraitEvent.TECHNIQUE_CLASS_USED, team, user, technique) * \
+            self.emit(TraitEvent.TECHNIQUE_DAMAGE_DEALT, team, user, technique)
+
+    def technique_taken(
+            self,
+            team: Teams,
+            user: Tem,
+            target_team: Teams,
+            defender: Tem,
+            technique: Technique
+    ) -> float: #pylint: disable=too-many-arguments,too-many-positional-arguments
+        """
+        The events of a tem hit by a technique (and of its user, if it's effective).
+        Returns the damage modifier.
+        """
+        if not self.__listeners:
+            return 1.0
+        modifier = self.emit(TraitEvent.TECHNIQUE_TAKEN, target_team, defender, technique) * \
+            self.emit(TraitEvent.TECHNIQUE_TYPE_TAKEN, target_team, defender, technique) * \
+            self.emit(TraitEvent.TECHNIQUE_CLASS_TAKEN, target_team, defender, technique)
+        if technique.inflicts_damage and technique.type.get_multiplier(*defender.types) > 1:
+            modifier *= self.emit(
+                TraitEvent.EFFECTIVE_DAMAGE_TAKEN, target_team, defender, technique
+            ) * self.emit(TraitEvent.EFFECTIVE_DAMAGE_DEALT, team, user, technique)
+        return modifier
+
+    def damage_taken(self, team: Teams, defender: Tem, technique: Technique):
+        """
+        The events of a tem that has just been damaged by a technique.
+        """
+        if not self.__listeners or not defender.is_alive:
+            return
+        self.emit(TraitEvent.TECHNIQUE_DAMAGE_TAKEN, team, defender, technique)
+        self.emit(TraitEvent.CURRENT_HP, team, defender)
+
+    def start_turn(self):
+        for team in Teams:
+            self.emit_team(TraitEvent.START_OF_TURN, team)
+
+    def __apply(self, effect: TraitEffect, team: Teams, tem: Tem):
+        if effect.stat_stages:
+            stages = list(self.__stages.get(tem, (0,) * len(Stat)))
+            for stat, change in effect.stat_stages:
+                stages[stat.value] = max(
+                    -MAX_STAT_STAGE, min(MAX_STAT_STAGE, stages[stat.value] + change)
+                )
+            self.__stages[tem] = tuple(stages)
+
+        if effect.hp_change > 0:
+            tem.set_hp(min(
+                tem.stats[Stat.HP],
+                tem.current_hp + math.floor(tem.stats[Stat.HP] * effect.hp_change)
+            ))
+        elif effect.hp_change < 0:
+            self.__state.damage(team, tem, math.floor(tem.stats[Stat.HP] * -effect.hp_change))
@@ -0,0 +1,449 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import dataclass
+import math
+from typing import Final
+
+import numpy as np
+from numpy.typing import NDArray
+
+from src.action_code import ActionCode
+from src.battle_core import (
+    DRAW, EMPTY, POSITIONS, REST_RANK, REST_STAMINA_RECOVERY, SWITCH_RANK, TARGET_SLOTS,
+    TARGETS, TEAM_SIZE, TEAMS, TECHNIQUES, TEMS, BattleCore, CoreTables
+)
+from src.battle_team import Teams
+from src.rng import Rng
+import src.tem_tem_constants as TemTemConstants
+
+NOT_OVER: Final[int] = -2
+
+# the (team, position) slots relative to a user, as (side, position) with side 1 for opponents
+RELATIVE_SLOTS: Final[tuple[tuple[int, int], ...]] = tuple(
+    (side, position) for side in range(TEAMS) for position in range(POSITIONS)
+)
+# whether a target hits each relative slot, by (target index, user position, relative slot)
+TARGET_MASK: Final[NDArray[np.bool_]] = np.array([
+    [
+        [slot in TARGET_SLOTS[target][position] for slot in RELATIVE_SLOTS]
+            for position in range(POSITIONS)
+    ] for target in range(TARGETS)
+])
+# the technique slot of each technique code (0 for the other codes)
+CODE_SLOT: Final[NDArray[np.int_]] = np.maximum(
+    np.arange(ActionCode.SIZE) - ActionCode.TECHNIQUE, 0
+) // TARGETS
+# the target index of each technique code (0 for the other codes)
+CODE_TARGET: Final[NDArray[np.int_]] = np.maximum(
+    np.arange(ActionCode.SIZE) - ActionCode.TECHNIQUE, 0
+) % TARGETS
+# the team index of each (team, position) index
+POSITION_TEAM: Final[NDArray[np.int_]] = np.arange(TEAMS * POSITIONS) // POSITIONS
+
+
+@dataclass(frozen=True)
+class VectorTables: #pylint: disable=too-many-instance-attributes
+    """
+    `CoreTables` as NumPy arrays.
+    """
+    max_stamina: NDArray[np.int64]
+    rest_gain: NDArray[np.int64] # the stamina recovered by resting
+    speed: NDArray[np.int64]
+    hold: NDArray[np.int64]
+    stamina_cost: NDArray[np.int64]
+    rank: NDArray[np.int64]
+    damage: NDArray[np.int64] # (technique, defending tem)
+    in_team: NDArray[np.bool_] # whether each tem index is part of its team
+    code_technique: NDArray[np.int64] # (tem, code), -1 when the tem doesn't have the code
+
+    @staticmethod
+    def from_core_tables(tables: CoreTables) -> VectorTables:
+        code_technique = np.full((TEMS, ActionCode.SIZE), -1)
+        for tem, codes in enumerate(tables.technique_codes):
+            for code, technique in codes:
+                code_technique[tem, code] = technique
+
+        return VectorTables(
+            max_stamina=np.array(tables.max_stamina, dtype=np.int64),
+            rest_gain=np.array([
+                math.ceil(stamina * REST_STAMINA_RECOVERY) for stamina in tables.max_stamina
+            ], dtype=np.int64),
+            speed=np.array(tables.speed, dtype=np.int64),
+            hold=np.array(tables.hold, dtype=np.int64),
+            stamina_cost=np.array(tables.stamina_cost, dtype=np.int64),
+            rank=np.array(tables.rank, dtype=np.int64),
+            damage=np.array(tables.damage, dtype=np.int64).reshape(TEMS * TECHNIQUES, TEMS),
+            in_team=np.array([
+                slot < size for size in tables.team_sizes for slot in range(TEAM_SIZE)
+            ]),
+            code_technique=code_technique,
+        )
+
+
+class VectorBattles: #pylint: disable=too-many-instance-attributes
+    """
+    Many copies of the same battle, run in lockstep: their state is kept as arrays with the
+    battle as the first axis and each step of a turn is applied to every battle at once.
+    The rules are `BattleCore`'s, and so is the precomputed damage table: traits are
+    ignored too.
+    Finished battles stay as they are while the others keep going.
+    """
+    def __init__(self, core: BattleCore, battles: int):
+        self.__core = core
+        self.tables: VectorTables = VectorTables.from_core_tables(core.tables)
+
+        def repeat(values) -> NDArray[np.int64]:
+            return np.tile(np.array(values, dtype=np.int64), (battles, 1))
+
+        self.hp: NDArray[np.int64] = repeat(core.hp)
+        self.stamina: NDArray[np.int64] = repeat(core.stamina)
+        self.held: NDArray[np.int64] = repeat(core.held)
+        self.positions: NDArray[np.int64] = repeat(core.positions)
+        self.speed_arrow: NDArray[np.int64] = np.full(battles, core.speed_arrow)
+        self.turn: NDArray[np.int64] = np.full(battles, core.turn)
+        self.winner: NDArray[np.int64] = np.full(
+            battles, NOT_OVER if core.winner is None else core.winner
+        )
+
+    def __len__(self) -> int:
+        return len(self.winner)
+
+    @property
+    def active(self) -> NDArray[np.bool_]:
+        return self.winner == NOT_OVER
+
+    def core(self, battle: int) -> BattleCore:
+        """
+        Returns one of the battles as a `BattleCore`.
+        """
+        core = self.__core.copy()
+        core.hp = array('i', self.hp[battle].tolist())
+        core.stamina = array('i', self.stamina[battle].tolist())
+        core.held = array('i', self.held[battle].tolist())
+        core.positions = array('i', self.positions[battle].tolist())
+        core.speed_arrow = int(self.speed_arrow[battle])
+        core.turn = int(self.turn[battle])
+        core.winner = None if self.winner[battle] == NOT_OVER else int(self.winner[battle])
+        return core
+
+    def win_rate(self, team: Teams) -> float:
+        """
+        The fraction of the finished battles that the team won.
+        """
+        finished = ~self.active
+        return float((self.winner[finished] == team.value - 1).mean()) if finished.any() else 0
+
+    def __tems(self) -> tuple[NDArray[np.int64], NDArray[np.bool_]]:
+        """
+        The tem on each (battle, team position) (0 when it's empty) and whether it can act.
+        """
+        tems = np.where(self.positions == EMPTY, 0, self.positions)
+        rows = np.arange(len(self))[:, None]
+        return tems, (self.positions != EMPTY) & (self.hp[rows, tems] > 0)
+
+    def __switch_candidates(self, team_index: int) -> NDArray[np.bool_]:
+        """
+        Which team slots can be switched in, by battle.
+        """
+        first = team_index * TEAM_SIZE
+        candidates = (self.hp[:, first:first + TEAM_SIZE] > 0) & \
+            self.tables.in_team[first:first + TEAM_SIZE]
+        rows = np.arange(len(self))
+        for position in range(POSITIONS):
+            tem = self.positions[:, team_index * POSITIONS + position]
+            on_field = tem != EMPTY
+            candidates[rows[on_field], tem[on_field] - first] = False
+        return candidates
+
+    def legal_mask(self) -> NDArray[np.bool_]:
+        """
+        Which `ActionCode`s each position can use, with shape (battle, team position, code).
+        """
+        tems, can_act = self.__tems()
+        mask = np.zeros((len(self), TEAMS * POSITIONS, ActionCode.SIZE), dtype=np.bool_)
+        mask[:, :, ActionCode.NO_ACTION] = ~can_act
+        mask[:, :, ActionCode.REST] = can_act
+        mask[:, :, ActionCode.RUN] = can_act
+
+        for index in range(TEAMS * POSITIONS):
+            mask[:, index, ActionCode.SWITCH:ActionCode.TECHNIQUE] = \
+                self.__switch_candidates(index // POSITIONS) & can_act[:, index, None]
+
+        # readiness by (battle, team position, technique slot), spread over the codes
+        ready = (self.held >= self.tables.hold).reshape(len(self), TEMS, TECHNIQUES)[
+            np.arange(len(self))[:, None], tems
+        ][:, :, CODE_SLOT]
+        mask |= (self.tables.code_technique[tems] >= 0) & ready & can_act[:, :, None]
+        return mask
+
+    def run_turn(self, codes: NDArray[np.int_]):
+        """
+        Runs a turn of every active battle, with the `ActionCode` of each
+        (battle, team position).
+        """
+        rows = np.arange(len(self))
+        tems, can_act = self.__tems()
+        valid = self.__run_away(
+            codes, self.active[:, None] & (codes != ActionCode.NO_ACTION) & can_act
+        )
+
+        techniques = tems * TECHNIQUES + np.clip(
+            (codes - ActionCode.TECHNIQUE) // TARGETS, 0, TECHNIQUES - 1
+        )
+        order = self.__order(codes, tems, techniques, valid)
+        # the battle ends as soon as a team has no tems left
+        wiped = np.zeros(len(self), dtype=np.bool_)
+
+        for step in range(TEAMS * POSITIONS):
+            index = order[:, step]
+            actor = tems[rows, index]
+            code = codes[rows, index]
+            acting = valid[rows, index] & (self.positions[rows, index] == actor) & \
+                (self.hp[rows, actor] > 0) & ~wiped
+
+            self.__rest(acting & (code == ActionCode.REST), actor)
+            self.__switch(
+                acting & (code >= ActionCode.SWITCH) & (code < ActionCode.TECHNIQUE), index, code
+            )
+            self.__use_technique(
+                acting & (code >= ActionCode.TECHNIQUE), index, actor, code,
+                techniques[rows, index]
+            )
+            wiped |= ~self.__alive().all(axis=1)
+
+        self.__end_turn(self.active.copy())
+
+    def __run_away(self, codes: NDArray[np.int_], valid: NDArray[np.bool_]) -> NDArray[np.bool_]:
+        """
+        Ends the battles where a team runs away, the first one to do so losing.
+        Returns which codes are still valid.
+        """
+        running = valid & (codes == ActionCode.RUN)
+        ran = running.any(axis=1)
+        self.winner[ran] = 1 - POSITION_TEAM[np.argmax(running[ran], axis=1)]
+        return valid & ~ran[:, None]
+
+    def __order(
+        self,
+        codes: NDArray[np.int_],
+        tems: NDArray[np.int_],
+        techniques: NDArray[np.int_],
+        valid: NDArray[np.bool_]
+    ) -> NDArray[np.int_]:
+        """
+        The team position indexes of each battle, in the order they act.
+        """
+        rank = np.where(
+            codes == ActionCode.REST, REST_RANK,
+            np.where(codes < ActionCode.TECHNIQUE, SWITCH_RANK, self.tables.rank[techniques])
+        )
+        rank_speed = rank * (int(self.tables.speed.max()) + 1) + self.tables.speed[tems]
+
+        # a speed tie between teams is resolved by the speed arrow, which then changes sides
+        tie = np.zeros(len(self), dtype=np.bool_)
+        for i in range(POSITIONS):
+            for j in range(POSITIONS, TEAMS * POSITIONS):
+                tie |= valid[:, i] & valid[:, j] & (rank_speed[:, i] == rank_speed[:, j])
+        self.speed_arrow = np.where(tie, 1 - self.speed_arrow, self.speed_arrow)
+
+        key = -rank_speed * 2 + (POSITION_TEAM != self.speed_arrow[:, None])
+        return np.argsort(np.where(valid, key, np.iinfo(np.int64).max), axis=1, kind='stable')
+
+    def __rest(self, resting: NDArray[np.bool_], actor: NDArray[np.int_]):
+        actor = actor[resting]
+        self.stamina[resting, actor] = np.minimum(
+            self.tables.max_stamina[actor],
+            self.stamina[resting, actor] + self.tables.rest_gain[actor]
+        )
+
+    def __switch(
+        self,
+        switching: NDArray[np.bool_],
+        index: NDArray[np.int_],
+        code: NDArray[np.int_]
+    ):
+        rows = np.arange(len(self))
+        incoming = POSITION_TEAM[index] * TEAM_SIZE + np.clip(
+            code - ActionCode.SWITCH, 0, TEAM_SIZE - 1
+        )
+        switching &= (self.hp[rows, incoming] > 0) & \
+            ~(self.positions == incoming[:, None]).any(axis=1)
+        self.positions[rows[switching], index[switching]] = incoming[switching]
+
+    def __use_technique( #pylint: disable=too-many-arguments
+        self,
+        using: NDArray[np.bool_],
+        index: NDArray[np.int_],
+        actor: NDArray[np.int_],
+        code: NDArray[np.int_],
+        technique: NDArray[np.int_]
+    ):
+        rows = np.arange(len(self))
+        using &= self.held[rows, technique] >= self.tables.hold[technique]
+        users, actor, technique = rows[using], actor[using], technique[using]
+
+        self.held[users, technique] = 0
+        self.stamina[users, actor] -= self.tables.stamina_cost[technique]
+        # overexertion: the missing stamina is taken from the user's HP
+        missing = np.minimum(self.stamina[users, actor], 0)
+        self.hp[users, actor] = np.maximum(0, self.hp[users, actor] + missing)
+        self.stamina[users, actor] -= missing
+
+        self.__hit_targets(users, index[using], code[using], technique)
+
+    def __hit_targets(
+        self,
+        users: NDArray[np.int_],
+        index: NDArray[np.int_],
+        code: NDArray[np.int_],
+        technique: NDArray[np.int_]
+    ):
+        team, position = POSITION_TEAM[index], index % POSITIONS
+        target = (code - ActionCode.TECHNIQUE) % TARGETS
+        for slot, (side, target_position) in enumerate(RELATIVE_SLOTS):
+            defender = self.positions[users, (team ^ side) * POSITIONS + target_position]
+            hit = TARGET_MASK[target, position, slot] & (defender != EMPTY)
+            defender = np.where(hit, defender, 0)
+            hit &= self.hp[users, defender] > 0
+            self.hp[users[hit], defender[hit]] = np.maximum(
+                0,
+                self.hp[users[hit], defender[hit]] -
+                    self.tables.damage[technique[hit], defender[hit]]
+            )
+
+    def __alive(self) -> NDArray[np.bool_]:
+        """
+        Whether each team of each battle has tems that haven't fainted, with shape
+        (battle, team).
+        """
+        return ((self.hp > 0) & self.tables.in_team).reshape(
+            len(self), TEAMS, TEAM_SIZE
+        ).any(axis=2)
+
+    def __end_turn(self, active: NDArray[np.bool_]):
+        rows = np.arange(len(self))
+
+        for index in range(TEAMS * POSITIONS):
+            tem = self.positions[:, index]
+            on_field = active & (tem != EMPTY)
+            tem = np.where(on_field, tem, 0)
+            alive = self.hp[rows, tem] > 0
+
+            holding = on_field & alive
+            for slot in range(TECHNIQUES):
+                technique = tem * TECHNIQUES + slot
+                self.held[rows, technique] += holding & \
+                    (self.held[rows, technique] < self.tables.hold[technique])
+
+            fainted = on_field & ~alive
+            candidates = self.__switch_candidates(index // POSITIONS)
+            replaced = fainted & candidates.any(axis=1)
+            self.positions[replaced, index] = \
+                (index // POSITIONS) * TEAM_SIZE + np.argmax(candidates[replaced], axis=1)
+
+        self.turn[active] += 1
+        alive = self.__alive()
+        ended = active & ~alive.all(axis=1)
+        self.winner[ended] = np.where(
+            alive[ended].any(axis=1), np.argmax(alive[ended], axis=1), DRAW
+        )
+        self.winner[active & ~ended & (self.turn > TemTemConstants.BATTLE_MAX_TURNS)] = DRAW
+
+    def run(
+        self,
+        policies: dict[Teams, VectorPolicy],
+        rng: Rng
+    ) -> NDArray[np.int64]:
+        """
+        Runs every battle until it's over, returning the winner team indexes (or DRAW).
+        The policies draw in bulk from the rng's NumPy generator.
+        """
+        generator = rng.numpy
+        while self.active.any():
+            legal = self.legal_mask()
+            self.run_turn(np.concatenate([
+                policies[team].choose(
+                    self, legal[:, i * POSITIONS:(i + 1) * POSITIONS], i, generator
+                ) for i, team in enumerate(Teams)
+            ], axis=1))
+        return self.winner
+
+
+class VectorPolicy(ABC):
+    @abstractmethod
+    def choose(
+        self,
+        battles: VectorBattles,
+        legal: NDArray[np.bool_],
+        team_index: int,
+        rng: np.random.Generator
+    ) -> NDArray[np.int_]:
+        """
+        Chooses the `ActionCode` of the team's positions in every battle.
+
+        Args:
+        - battles (VectorBattles): The battles.
+        - legal (NDArray[np.bool_]): The legal codes, with shape (battle, position, code).
+        - team_index (int): The team choosing.
+        - rng (np.random.Generator): The random number generator to use.
+
+        Returns:
+        - NDArray[np.int_]: The codes, with shape (battle, position).
+        """
+
+class RandomVectorPolicy(VectorPolicy):
+    def choose(
+        self,
+        battles: VectorBattles,
+        legal: NDArray[np.bool_],
+        team_index: int,
+        rng: np.random.Generator
+    ) -> NDArray[np.int_]:
+        # never run away, unless it's the only option
+        legal = legal.copy()
+        legal[:, :, ActionCode.RUN] &= legal.sum(axis=2) == 1
+        return np.argmax(np.where(legal, rng.random(legal.shape), -1), axis=2)
+
+class GreedyVectorPolicy(VectorPolicy):
+    """
+    Uses the technique that deals the most damage to the opponents (minus the damage it
+    deals to its own team). Rests when no technique does any damage.
+    """
+    def choose(
+        self,
+        battles: VectorBattles,
+        legal: NDArray[np.bool_],
+        team_index: int,
+        rng: np.random.Generator
+    ) -> NDArray[np.int_]:
+        value = np.stack([
+            technique_values(battles, team_index * POSITIONS + position)
+                for position in range(POSITIONS)
+        ], axis=1)
+        value[:, :, ActionCode.SWITCH:ActionCode.TECHNIQUE] = -1
+        value[:, :, ActionCode.RUN] = -np.inf
+        return np.argmax(np.where(legal, value, -np.inf), axis=2)
+
+
+def technique_values(battles: VectorBattles, index: int) -> NDArray[np.float64]:
+    """
+    The damage each code of a team position deals to the opponents, minus the damage it deals
+    to its own team, with shape (battle, code). Codes that aren't techniques are worth 0.
+    """
+    rows = np.arange(len(battles))
+    team_index, position = divmod(index, POSITIONS)
+    techniques = battles.tables.code_technique[np.maximum(battles.positions[:, index], 0)]
+    value = np.zeros(techniques.shape)
+
+    for slot, (side, target_position) in enumerate(RELATIVE_SLOTS):
+        on_field = battles.positions[:, (team_index ^ side) * POSITIONS + target_position]
+        defender = np.maximum(on_field, 0)
+        alive = (on_field != EMPTY) & (battles.hp[rows, defender] > 0)
+        damage = battles.tables.damage[np.maximum(techniques, 0), defender[:, None]]
+        value += (1 if side else -1) * np.where(
+            (techniques >= 0) & alive[:, None] & TARGET_MASK[CODE_TARGET, position, slot],
+            damage, 0
+        )
+
+    return value
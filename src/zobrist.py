@@ -0,0 +1,181 @@
+from __future__ import annotations
+from dataclasses import dataclass, replace
+from enum import IntEnum, auto
+from typing import TYPE_CHECKING, Final, Generic, Hashable, Optional, TypeVar
+
+from src.battle_team import TeamBattlePosition
+from src.tem_stat import Stat
+import src.tem_tem_constants as TemTemConstants
+from src.traits import TRAITS
+
+if TYPE_CHECKING:
+    from src.battle_state import BattleSnapshot
+
+T = TypeVar("T")
+
+MASK: Final[int] = (1 << 64) - 1
+# the tem, position and technique indexes of `BattleCore`
+TEAM_SIZE: Final[int] = TemTemConstants.COMPETITIVE_TEAM_SIZE
+TECHNIQUES: Final[int] = TemTemConstants.NUMBER_OF_BATTLE_TECHNIQUES
+POSITIONS: Final[int] = len(TeamBattlePosition)
+
+
+class Feature(IntEnum):
+    """
+    The parts of a battle that change while it's played, and are hashed.
+    """
+    POSITION = auto() # by (team, position), the tem on it
+    HP = auto() # by tem
+    STAMINA = auto() # by tem
+    HELD = auto() # by technique
+    SPEED_ARROW = auto()
+    TURN = auto()
+    STAT_STAGE = auto() # by (trait holder, stat)
+    TRIGGERED = auto() # by (trait holder, effect of its trait), once per battle effects
+
+
+def zobrist_key(feature: Feature, index: int, value: int) -> int:
+    """
+    The 64 bit key XORed into a hash for a feature having a value. Keys are derived
+    from their arguments (with SplitMix64's finalizer) instead of being drawn into tables,
+    so any HP or turn has one. Zero valued features add nothing to the hash, so unused
+    tem and technique slots can be left out of it.
+    """
+    if value == 0:
+        return 0
+    x = ((feature << 56) ^ (index << 32) ^ (value & 0xFFFFFFFF)) & MASK
+    x = (x + 0x9E3779B97F4A7C15) & MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK
+    return x ^ (x >> 31)
+
+
+def hash_traits(traits: Hashable) -> int:
+    """
+    The hash of a `TraitEngine.key`: the stat stages of the trait holders and the once per
+    battle effects they triggered. 0 until a trait changes something.
+    """
+    if not traits:
+        return 0
+    stages, triggered = traits # type: ignore
+    key = 0
+    for holder, holder_stages in enumerate(stages):
+        for stat, stage in enumerate(holder_stages):
+            key ^= zobrist_key(Feature.STAT_STAGE, holder * len(Stat) + stat, stage)
+    for holder, effect in triggered:
+        key ^= zobrist_key(
+            Feature.TRIGGERED, (holder << 8) + TRAITS[effect.trait].effects.index(effect), 1
+        )
+    return key
+
+
+def hash_snapshot(snapshot: BattleSnapshot) -> int:
+    """
+    The Zobrist hash of a snapshot: the same as the hash of a `BattleCore` in the same
+    position, so hashes can be shared between the two. The trait state is hashed too,
+    which cores don't have: once a trait changed something, the hashes differ.
+    """
+    key = zobrist_key(Feature.SPEED_ARROW, 0, snapshot.speed_arrow.value - 1) ^ \
+        zobrist_key(Feature.TURN, 0, snapshot.phase_turn) ^ hash_traits(snapshot.traits)
+
+    for team_index, (hps, staminas, held, (positions, _)) in enumerate(
+        zip(snapshot.hps, snapshot.staminas, snapshot.held, snapshot.field_key) # type: ignore
+    ):
+        first = team_index * TEAM_SIZE
+        for position, slot in enumerate(positions):
+            key ^= zobrist_key(
+                Feature.POSITION, team_index * POSITIONS + position,
+                slot if slot < 0 else first + slot
+            )
+        for slot, hp in enumerate(hps):
+            tem = first + slot
+            key ^= zobrist_key(Feature.HP, tem, hp) ^ \
+                zobrist_key(Feature.STAMINA, tem, staminas[slot])
+            for technique, tech_held in enumerate(held[slot]):
+                key ^= zobrist_key(Feature.HELD, tem * TECHNIQUES + technique, tech_held)
+
+    return key
+
+
+@dataclass
+class TranspositionStats:
+    probes: int = 0
+    hits: int = 0
+    stores: int = 0
+    replacements: int = 0 # stores that overwrote another position
+    rejections: int = 0 # stores the replacement policy refused
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes > 0 else 0
+
+
+class TranspositionTable(Generic[T]):
+    """
+    A fixed number of slots holding evaluations by Zobrist hash, so that positions
+    reached through different action orders are only evaluated once.
+
+    A hash goes to slot `hash % size`. When two positions want the same slot, the one
+    searched deeper stays, unless it was stored before the last `new_search`: entries
+    from older searches are always replaced.
+    """
+    def __init__(self, size: int = 1 << 16) -> None:
+        assert size > 0, f"A transposition table needs slots: {size=}"
+        self.__keys: list[Optional[int]] = [None] * size
+        self.__values: list[Optional[T]] = [None] * size
+        self.__depths: list[int] = [0] * size
+        self.__searches: list[int] = [0] * size
+        self.__search: int = 0
+        self.__stats: TranspositionStats = TranspositionStats()
+
+    @property
+    def stats(self) -> TranspositionStats:
+        return replace(self.__stats)
+
+    def __len__(self) -> int:
+        return sum(key is not None for key in self.__keys)
+
+    def new_search(self):
+        """
+        Marks the stored evaluations as coming from an older search. They can still be
+        found, but make way for anything new.
+        """
+        self.__search += 1
+
+    def get(self, key: int, depth: int = 0) -> Optional[T]:
+        """
+        The evaluation of the position, if it was stored from a search at least as deep.
+        """
+        slot = key % len(self.__keys)
+        hit = self.__keys[slot] == key and self.__depths[slot] >= depth
+        self.__stats.probes += 1
+        self.__stats.hits += hit
+        return self.__values[slot] if hit else None
+
+    def put(self, key: int, value: T, depth: int = 0) -> bool:
+        """
+        Stores an evaluation, returning whether the replacement policy let it in.
+        """
+        slot = key % len(self.__keys)
+        stored = self.__keys[slot]
+        other = stored is not None and stored != key
+
+        if other and self.__searches[slot] == self.__search and self.__depths[slot] > depth:
+            self.__stats.rejections += 1
+            return False
+
+        self.__keys[slot] = key
+        self.__values[slot] = value
+        self.__depths[slot] = depth
+        self.__searches[slot] = self.__search
+        self.__stats.stores += 1
+        self.__stats.replacements += other
+        return True
+
+    def clear(self):
+        size = len(self.__keys)
+        self.__keys = [None] * size
+        self.__values = [None] * size
+        self.__depths = [0] * size
+        self.__searches = [0] * size
+        self.__stats = TranspositionStats()